@@ -0,0 +1,153 @@
+"""
+Agent Worker
+Standalone process that runs agent workflows, so long LangGraph runs don't
+compete with API requests. Run it alongside the API with AGENT_RUNTIME=worker
+set on both; the API then only writes events to the agent_events outbox.
+
+    AGENT_RUNTIME=worker python agent_worker.py
+
+Scale by running more copies: events are claimed with SKIP LOCKED, so each
+is handled by one worker. Scheduled jobs (daily review, coach briefings)
+run on exactly one worker, the holder of a Postgres advisory lock; another
+worker takes over if it goes away.
+
+SIGTERM/SIGINT stop claiming, hand unstarted events back to the outbox and
+give running workflows AGENT_WORKER_SHUTDOWN_GRACE_SECONDS to finish.
+"""
+import os
+import signal
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger("agent_worker")
+
+# Any constant shared by all workers; identifies the scheduler leader lock
+SCHEDULER_LOCK_KEY = 4_207_310
+
+DEFAULT_LEADER_CHECK_SECONDS = 30
+DEFAULT_STATS_SECONDS = 300
+DEFAULT_SHUTDOWN_GRACE_SECONDS = 30
+
+
+class SchedulerLeadership:
+    """Holds a session-level advisory lock so only one worker runs scheduled jobs"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._conn = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._conn is not None or self.engine.dialect.name != "postgresql"
+
+    def try_acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        conn = self.engine.connect()
+        try:
+            if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}).scalar():
+                self._conn = conn
+                return True
+        except Exception:
+            conn.close()
+            raise
+        conn.close()
+        return False
+
+    def still_held(self) -> bool:
+        """The lock lives as long as its connection; check the connection is alive"""
+        if self._conn is None:
+            return self.is_leader
+        try:
+            self._conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            self._conn.invalidate()
+            self._conn = None
+            return False
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+async def run_worker():
+    from main import engine, llm_gateway
+    from agents.setup import initialize_agent_system
+    from agents.events import get_event_bus
+    from agents.scheduler import get_scheduler
+    from services.vector_store import vector_store
+
+    leader_check_seconds = float(os.getenv("AGENT_WORKER_LEADER_CHECK_SECONDS", DEFAULT_LEADER_CHECK_SECONDS))
+    stats_seconds = float(os.getenv("AGENT_WORKER_STATS_SECONDS", DEFAULT_STATS_SECONDS))
+    grace_seconds = float(os.getenv("AGENT_WORKER_SHUTDOWN_GRACE_SECONDS", DEFAULT_SHUTDOWN_GRACE_SECONDS))
+
+    initialize_agent_system()
+    from services.overdue_sweeper import overdue_sweeper
+    overdue_sweeper.listen()  # Agents reschedule tasks too
+    try:
+        vector_store.setup()  # Agents recall memories; embedding itself runs in the API process
+    except Exception as e:
+        logger.warning(f"Vector store setup skipped: {e}")
+
+    event_bus = get_event_bus()
+    if not event_bus.durable:
+        raise SystemExit("agent_worker needs EVENT_BUS_BACKEND=database to receive events from the API")
+    event_bus.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    scheduler = get_scheduler()
+    leadership = SchedulerLeadership(engine)
+    scheduling = False
+    since_stats = 0.0
+    logger.info("Agent worker running")
+
+    try:
+        while not stopping.is_set():
+            try:
+                if scheduling and not await asyncio.to_thread(leadership.still_held):
+                    scheduler.stop()
+                    scheduling = False
+                    logger.warning("Lost scheduler leadership")
+                if not scheduling and await asyncio.to_thread(leadership.try_acquire):
+                    scheduler.start()
+                    scheduling = True
+                    logger.info("This worker runs scheduled agent jobs")
+            except Exception as e:
+                logger.error(f"Scheduler leadership check failed: {e}", exc_info=True)
+
+            since_stats += leader_check_seconds
+            if since_stats >= stats_seconds:
+                since_stats = 0.0
+                try:
+                    logger.info(f"Event bus: {await event_bus.get_stats()}")
+                except Exception as e:
+                    logger.warning(f"Event bus stats unavailable: {e}")
+
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=leader_check_seconds)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        logger.info("Agent worker stopping")
+        if scheduling:
+            scheduler.stop()
+        leadership.release()
+        await event_bus.stop(grace_seconds=grace_seconds)
+        await llm_gateway.close()
+        logger.info("Agent worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
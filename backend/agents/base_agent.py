@@ -5,7 +5,9 @@ Foundation for all agentic AI implementations in the system.
 Uses LangGraph for state management and orchestration.
 """
 
+import json
 import logging
+from contextvars import ContextVar
 from typing import Any, Dict, List, Optional, TypedDict
 from datetime import datetime, timezone
 from abc import ABC, abstractmethod
@@ -13,12 +15,18 @@ from abc import ABC, abstractmethod
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+
+from integrations.llm_scheduler import llm_scheduler, estimate_tokens, AGENT
+from integrations.prompt_builder import prompt_budget, count_message_tokens, count_tool_tokens, fit_history
 
 from .tools import tool_registry
+from .checkpointer import checkpoint_saver
 
 logger = logging.getLogger(__name__)
 
+# Session of the run in progress; agent instances are shared across concurrent runs
+_run_db: ContextVar[Any] = ContextVar("agent_run_db", default=None)
+
 
 class AgentState(TypedDict):
     """State maintained throughout agent execution"""
@@ -33,6 +41,7 @@ class AgentState(TypedDict):
     requires_review: bool
     confidence: float
     error: Optional[str]
+    tool_cache: Dict[str, Any]  # Hit/miss counts of the workflow's tool result cache
 
 
 class BaseAgent(ABC):
@@ -45,6 +54,10 @@ class BaseAgent(ABC):
     - Use tools to interact with the CRM
     - Maintain state across conversations
     - Request human review when needed
+
+    An instance (LLM client, compiled graph) is built once per agent type and
+    permission set and reused by every run; the database session is per run
+    (see run()).
     """
 
     def __init__(
@@ -61,7 +74,7 @@ class BaseAgent(ABC):
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.permissions = permissions or []
-        self.db = db
+        self._db = db
 
         # Initialize LLM
         self.llm = ChatOpenAI(
@@ -70,12 +83,21 @@ class BaseAgent(ABC):
             max_tokens=max_tokens
         )
 
-        # Initialize LangGraph components
-        self.memory = MemorySaver()
+        # Tool schemas are identical on every loop; build them once
+        self._tool_schemas: Optional[List[Dict[str, Any]]] = None
+
+        # Initialize LangGraph components (checkpoints persisted per workflow, shared saver)
+        self.memory = checkpoint_saver
         self.graph = self._build_graph()
 
         logger.info(f"Initialized {agent_type} agent with model {model_name}")
 
+    @property
+    def db(self):
+        """Session of the current run, else the one given at construction"""
+        session = _run_db.get()
+        return session if session is not None else self._db
+
     @abstractmethod
     def get_system_prompt(self) -> str:
         """
@@ -92,6 +114,88 @@ class BaseAgent(ABC):
         """
         pass
 
+    async def recall(self, query: str, memory_type: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top-k memories of this agent type most similar to `query`"""
+        from services.vector_store import vector_store
+
+        return await vector_store.search(query, self.agent_type, memory_type, k=k)
+
+    def remember(
+        self,
+        memory_type: str,
+        content: str,
+        meta_data: Optional[Dict[str, Any]] = None,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[int] = None
+    ):
+        """Store a memory for later recall (embedded in the background)"""
+        from services.vector_store import vector_store
+
+        vector_store.add(self.db, self.agent_type, memory_type, content, meta_data, entity_type, entity_id)
+        self.db.commit()
+        vector_store.notify()
+
+    def _get_tool_schemas(self) -> List[Dict[str, Any]]:
+        if self._tool_schemas is None:
+            self._tool_schemas = tool_registry.get_tool_schemas(self.permissions)
+        return self._tool_schemas
+
+    def _actions_summary(self, state: AgentState) -> str:
+        lines = [
+            f"- {action.get('tool_name')}({json.dumps(action.get('arguments'), default=str)[:200]}): "
+            f"{'succeeded' if action.get('result', {}).get('success') else 'failed'}"
+            for action in state.get("actions_taken", [])
+        ]
+        return "Earlier steps of this run were trimmed. Actions taken so far:\n" + ("\n".join(lines) or "- none")
+
+    def _trimmed_history(
+        self,
+        state: AgentState,
+        prefix: List[Any],
+        tool_schemas: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Any]:
+        """
+        The newest run messages that fit the agent prompt budget after `prefix`
+        and the tool schemas. Older messages are replaced by a summary of the
+        actions taken, so long runs don't resend their whole transcript.
+        """
+        # An assistant tool call and its tool results are trimmed together
+        turns: List[List[Any]] = []
+        for message in state.get("messages", []):
+            if getattr(message, "type", None) == "tool" and turns:
+                turns[-1].append(message)
+            else:
+                turns.append([message])
+
+        budget = (
+            prompt_budget("agent")
+            - count_message_tokens(prefix, self.model_name)
+            - count_tool_tokens(tool_schemas, self.model_name)
+        )
+        history, dropped = fit_history(turns, max(0, budget), self.model_name)
+        if not dropped:
+            return history
+
+        summary = SystemMessage(content=self._actions_summary(state))
+        history, dropped = fit_history(
+            turns, max(0, budget - count_message_tokens([summary], self.model_name)), self.model_name
+        )
+        logger.info(f"{self.agent_type}: Trimmed {dropped} earlier messages from the prompt")
+        return [summary] + history
+
+    def _llm_slot(self, state: AgentState, messages: List[Any]):
+        """Scheduler slot for one LLM call (agent priority, budgeted to the run's user if known)"""
+        return llm_scheduler.slot(
+            priority=AGENT,
+            tenant=state.get("context", {}).get("user_id"),
+            tokens=estimate_tokens(messages, self.max_tokens)
+        )
+
+    @staticmethod
+    def _total_tokens(response: Any) -> Optional[int]:
+        usage = getattr(response, "usage_metadata", None)
+        return usage.get("total_tokens") if usage else None
+
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph workflow for this agent"""
         workflow = StateGraph(AgentState)
@@ -132,9 +236,9 @@ class BaseAgent(ABC):
         """Planning node - decide what action to take"""
         try:
             # Get available tools
-            tool_schemas = tool_registry.get_tool_schemas(self.permissions)
+            tool_schemas = self._get_tool_schemas()
 
-            # Build messages
+            # Build messages: stable system prompt first, then the goal
             messages = [
                 SystemMessage(content=self.get_system_prompt())
             ]
@@ -143,14 +247,16 @@ class BaseAgent(ABC):
                 goal_prompt = self.get_goal_prompt(state["goal"], state.get("context", {}))
                 messages.append(HumanMessage(content=goal_prompt))
 
-            # Add conversation history
-            messages.extend(state.get("messages", []))
+            # Add as much recent conversation history as the budget allows
+            messages.extend(self._trimmed_history(state, messages, tool_schemas))
 
             # Call LLM with tools
-            response = await self.llm.ainvoke(
-                messages,
-                tools=tool_schemas if tool_schemas else None
-            )
+            async with self._llm_slot(state, messages) as lease:
+                response = await self.llm.ainvoke(
+                    messages,
+                    tools=tool_schemas if tool_schemas else None
+                )
+                lease.record_usage(self._total_tokens(response))
 
             # Update state
             state["messages"].append(response)
@@ -180,35 +286,34 @@ class BaseAgent(ABC):
                 state["next_action"] = "complete"
                 return state
 
-            # Execute each tool call
-            tool_results = []
+            # Execute the tool calls; independent ones run concurrently
+            calls = [(tool_call["name"], tool_call["args"]) for tool_call in last_message.tool_calls]
+            logger.info(f"{self.agent_type}: Executing tools {[name for name, _ in calls]}")
 
-            for tool_call in last_message.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-
-                logger.info(f"{self.agent_type}: Executing tool {tool_name}")
-
-                # Execute tool
-                result = await tool_registry.execute_tool(
-                    name=tool_name,
-                    arguments=tool_args,
-                    agent_type=self.agent_type,
-                    workflow_id=state.get("workflow_id"),
-                    db=self.db
-                )
+            results = await tool_registry.execute_tools(
+                calls,
+                agent_type=self.agent_type,
+                workflow_id=state.get("workflow_id"),
+                db=self.db
+            )
 
-                tool_results.append({
+            # Record results in the order the model asked for them
+            timestamp = datetime.now(timezone.utc).isoformat()
+            tool_results = [
+                {
                     "tool_name": tool_name,
                     "arguments": tool_args,
                     "result": result,
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                })
+                    "timestamp": timestamp
+                }
+                for (tool_name, tool_args), result in zip(calls, results)
+            ]
 
-                # Add to actions taken
-                if "actions_taken" not in state:
-                    state["actions_taken"] = []
-                state["actions_taken"].append(tool_results[-1])
+            # Add to actions taken
+            if "actions_taken" not in state:
+                state["actions_taken"] = []
+            state["actions_taken"].extend(tool_results)
+            state["tool_cache"] = tool_registry.cache_stats(state.get("workflow_id"))
 
             # Add tool results to messages
             # LangGraph will handle this automatically based on tool_calls
@@ -242,9 +347,12 @@ class BaseAgent(ABC):
             Please provide a brief summary of what was accomplished and whether the goal was achieved.
             """
 
-            messages = state["messages"] + [HumanMessage(content=reflection_prompt)]
+            reflection = [HumanMessage(content=reflection_prompt)]
+            messages = self._trimmed_history(state, reflection) + reflection
 
-            response = await self.llm.ainvoke(messages)
+            async with self._llm_slot(state, messages) as lease:
+                response = await self.llm.ainvoke(messages)
+                lease.record_usage(self._total_tokens(response))
 
             state["messages"].append(response)
             state["next_action"] = "complete"
@@ -288,7 +396,8 @@ class BaseAgent(ABC):
         entity_type: str = None,
         entity_id: int = None,
         context: Dict[str, Any] = None,
-        workflow_id: int = None
+        workflow_id: int = None,
+        db = None
     ) -> Dict[str, Any]:
         """
         Run the agent with a specific goal.
@@ -299,10 +408,12 @@ class BaseAgent(ABC):
             entity_id: ID of the entity
             context: Additional context for the agent
             workflow_id: Associated workflow ID
+            db: Database session for this run's tool calls
 
         Returns:
             Dict with result, actions taken, and state
         """
+        session_token = _run_db.set(db) if db is not None else None
         try:
             logger.info(f"{self.agent_type}: Starting run with goal '{goal}'")
 
@@ -318,29 +429,73 @@ class BaseAgent(ABC):
                 "actions_taken": [],
                 "requires_review": False,
                 "confidence": 1.0,
-                "error": None
+                "error": None,
+                "tool_cache": {}
             }
 
             # Run the graph
+            tool_registry.open_cache(workflow_id)
             config = {"configurable": {"thread_id": f"{workflow_id or 'default'}"}}
             final_state = await self.graph.ainvoke(initial_state, config)
 
             logger.info(f"{self.agent_type}: Run complete with {len(final_state.get('actions_taken', []))} actions")
 
+            return self._run_result(final_state)
+
+        except Exception as e:
+            logger.error(f"{self.agent_type}: Run failed - {str(e)}", exc_info=True)
             return {
-                "success": final_state.get("error") is None,
-                "actions_taken": final_state.get("actions_taken", []),
-                "messages": [str(msg.content) for msg in final_state.get("messages", []) if hasattr(msg, 'content')],
-                "requires_review": final_state.get("requires_review", False),
-                "confidence": final_state.get("confidence", 1.0),
-                "error": final_state.get("error")
+                "success": False,
+                "error": str(e),
+                "actions_taken": [],
+                "requires_review": True
             }
 
+        finally:
+            tool_registry.close_cache(workflow_id)
+            if session_token is not None:
+                _run_db.reset(session_token)
+
+    async def resume(self, workflow_id: int, db = None) -> Dict[str, Any]:
+        """
+        Continue an interrupted run from its last checkpoint (e.g. after the
+        process running it stopped). A run that already finished returns its
+        final state without doing anything.
+        """
+        session_token = _run_db.set(db) if db is not None else None
+        try:
+            config = {"configurable": {"thread_id": str(workflow_id)}}
+            snapshot = await self.graph.aget_state(config)
+            if not snapshot or not snapshot.values:
+                return {"success": False, "error": "No checkpoint for this workflow", "actions_taken": []}
+
+            logger.info(f"{self.agent_type}: Resuming workflow {workflow_id} at {snapshot.next or 'end'}")
+            tool_registry.open_cache(workflow_id)
+            final_state = await self.graph.ainvoke(None, config) if snapshot.next else snapshot.values
+            return self._run_result(final_state)
+
         except Exception as e:
-            logger.error(f"{self.agent_type}: Run failed - {str(e)}", exc_info=True)
+            logger.error(f"{self.agent_type}: Resume failed - {str(e)}", exc_info=True)
             return {
                 "success": False,
                 "error": str(e),
                 "actions_taken": [],
                 "requires_review": True
             }
+
+        finally:
+            tool_registry.close_cache(workflow_id)
+            if session_token is not None:
+                _run_db.reset(session_token)
+
+    @staticmethod
+    def _run_result(final_state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": final_state.get("error") is None,
+            "actions_taken": final_state.get("actions_taken", []),
+            "messages": [str(msg.content) for msg in final_state.get("messages", []) if hasattr(msg, 'content')],
+            "requires_review": final_state.get("requires_review", False),
+            "confidence": final_state.get("confidence", 1.0),
+            "error": final_state.get("error"),
+            "tool_cache": final_state.get("tool_cache", {})
+        }
@@ -0,0 +1,368 @@
+"""
+Agent Checkpointer
+
+LangGraph checkpoint saver backed by the application database (SQLite or
+Postgres through SQLAlchemy), replacing the per-agent in-memory MemorySaver
+that kept every workflow's state for the life of the process.
+
+- Compact: checkpoints are serialized with LangGraph's serializer and
+  zlib-compressed, and only the newest AGENT_CHECKPOINT_KEEP checkpoints of
+  a thread (one thread per workflow) are kept.
+- Evicting: threads of workflows that completed without needing review are
+  dropped when the run ends; everything else expires after
+  AGENT_CHECKPOINT_TTL_HOURS, except workflows still running or awaiting
+  review, which are kept up to AGENT_CHECKPOINT_MAX_AGE_DAYS so they can be
+  resumed from their last checkpoint (AgentManager.resume_workflow).
+"""
+import os
+import zlib
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+
+try:
+    from langgraph.checkpoint.base import WRITES_IDX_MAP
+except ImportError:
+    WRITES_IDX_MAP = {}
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP = 3
+DEFAULT_TTL_HOURS = 24
+DEFAULT_MAX_AGE_DAYS = 7
+COMPRESS_MIN_BYTES = 512
+PURGE_CHUNK = 500
+
+# Workflows in these states (or with pending review items) keep checkpoints past the TTL
+RESUMABLE_STATUSES = ("pending", "running")
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class SQLCheckpointSaver(BaseCheckpointSaver):
+    """Checkpoints in agent_checkpoints / agent_checkpoint_writes"""
+
+    def __init__(self, serde=None):
+        super().__init__(serde=serde)
+        self.keep = int(os.getenv("AGENT_CHECKPOINT_KEEP", DEFAULT_KEEP))
+        self.ttl_hours = float(os.getenv("AGENT_CHECKPOINT_TTL_HOURS", DEFAULT_TTL_HOURS))
+        self.max_age_days = float(os.getenv("AGENT_CHECKPOINT_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS))
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        type_, payload = self.serde.dumps_typed(value)
+        if len(payload) >= COMPRESS_MIN_BYTES:
+            return f"{type_}+zlib", zlib.compress(payload)
+        return type_, payload
+
+    def _loads(self, type_: str, payload: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, payload = type_[:-len("+zlib")], zlib.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+    # ------------------------------------------------------------------
+    # Sync API
+    # ------------------------------------------------------------------
+
+    def _tuple(self, db, row) -> CheckpointTuple:
+        from main import AgentCheckpointWrite
+
+        writes = db.query(AgentCheckpointWrite).filter(
+            AgentCheckpointWrite.thread_id == row.thread_id,
+            AgentCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+            AgentCheckpointWrite.checkpoint_id == row.checkpoint_id
+        ).order_by(AgentCheckpointWrite.task_id, AgentCheckpointWrite.idx).all()
+
+        return CheckpointTuple(
+            config=_thread_config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint=self._loads(row.type, row.checkpoint),
+            metadata=self._loads(row.metadata_type, row.meta_data),
+            parent_config=(
+                _thread_config(row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id)
+                if row.parent_checkpoint_id else None
+            ),
+            pending_writes=[(w.task_id, w.channel, self._loads(w.type, w.value)) for w in writes]
+        )
+
+    def get_tuple(self, config: Dict[str, Any]) -> Optional[CheckpointTuple]:
+        from main import SessionLocal, AgentCheckpoint
+
+        configurable = config["configurable"]
+        db = SessionLocal()
+        try:
+            query = db.query(AgentCheckpoint).filter(
+                AgentCheckpoint.thread_id == str(configurable["thread_id"]),
+                AgentCheckpoint.checkpoint_ns == configurable.get("checkpoint_ns", "")
+            )
+            if configurable.get("checkpoint_id"):
+                query = query.filter(AgentCheckpoint.checkpoint_id == configurable["checkpoint_id"])
+            # Checkpoint ids are time-ordered, so the greatest is the newest
+            row = query.order_by(AgentCheckpoint.checkpoint_id.desc()).first()
+            return self._tuple(db, row) if row else None
+        finally:
+            db.close()
+
+    def list(
+        self,
+        config: Optional[Dict[str, Any]],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        from main import SessionLocal, AgentCheckpoint
+
+        db = SessionLocal()
+        try:
+            query = db.query(AgentCheckpoint)
+            if config:
+                configurable = config["configurable"]
+                query = query.filter(AgentCheckpoint.thread_id == str(configurable["thread_id"]))
+                if "checkpoint_ns" in configurable:
+                    query = query.filter(AgentCheckpoint.checkpoint_ns == configurable["checkpoint_ns"])
+            if before and before["configurable"].get("checkpoint_id"):
+                query = query.filter(AgentCheckpoint.checkpoint_id < before["configurable"]["checkpoint_id"])
+
+            yielded = 0
+            for row in query.order_by(AgentCheckpoint.checkpoint_id.desc()):
+                checkpoint_tuple = self._tuple(db, row)
+                if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                yield checkpoint_tuple
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    break
+        finally:
+            db.close()
+
+    def put(
+        self,
+        config: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        metadata: Dict[str, Any],
+        new_versions: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        from main import SessionLocal, AgentCheckpoint, AgentCheckpointWrite
+
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        type_, payload = self._dumps(checkpoint)
+        metadata_type, metadata_payload = self._dumps(metadata)
+
+        db = SessionLocal()
+        try:
+            db.query(AgentCheckpoint).filter(
+                AgentCheckpoint.thread_id == thread_id,
+                AgentCheckpoint.checkpoint_ns == checkpoint_ns,
+                AgentCheckpoint.checkpoint_id == checkpoint["id"]
+            ).delete(synchronize_session=False)
+            db.add(AgentCheckpoint(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=configurable.get("checkpoint_id"),
+                type=type_,
+                checkpoint=payload,
+                metadata_type=metadata_type,
+                meta_data=metadata_payload,
+                created_at=datetime.now(timezone.utc)
+            ))
+
+            # Keep only the newest few checkpoints of the thread (no time travel needed)
+            stale_ids = [
+                row.checkpoint_id for row in db.query(AgentCheckpoint.checkpoint_id).filter(
+                    AgentCheckpoint.thread_id == thread_id,
+                    AgentCheckpoint.checkpoint_ns == checkpoint_ns,
+                    AgentCheckpoint.checkpoint_id < checkpoint["id"]
+                ).order_by(AgentCheckpoint.checkpoint_id.desc()).offset(max(0, self.keep - 1))
+            ]
+            if stale_ids:
+                for model in (AgentCheckpoint, AgentCheckpointWrite):
+                    db.query(model).filter(
+                        model.thread_id == thread_id,
+                        model.checkpoint_ns == checkpoint_ns,
+                        model.checkpoint_id.in_(stale_ids)
+                    ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        return _thread_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: Dict[str, Any],
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        from main import SessionLocal, AgentCheckpointWrite
+
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+
+        db = SessionLocal()
+        try:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                db.query(AgentCheckpointWrite).filter(
+                    AgentCheckpointWrite.thread_id == thread_id,
+                    AgentCheckpointWrite.checkpoint_ns == checkpoint_ns,
+                    AgentCheckpointWrite.checkpoint_id == checkpoint_id,
+                    AgentCheckpointWrite.task_id == task_id,
+                    AgentCheckpointWrite.idx == idx
+                ).delete(synchronize_session=False)
+                type_, payload = self._dumps(value)
+                db.add(AgentCheckpointWrite(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint_id,
+                    task_id=task_id,
+                    idx=idx,
+                    channel=channel,
+                    type=type_,
+                    value=payload
+                ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._delete_threads([str(thread_id)])
+
+    # ------------------------------------------------------------------
+    # Async API (database work runs in a thread)
+    # ------------------------------------------------------------------
+
+    async def aget_tuple(self, config: Dict[str, Any]) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[Dict[str, Any]],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        metadata: Dict[str, Any],
+        new_versions: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: Dict[str, Any],
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def _delete_threads(self, thread_ids: List[str]):
+        from main import SessionLocal, AgentCheckpoint, AgentCheckpointWrite
+
+        db = SessionLocal()
+        try:
+            for start in range(0, len(thread_ids), PURGE_CHUNK):
+                chunk = thread_ids[start:start + PURGE_CHUNK]
+                for model in (AgentCheckpointWrite, AgentCheckpoint):
+                    db.query(model).filter(model.thread_id.in_(chunk)).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        """Drop threads idle past the TTL (resumable workflows: past the max age). Returns threads dropped."""
+        from sqlalchemy import func
+        from main import SessionLocal, AgentCheckpoint, AgentWorkflow, AgentReviewQueue
+
+        now = datetime.now(timezone.utc)
+        ttl_cutoff = now - timedelta(hours=self.ttl_hours)
+        max_age_cutoff = now - timedelta(days=self.max_age_days)
+
+        db = SessionLocal()
+        try:
+            idle = db.query(AgentCheckpoint.thread_id, func.max(AgentCheckpoint.created_at)).group_by(
+                AgentCheckpoint.thread_id
+            ).having(func.max(AgentCheckpoint.created_at) < ttl_cutoff).all()
+
+            workflow_ids = [int(thread_id) for thread_id, _ in idle if thread_id.isdigit()]
+            resumable = set()
+            for start in range(0, len(workflow_ids), PURGE_CHUNK):
+                chunk = workflow_ids[start:start + PURGE_CHUNK]
+                resumable.update(
+                    str(row.id) for row in db.query(AgentWorkflow.id).filter(
+                        AgentWorkflow.id.in_(chunk),
+                        AgentWorkflow.status.in_(RESUMABLE_STATUSES)
+                    )
+                )
+                resumable.update(
+                    str(row.workflow_id) for row in db.query(AgentReviewQueue.workflow_id).filter(
+                        AgentReviewQueue.workflow_id.in_(chunk),
+                        AgentReviewQueue.status == "pending"
+                    )
+                )
+        finally:
+            db.close()
+
+        def last_written(moment: datetime) -> datetime:
+            return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+        expired = [
+            thread_id for thread_id, last in idle
+            if thread_id not in resumable or last_written(last) < max_age_cutoff
+        ]
+        if expired:
+            self._delete_threads(expired)
+            logger.info(f"Evicted checkpoints of {len(expired)} agent workflows")
+        return len(expired)
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """Checkpointer for agent graphs: database-backed unless AGENT_CHECKPOINTER=memory (tests)"""
+    if os.getenv("AGENT_CHECKPOINTER", "database") == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+    return SQLCheckpointSaver()
+
+
+# Global instance (shared by all agent graphs; threads are keyed by workflow id)
+checkpoint_saver = create_checkpointer()
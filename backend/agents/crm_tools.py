@@ -6,6 +6,7 @@ These tools are registered with the ToolRegistry and made available to agents
 based on their permissions.
 """
 
+import asyncio
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
@@ -32,9 +33,10 @@ logger = logging.getLogger(__name__)
         },
         "required": ["lead_id", "new_stage"]
     },
-    permissions=["leads:write"]
+    permissions=["leads:write"],
+    conflict_keys=["lead_id"]
 )
-async def update_lead_stage(lead_id: int, new_stage: str, notes: str = None, db: Session = None) -> Dict[str, Any]:
+def update_lead_stage(lead_id: int, new_stage: str, notes: str = None, db: Session = None) -> Dict[str, Any]:
     """Update lead stage"""
     try:
         from main import Lead
@@ -83,9 +85,11 @@ async def update_lead_stage(lead_id: int, new_stage: str, notes: str = None, db:
         },
         "required": ["lead_id"]
     },
-    permissions=["leads:read"]
+    permissions=["leads:read"],
+    conflict_keys=["lead_id"],
+    cacheable=True
 )
-async def get_lead_info(lead_id: int, db: Session = None) -> Dict[str, Any]:
+def get_lead_info(lead_id: int, db: Session = None) -> Dict[str, Any]:
     """Get lead information"""
     try:
         from main import Lead
@@ -136,9 +140,10 @@ async def get_lead_info(lead_id: int, db: Session = None) -> Dict[str, Any]:
         },
         "required": ["title", "assigned_to_id"]
     },
-    permissions=["tasks:write"]
+    permissions=["tasks:write"],
+    conflict_keys=["lead_id", "loan_id"]
 )
-async def create_task(
+def create_task(
     title: str,
     assigned_to_id: int,
     description: str = None,
@@ -202,7 +207,8 @@ async def create_task(
         },
         "required": ["phone", "message"]
     },
-    permissions=["communications:send"]
+    permissions=["communications:send"],
+    conflict_keys=["phone", "lead_id", "loan_id"]
 )
 async def send_sms(
     phone: str,
@@ -226,8 +232,9 @@ async def send_sms(
 
         client = Client(account_sid, auth_token)
 
-        # Send message
-        twilio_message = client.messages.create(
+        # Send message (blocking client, so off the event loop)
+        twilio_message = await asyncio.to_thread(
+            client.messages.create,
             body=message,
             from_=from_phone,
             to=phone
@@ -276,9 +283,10 @@ async def send_sms(
         },
         "required": ["to_email", "subject", "body"]
     },
-    permissions=["communications:send"]
+    permissions=["communications:send"],
+    conflict_keys=["to_email", "lead_id", "loan_id"]
 )
-async def send_email(
+def send_email(
     to_email: str,
     subject: str,
     body: str,
@@ -339,9 +347,10 @@ async def send_email(
         },
         "required": ["lead_id", "user_id", "start_time"]
     },
-    permissions=["calendar:write"]
+    permissions=["calendar:write"],
+    conflict_keys=["lead_id", "user_id"]
 )
-async def book_calendar_slot(
+def book_calendar_slot(
     lead_id: int,
     user_id: int,
     start_time: str,
@@ -408,9 +417,10 @@ async def book_calendar_slot(
         },
         "required": ["content"]
     },
-    permissions=["notes:write"]
+    permissions=["notes:write"],
+    conflict_keys=["lead_id", "loan_id"]
 )
-async def add_note(
+def add_note(
     content: str,
     lead_id: int = None,
     loan_id: int = None,
@@ -444,3 +454,42 @@ async def add_note(
     except Exception as e:
         logger.error(f"Failed to add note: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
+
+
+# ============================================================================
+# MEMORY TOOLS
+# ============================================================================
+
+@tool(
+    name="search_memory",
+    description="Find stored memories (past outcomes, approved examples) most similar to a query",
+    parameters={
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "What to look for, in natural language"},
+            "agent_type": {"type": "string", "description": "Memory owner (e.g. task_drafting, receptionist)"},
+            "memory_type": {"type": "string", "description": "Kind of memory (e.g. approved_example, outcome)"},
+            "k": {"type": "integer", "description": "Number of results (default 5)"}
+        },
+        "required": ["query", "agent_type", "memory_type"]
+    },
+    permissions=["memory:read"],
+    read_only=True
+)
+async def search_memory(
+    query: str,
+    agent_type: str,
+    memory_type: str,
+    k: int = 5,
+    db: Session = None
+) -> Dict[str, Any]:
+    """Top-k similar memories from the vector store"""
+    try:
+        from services.vector_store import vector_store
+
+        memories = await vector_store.search(query, agent_type, memory_type, k=min(k, 20))
+        return {"success": True, "memories": memories}
+
+    except Exception as e:
+        logger.error(f"Failed to search memory: {e}", exc_info=True)
+        return {"success": False, "error": str(e)}
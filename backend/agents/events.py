@@ -6,13 +6,25 @@ Handles event-driven agent triggers including:
 - Time-based triggers (scheduled tasks)
 - External webhooks
 - Manual triggers
+
+Events are persisted in the agent_events outbox table and dispatched from
+there (see EventBus), so pending triggers survive restarts and deploys.
+
+High-frequency entity events (updates, stage changes) are coalesced: a
+burst for the same entity within the event type's window becomes a single
+event carrying the latest state and the list of changes.
 """
 
+import os
+import time
+import uuid
 import logging
 import asyncio
-from typing import Dict, Any, List, Callable, Optional
-from datetime import datetime, timezone
+from collections import defaultdict, deque
+from typing import Dict, Any, List, Optional, Set, Tuple
+from datetime import datetime, timedelta, timezone
 from enum import Enum
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -62,6 +74,11 @@ class Event(BaseModel):
     data: Dict[str, Any] = {}
     timestamp: datetime
     source: Optional[str] = None
+    tenant_id: Optional[int] = None  # User the event belongs to (fair scheduling, LLM budget)
+    id: Optional[int] = None  # agent_events row (database backend)
+    attempts: int = 0
+    claim_token: Optional[str] = None
+    started_runs: List[str] = []  # Handler runs started by earlier attempts (see _handle_event)
 
 
 class EventHandler(BaseModel):
@@ -72,24 +89,160 @@ class EventHandler(BaseModel):
     permissions: List[str] = []
     conditions: Optional[Dict[str, Any]] = None
     priority: int = 0
+    # Run once per coalesced event instead of once per change it merged
+    debounce: bool = False
 
     class Config:
         arbitrary_types_allowed = True
 
 
+class EventHandlingError(Exception):
+    """A handler could not start its workflow; the event is retried"""
+
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_POLL_SECONDS = 10
+DEFAULT_VISIBILITY_TIMEOUT_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BASE_SECONDS = 30
+DEFAULT_RETRY_MAX_SECONDS = 3600
+DEFAULT_WORKERS = 8
+DEFAULT_TENANT_CONCURRENCY = 4
+DEFAULT_AGENT_CONCURRENCY = 4
+DEAD_LETTER_MEMORY_LIMIT = 100
+LATENCY_SAMPLES = 200
+
+# Seconds an entity event waits for more of the same before dispatch
+DEFAULT_COALESCE_WINDOWS = "lead.updated=30,loan.updated=30,lead.stage_changed=10,loan.status_changed=10"
+# A coalesced event stops absorbing changes at this size; the next change starts a new one
+COALESCE_MAX_CHANGES = 100
+
+# Event data keys that identify the user an event belongs to, in order of preference
+TENANT_KEYS = ("user_id", "owner_id", "assigned_to_id")
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    """Parse "receptionist=4,pipeline_ops=2" into {"receptionist": 4, "pipeline_ops": 2}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, limit = item.partition("=")
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+def _event_tenant(data: Dict[str, Any]) -> Optional[int]:
+    for key in TENANT_KEYS:
+        if isinstance(data.get(key), int):
+            return data[key]
+    return None
+
+
+def _coalesce_data(merged: Dict[str, Any], data: Dict[str, Any], timestamp: datetime) -> Dict[str, Any]:
+    """
+    Fold one more change into a coalesced event's data: later values win,
+    except old_* keys (e.g. old_stage), which keep the state before the
+    burst. Every change is kept, in order, under "changes".
+    """
+    data = jsonable_encoder(data)
+    result = {**merged, **data}
+    for key, value in merged.items():
+        if key.startswith("old_"):
+            result[key] = value
+    result["changes"] = [*merged.get("changes", []), {**data, "changed_at": timestamp.isoformat()}]
+    return result
+
+
 class EventBus:
     """
     Central event bus for agent triggers.
 
     Routes events to appropriate agents based on registered handlers.
+
+    With the database backend (default) events are written to the
+    agent_events outbox and survive restarts. A dispatcher claims pending
+    rows with SELECT ... FOR UPDATE SKIP LOCKED, so several processes can
+    share the table; a claim hides the row for the visibility timeout, after
+    which a crashed dispatcher's events become claimable again. While this
+    process holds a claim (buffered, waiting on a limit, or running) a
+    heartbeat keeps pushing the timeout out, so only a dead dispatcher's
+    events expire. Claims are fenced by claim token and attempt number:
+    an event whose claim was lost is neither started nor settled. Failed
+    events are retried with exponential backoff and dead-lettered after
+    EVENT_BUS_MAX_ATTEMPTS.
+
+    Claimed events are run by a fixed pool of EVENT_BUS_WORKERS workers:
+    - Backpressure: the dispatcher only claims while fewer than
+      EVENT_BUS_MAX_PENDING events are buffered or running, so the backlog
+      stays in the outbox (memory backend: emit() waits for room).
+    - Fairness: claims take an even share of due events per tenant, and
+      workers pick round-robin across tenants, at most
+      EVENT_BUS_TENANT_CONCURRENCY at a time per tenant.
+    - Per-agent limits: EVENT_BUS_AGENT_CONCURRENCY (e.g.
+      "receptionist=4,pipeline_ops=2") caps concurrent workflows per agent
+      type, EVENT_BUS_AGENT_DEFAULT_CONCURRENCY for the rest.
+
+    Coalescing: event types with a window in EVENT_BUS_COALESCE_WINDOWS
+    (e.g. "lead.updated=30") are held for that many seconds after the first
+    event for an entity; further events for the same entity merge into it
+    (latest values, plus data["changes"] with every change in order).
+    Handlers registered with debounce=True run once for the merged event;
+    other handlers still run once per change.
+
+    EVENT_BUS_BACKEND=memory keeps events in process with the same retry
+    semantics (tests, local scripts).
     """
 
-    def __init__(self, db_session=None):
+    def __init__(self, backend: str = None):
         self._handlers: Dict[EventType, List[EventHandler]] = {}
-        self._event_queue: asyncio.Queue = asyncio.Queue()
-        self._processing: bool = False
-        self._db_session = db_session
-        logger.info("EventBus initialized")
+        self.backend = backend or os.getenv("EVENT_BUS_BACKEND", "database")
+        self.batch_size = int(os.getenv("EVENT_BUS_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.poll_seconds = float(os.getenv("EVENT_BUS_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+        self.visibility_timeout_seconds = int(
+            os.getenv("EVENT_BUS_VISIBILITY_TIMEOUT_SECONDS", DEFAULT_VISIBILITY_TIMEOUT_SECONDS)
+        )
+        self.max_attempts = int(os.getenv("EVENT_BUS_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+        self.retry_base_seconds = float(os.getenv("EVENT_BUS_RETRY_BASE_SECONDS", DEFAULT_RETRY_BASE_SECONDS))
+        self.retry_max_seconds = float(os.getenv("EVENT_BUS_RETRY_MAX_SECONDS", DEFAULT_RETRY_MAX_SECONDS))
+        self.heartbeat_seconds = self.visibility_timeout_seconds / 3
+
+        self.workers = int(os.getenv("EVENT_BUS_WORKERS", DEFAULT_WORKERS))
+        self.max_pending = int(os.getenv("EVENT_BUS_MAX_PENDING", 2 * self.workers))
+        self.tenant_concurrency = int(os.getenv("EVENT_BUS_TENANT_CONCURRENCY", DEFAULT_TENANT_CONCURRENCY))
+        self.agent_default_concurrency = int(
+            os.getenv("EVENT_BUS_AGENT_DEFAULT_CONCURRENCY", DEFAULT_AGENT_CONCURRENCY)
+        )
+        self.agent_concurrency = _parse_limits(os.getenv("EVENT_BUS_AGENT_CONCURRENCY", ""))
+        self.coalesce_windows = {
+            EventType(event_type): seconds
+            for event_type, seconds in _parse_limits(
+                os.getenv("EVENT_BUS_COALESCE_WINDOWS", DEFAULT_COALESCE_WINDOWS)
+            ).items()
+            if seconds > 0
+        }
+
+        # Claimed events waiting for a worker, per tenant; dict order is the round-robin order
+        self._ready: Dict[Optional[int], deque] = {}
+        self._ready_count = 0
+        self._in_flight_tenants: Dict[Optional[int], int] = defaultdict(int)
+        self._in_flight_agents: Dict[str, int] = defaultdict(int)
+        self._agent_slots: Dict[str, asyncio.Semaphore] = {}
+        self._latency: Dict[str, deque] = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+        self._dead_letters: deque = deque(maxlen=DEAD_LETTER_MEMORY_LIMIT)
+        # Outbox id -> event this process holds a claim on, until settled or released
+        self._claimed: Dict[int, Event] = {}
+        # (event type, entity type, entity id) -> event being coalesced (memory backend)
+        self._coalescing: Dict[Tuple[EventType, Optional[str], int], Event] = {}
+
+        self._changed: Optional[asyncio.Condition] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self.stats = {"emitted": 0, "coalesced": 0, "handled": 0, "retried": 0, "dead_lettered": 0}
+        logger.info(f"EventBus initialized ({self.backend} backend)")
+
+    @property
+    def durable(self) -> bool:
+        return self.backend == "database"
 
     def register_handler(
         self,
@@ -98,7 +251,8 @@ class EventBus:
         goal_template: str,
         permissions: List[str] = None,
         conditions: Dict[str, Any] = None,
-        priority: int = 0
+        priority: int = 0,
+        debounce: bool = False
     ):
         """
         Register an event handler.
@@ -110,6 +264,8 @@ class EventBus:
             permissions: List of permissions for the agent
             conditions: Optional conditions that must be met (e.g., {"stage": "new"})
             priority: Handler priority (higher = runs first)
+            debounce: Run once per coalesced event (latest state in the data,
+                every change in data["changes"]) rather than once per change
         """
         handler = EventHandler(
             event_type=event_type,
@@ -117,7 +273,8 @@ class EventBus:
             goal_template=goal_template,
             permissions=permissions or [],
             conditions=conditions,
-            priority=priority
+            priority=priority,
+            debounce=debounce
         )
 
         if event_type not in self._handlers:
@@ -136,7 +293,9 @@ class EventBus:
         entity_type: str = None,
         entity_id: int = None,
         data: Dict[str, Any] = None,
-        source: str = None
+        source: str = None,
+        tenant_id: int = None,
+        delay_seconds: float = 0
     ):
         """
         Emit an event to the bus.
@@ -147,97 +306,676 @@ class EventBus:
             entity_id: ID of the entity
             data: Event data/payload
             source: Source of the event
+            tenant_id: User the event belongs to, for fair scheduling
+                (defaults to data["user_id"], "owner_id" or "assigned_to_id")
+            delay_seconds: Don't dispatch the event before this many seconds
+                from now (e.g. jitter for scheduled fan-out)
+
+        Returns:
+            The emitted Event (with its outbox id on the database backend);
+            for a coalesced event type, the event it was merged into
         """
+        data = data or {}
         event = Event(
             event_type=event_type,
             entity_type=entity_type,
             entity_id=entity_id,
-            data=data or {},
+            data=data,
             timestamp=datetime.now(timezone.utc),
-            source=source
+            source=source,
+            tenant_id=tenant_id if tenant_id is not None else _event_tenant(data)
         )
+        window = self.coalesce_windows.get(event_type) if entity_id is not None else None
+
+        if self.durable:
+            # Own session in a thread: a coalescing merge may wait on the
+            # pending row's lock, which must not stall the event loop. To
+            # write an event atomically with other changes use add_to_outbox.
+            merged = await asyncio.to_thread(self._insert, event, window, delay_seconds)
+            if not window and not delay_seconds:
+                self.notify()
+        elif window:
+            merged = self._coalesce(event, window)
+        elif delay_seconds:
+            merged = False
+            if not self._running:
+                self.start()
+            asyncio.get_running_loop().call_later(
+                delay_seconds, lambda: asyncio.create_task(self._enqueue(event))
+            )
+        else:
+            merged = False
+            if not self._running:
+                self.start()
+            async with self._changed:
+                # Backpressure: wait until the workers have room
+                await self._changed.wait_for(lambda: self._depth() < self.max_pending)
+                self._push(event)
+                self._changed.notify_all()
+
+        self.stats["coalesced" if merged else "emitted"] += 1
+        logger.info(
+            f"Event {'coalesced' if merged else 'emitted'}: {event_type.value} (entity={entity_type}:{entity_id})"
+        )
+        return event
+
+    def _coalesce(self, event: Event, window: float) -> bool:
+        """Hold an entity event for its window, merging later ones in (memory backend). Returns True if merged."""
+        key = (event.event_type, event.entity_type, event.entity_id)
+        held = self._coalescing.get(key)
+        if held is not None and len(held.data["changes"]) < COALESCE_MAX_CHANGES:
+            held.data = _coalesce_data(held.data, event.data, event.timestamp)
+            held.tenant_id = event.tenant_id if event.tenant_id is not None else held.tenant_id
+            event.data = held.data
+            return True
+
+        if not self._running:
+            self.start()
+        event.data = _coalesce_data({}, event.data, event.timestamp)
+        self._coalescing[key] = event
+
+        def release():
+            if self._coalescing.get(key) is event:
+                del self._coalescing[key]
+            if self._running:
+                asyncio.create_task(self._enqueue(event))
+
+        asyncio.get_running_loop().call_later(window, release)
+        return False
+
+    # ------------------------------------------------------------------
+    # Outbox storage (sync; run in a thread with their own session)
+    # ------------------------------------------------------------------
+
+    def _insert(self, event: Event, window: float = None, delay: float = 0) -> bool:
+        """
+        Write an event to the outbox, due `delay` seconds from now. With a
+        coalescing window, merge it into the entity's pending, not-yet-claimed
+        event if there is one, else write it due at the end of the window.
+        Returns True if merged.
+        """
+        from main import SessionLocal, AgentEvent
 
-        await self._event_queue.put(event)
-        logger.info(f"Event emitted: {event_type.value} (entity={entity_type}:{entity_id})")
+        db = SessionLocal()
+        try:
+            if window:
+                query = db.query(AgentEvent).filter(
+                    AgentEvent.event_type == event.event_type.value,
+                    AgentEvent.entity_type == event.entity_type,
+                    AgentEvent.entity_id == event.entity_id,
+                    AgentEvent.status == "pending",
+                    AgentEvent.attempts == 0
+                ).order_by(AgentEvent.id.desc())
+                if db.bind.dialect.name == "postgresql":
+                    # Serializes merges into the row; a dispatcher claiming it skips it meanwhile
+                    query = query.with_for_update()
+                row = query.first()
+
+                if row is not None and len((row.data or {}).get("changes", [])) < COALESCE_MAX_CHANGES:
+                    row.data = _coalesce_data(row.data or {}, event.data, event.timestamp)
+                    if event.tenant_id is not None:
+                        row.tenant_id = event.tenant_id
+                    db.commit()
+                    event.id = row.id
+                    event.data = row.data
+                    return True
+
+                event.data = _coalesce_data({}, event.data, event.timestamp)
+
+            row = self._outbox_row(event, delay=(window or 0) + delay)
+            db.add(row)
+            db.commit()
+            event.id = row.id
+            return False
+        finally:
+            db.close()
+
+    def _outbox_row(self, event: Event, delay: float = 0):
+        from main import AgentEvent
+
+        return AgentEvent(
+            event_type=event.event_type.value,
+            entity_type=event.entity_type,
+            entity_id=event.entity_id,
+            tenant_id=event.tenant_id,
+            data=jsonable_encoder(event.data),
+            source=event.source,
+            status="pending",
+            available_at=event.timestamp + timedelta(seconds=delay),
+            created_at=event.timestamp
+        )
 
-        # Start processing if not already running
-        if not self._processing:
-            asyncio.create_task(self._process_events())
+    def add_to_outbox(self, db: Session, events: List[Event]):
+        """
+        Stage events in the caller's transaction, so they are written together
+        with the caller's changes or not at all (database backend only). Call
+        notify() once the caller has committed.
+        """
+        if not self.durable:
+            raise RuntimeError("add_to_outbox needs the database event bus backend")
+        db.add_all([self._outbox_row(event) for event in events])
+        self.stats["emitted"] += len(events)
 
-    async def _process_events(self):
-        """Process events from the queue"""
-        self._processing = True
+    def _claim_batch(self, limit: int) -> List[Event]:
+        """
+        Claim up to `limit` due events: pending rows whose retry time has
+        come, and processing rows whose visibility timeout expired. Each
+        tenant with due events gets an even share of the claim, so one
+        tenant's burst doesn't queue everyone else behind it.
+        """
+        from sqlalchemy import func
+        from main import SessionLocal, AgentEvent
+
+        token = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        due = (
+            AgentEvent.status.in_(("pending", "processing")),
+            AgentEvent.available_at <= now
+        )
 
+        db = SessionLocal()
         try:
-            while not self._event_queue.empty():
-                event = await self._event_queue.get()
-                await self._handle_event(event)
-                self._event_queue.task_done()
+            tenants = [
+                tenant for tenant, in db.query(AgentEvent.tenant_id).filter(*due)
+                .group_by(AgentEvent.tenant_id)
+                .order_by(func.min(AgentEvent.available_at))
+                .limit(limit)
+            ]
+            share = max(1, limit // max(1, len(tenants)))
+
+            rows = []
+            for tenant in tenants:
+                if len(rows) >= limit:
+                    break
+                query = db.query(AgentEvent).filter(
+                    *due,
+                    AgentEvent.tenant_id.is_(None) if tenant is None else AgentEvent.tenant_id == tenant
+                ).order_by(AgentEvent.available_at, AgentEvent.id).limit(min(share, limit - len(rows)))
+                if db.bind.dialect.name == "postgresql":
+                    # Rows locked by another dispatcher's claim are skipped, not waited on
+                    query = query.with_for_update(skip_locked=True)
+                rows.extend(query.all())
+
+            for row in rows:
+                row.status = "processing"
+                row.claim_token = token
+                row.claimed_at = now
+                row.available_at = now + timedelta(seconds=self.visibility_timeout_seconds)
+                row.attempts = (row.attempts or 0) + 1
+            db.commit()
+
+            return [
+                Event(
+                    id=row.id,
+                    event_type=EventType(row.event_type),
+                    entity_type=row.entity_type,
+                    entity_id=row.entity_id,
+                    data=row.data or {},
+                    timestamp=row.created_at,
+                    source=row.source,
+                    tenant_id=row.tenant_id,
+                    attempts=row.attempts,
+                    claim_token=token,
+                    started_runs=row.started_runs or []
+                )
+                for row in rows
+            ]
+        finally:
+            db.close()
 
-        except Exception as e:
-            logger.error(f"Event processing error: {str(e)}", exc_info=True)
+    def _settle(self, event: Event, error: Optional[str]):
+        """Ack a handled event; reschedule or dead-letter a failed one (error message set)"""
+        from main import SessionLocal, AgentEvent
+
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            row = db.query(AgentEvent).filter(
+                AgentEvent.id == event.id,
+                AgentEvent.claim_token == event.claim_token,
+                AgentEvent.attempts == event.attempts
+            ).first()
+            if row is None:
+                return  # Claim lost and another dispatcher owns the event now
+            if error is None:
+                row.status = "done"
+                row.completed_at = now
+            elif row.attempts >= self.max_attempts:
+                row.status = "dead"
+                row.last_error = error
+                row.started_runs = list(event.started_runs)
+                row.completed_at = now
+            else:
+                row.status = "pending"
+                row.last_error = error
+                row.started_runs = list(event.started_runs)
+                row.available_at = now + timedelta(seconds=self._retry_delay(row.attempts))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _renew_claims(self, events: List[Event]) -> Set[int]:
+        """Push the visibility timeout out for claims still held. Returns the ids still held."""
+        from main import SessionLocal, AgentEvent
+
+        if not events:
+            return set()
+        wanted = {event.id: event for event in events}
+        db = SessionLocal()
+        try:
+            rows = db.query(AgentEvent).filter(
+                AgentEvent.id.in_(list(wanted)),
+                AgentEvent.status == "processing"
+            ).all()
+            held = set()
+            available_at = datetime.now(timezone.utc) + timedelta(seconds=self.visibility_timeout_seconds)
+            for row in rows:
+                event = wanted[row.id]
+                if row.claim_token == event.claim_token and row.attempts == event.attempts:
+                    row.available_at = available_at
+                    held.add(row.id)
+            db.commit()
+            return held
+        finally:
+            db.close()
 
+    def _release(self, events: List[Event]):
+        """Hand claimed but unstarted events back to the outbox (shutdown)"""
+        from main import SessionLocal, AgentEvent
+
+        db = SessionLocal()
+        try:
+            for event in events:
+                db.query(AgentEvent).filter(
+                    AgentEvent.id == event.id,
+                    AgentEvent.claim_token == event.claim_token,
+                    AgentEvent.attempts == event.attempts
+                ).update({
+                    AgentEvent.status: "pending",
+                    AgentEvent.attempts: AgentEvent.attempts - 1,
+                    AgentEvent.available_at: datetime.now(timezone.utc),
+                    AgentEvent.claim_token: None
+                }, synchronize_session=False)
+            db.commit()
         finally:
-            self._processing = False
+            db.close()
+        for event in events:
+            self._claimed.pop(event.id, None)
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(0, attempts - 1))
+
+    def requeue(self, event_id: int) -> bool:
+        """Make a dead-lettered event pending again with a fresh attempt budget"""
+        from main import SessionLocal, AgentEvent
+
+        db = SessionLocal()
+        try:
+            updated = db.query(AgentEvent).filter(
+                AgentEvent.id == event_id,
+                AgentEvent.status == "dead"
+            ).update({
+                AgentEvent.status: "pending",
+                AgentEvent.attempts: 0,
+                AgentEvent.available_at: datetime.now(timezone.utc),
+                AgentEvent.completed_at: None
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        if updated:
+            self.notify()
+        return bool(updated)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _depth(self) -> int:
+        return self._ready_count + sum(self._in_flight_tenants.values())
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Counters, queue depth, in-flight workflows and handler latency (ms) per agent type"""
+        latency = {}
+        for agent_type, samples in self._latency.items():
+            ordered = sorted(samples)
+            latency[agent_type] = {
+                "samples": len(ordered),
+                "avg_ms": round(1000 * sum(ordered) / len(ordered)),
+                "p95_ms": round(1000 * ordered[int(0.95 * (len(ordered) - 1))])
+            }
+
+        stats = {
+            "backend": self.backend,
+            **self.stats,
+            "workers": self.workers,
+            "queue_depth": self._ready_count,
+            "in_flight_events": sum(self._in_flight_tenants.values()),
+            "in_flight_workflows": {k: v for k, v in self._in_flight_agents.items() if v},
+            "handler_latency": latency,
+        }
+        if not self.durable:
+            return {**stats, "dead": len(self._dead_letters)}
+        return {**stats, **await asyncio.to_thread(self._outbox_stats)}
+
+    def _outbox_stats(self) -> Dict[str, Any]:
+        """Outbox rows per status and how long the oldest due event has waited"""
+        from sqlalchemy import func
+        from main import SessionLocal, AgentEvent
+
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            outbox = dict(
+                db.query(AgentEvent.status, func.count(AgentEvent.id)).group_by(AgentEvent.status).all()
+            )
+            oldest = db.query(func.min(AgentEvent.available_at)).filter(
+                AgentEvent.status == "pending",
+                AgentEvent.available_at <= now
+            ).scalar()
+        finally:
+            db.close()
+
+        if oldest is not None and oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        return {
+            "outbox": outbox,
+            "oldest_due_seconds": round((now - oldest).total_seconds()) if oldest else 0
+        }
+
+    # ------------------------------------------------------------------
+    # Worker pool
+    # ------------------------------------------------------------------
+
+    def _push(self, event: Event):
+        self._ready.setdefault(event.tenant_id, deque()).append(event)
+        self._ready_count += 1
+
+    def _pop_fair(self) -> Optional[Event]:
+        """Next event round-robin across tenants that are under their concurrency cap"""
+        for tenant in list(self._ready):
+            if self._in_flight_tenants[tenant] >= self.tenant_concurrency:
+                continue
+            queue = self._ready.pop(tenant)
+            event = queue.popleft()
+            if queue:
+                self._ready[tenant] = queue  # Re-insert at the end: round-robin
+            self._ready_count -= 1
+            self._in_flight_tenants[tenant] += 1
+            return event
+        return None
+
+    async def _enqueue(self, event: Event):
+        async with self._changed:
+            self._push(event)
+            self._changed.notify_all()
+
+    async def _worker(self):
+        while self._running:
+            async with self._changed:
+                event = self._pop_fair()
+                while event is None:
+                    if not self._running:
+                        return
+                    await self._changed.wait()
+                    event = self._pop_fair()
+
+            try:
+                if self.durable and event.id not in await asyncio.to_thread(self._renew_claims, [event]):
+                    # Claim expired while buffered and another dispatcher took the event over
+                    logger.warning(f"Skipping event {event.id}: claim lost before it started")
+                    self._claimed.pop(event.id, None)
+                else:
+                    error = await self._dispatch(event)
+                    await self._finish(event, error)
+            except Exception as e:
+                logger.error(f"Event worker error: {e}", exc_info=True)
+            finally:
+                async with self._changed:
+                    self._in_flight_tenants[event.tenant_id] -= 1
+                    if not self._in_flight_tenants[event.tenant_id]:
+                        del self._in_flight_tenants[event.tenant_id]
+                    self._changed.notify_all()
+                self.notify()  # Room to claim more
+
+    async def _finish(self, event: Event, error: Optional[str]):
+        if self.durable:
+            try:
+                await asyncio.to_thread(self._settle, event, error)
+            finally:
+                self._claimed.pop(event.id, None)
+
+        if error is None:
+            self.stats["handled"] += 1
+        elif event.attempts >= self.max_attempts:
+            self.stats["dead_lettered"] += 1
+            logger.error(f"Event {event.event_type.value} dead-lettered after {event.attempts} attempts: {error}")
+            if not self.durable:
+                self._dead_letters.append((event, error))
+        else:
+            self.stats["retried"] += 1
+            if not self.durable:
+                asyncio.get_running_loop().call_later(
+                    self._retry_delay(event.attempts), lambda: asyncio.create_task(self._enqueue(event))
+                )
+
+    async def _run_claimer(self):
+        while self._running:
+            try:
+                while self._running and (room := self.max_pending - self._depth()) > 0:
+                    events = await asyncio.to_thread(self._claim_batch, min(room, self.batch_size))
+                    if not events:
+                        break
+                    self._claimed.update((event.id, event) for event in events)
+                    async with self._changed:
+                        for event in events:
+                            self._push(event)
+                        self._changed.notify_all()
+            except Exception as e:
+                logger.error(f"Event dispatcher error: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _run_heartbeat(self):
+        """Keep this process's claims alive until they are settled or released"""
+        while self._running:
+            await asyncio.sleep(self.heartbeat_seconds)
+            events = list(self._claimed.values())
+            try:
+                held = await asyncio.to_thread(self._renew_claims, events)
+            except Exception as e:
+                logger.error(f"Event claim heartbeat error: {e}", exc_info=True)
+                continue
+            for event in events:
+                if event.id not in held:
+                    # Lost to another dispatcher; the worker skips it or its settle is fenced off
+                    self._claimed.pop(event.id, None)
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    async def _dispatch(self, event: Event) -> Optional[str]:
+        """Run the handlers for an event. Returns None on success, else the error message."""
+        if not self.durable:
+            event.attempts += 1
+        try:
+            await self._handle_event(event)
+            return None
+        except Exception as e:
+            logger.error(
+                f"Event {event.event_type.value} (id={event.id}) failed on attempt {event.attempts}: {e}",
+                exc_info=True
+            )
+            return str(e) or type(e).__name__
+
+    def _agent_slot(self, agent_type: str) -> asyncio.Semaphore:
+        if agent_type not in self._agent_slots:
+            self._agent_slots[agent_type] = asyncio.Semaphore(
+                self.agent_concurrency.get(agent_type, self.agent_default_concurrency)
+            )
+        return self._agent_slots[agent_type]
 
     async def _handle_event(self, event: Event):
         """
         Handle a single event by triggering appropriate agents.
 
+        Handlers run concurrently (within their agent type's limit) and the
+        event is acknowledged once all of their workflows have finished.
+        Raises EventHandlingError when a workflow could not be started, so
+        the event is retried; a workflow that ran and failed is recorded on
+        its AgentWorkflow row instead (retrying it could repeat side effects
+        such as messages sent). Runs that started are noted in
+        event.started_runs, so a retry only re-runs the ones that did not.
+
         Args:
             event: Event to handle
         """
-        try:
-            handlers = self._handlers.get(event.event_type, [])
-
-            if not handlers:
-                logger.debug(f"No handlers registered for {event.event_type.value}")
+        # A coalesced event runs debounced handlers once, the others once per change
+        changes = event.data.get("changes") if event.event_type in self.coalesce_windows else None
+        runs = [
+            # Keyed by handler and change so a retry can tell which runs already started
+            (f"{handler.agent_type}:{handler.goal_template}:{index}", handler, data)
+            for handler in self._handlers.get(event.event_type, [])
+            for index, data in (
+                [("event", event.data)] if handler.debounce or not changes else enumerate(changes)
+            )
+            if not handler.conditions or self._check_conditions(handler.conditions, data)
+        ]
+        if event.event_type == EventType.MANUAL_TRIGGER and event.data.get("agent_type"):
+            # Workflow requested through the API (see emit_manual_trigger)
+            runs.append((f"manual:{event.data['agent_type']}", EventHandler(
+                event_type=event.event_type,
+                agent_type=event.data["agent_type"],
+                goal_template="{goal}",
+                permissions=event.data.get("permissions") or []
+            ), event.data))
+
+        if not runs:
+            logger.debug(f"No handlers matched for {event.event_type.value}")
+            return
+
+        if event.started_runs:
+            runs = [run for run in runs if run[0] not in event.started_runs]
+            if not runs:
+                logger.info(f"All handler runs for event {event.id} already started")
                 return
 
-            logger.info(f"Processing event {event.event_type.value} with {len(handlers)} handlers")
+        logger.info(f"Processing event {event.event_type.value} with {len(runs)} handler runs")
 
-            for handler in handlers:
-                # Check conditions
-                if handler.conditions and not self._check_conditions(handler.conditions, event.data):
-                    logger.debug(f"Conditions not met for handler {handler.agent_type}")
-                    continue
+        from main import SessionLocal
+        from integrations.llm_scheduler import llm_scheduler
+        from .manager import get_agent_manager
 
-                # Format goal from template
-                goal = handler.goal_template.format(**event.data)
+        agent_manager = get_agent_manager()
 
-                logger.info(f"Triggering agent {handler.agent_type} with goal: {goal}")
+        async def trigger(handler: EventHandler, data: Dict[str, Any]) -> Dict[str, Any]:
+            # Format goal from template
+            goal = handler.goal_template.format(**data)
 
-                # Trigger agent workflow via AgentManager
+            async with self._agent_slot(handler.agent_type):
+                logger.info(f"Triggering agent {handler.agent_type} with goal: {goal}")
+                self._in_flight_agents[handler.agent_type] += 1
+                started = time.monotonic()
+                # Each workflow gets its own pooled session; agent instances are shared
+                db = SessionLocal()
                 try:
-                    from .manager import get_agent_manager
-                    from .receptionist_agent import register_agents
-
-                    # Get DB session (passed during event emission or use stored one)
-                    if self._db_session:
-                        agent_manager = get_agent_manager(self._db_session)
-                        register_agents(agent_manager)
-
-                        # Start workflow asynchronously
-                        asyncio.create_task(
-                            agent_manager.start_workflow(
-                                agent_type=handler.agent_type,
-                                goal=goal,
-                                entity_type=event.entity_type,
-                                entity_id=event.entity_id,
-                                context=event.data,
-                                trigger_event=event.event_type.value,
-                                permissions=handler.permissions
-                            )
+                    # LLM calls in the workflow count against the event's tenant budget
+                    with llm_scheduler.context(tenant=event.tenant_id):
+                        return await agent_manager.start_workflow(
+                            agent_type=handler.agent_type,
+                            goal=goal,
+                            entity_type=event.entity_type,
+                            entity_id=event.entity_id,
+                            context=data,
+                            trigger_event=event.event_type.value,
+                            created_by=data.get("created_by"),
+                            permissions=handler.permissions,
+                            db=db
                         )
-                        logger.info(f"Started workflow for {handler.agent_type}")
-                    else:
-                        logger.warning(f"No DB session available to trigger {handler.agent_type}")
-
-                except Exception as trigger_error:
-                    logger.error(f"Failed to trigger agent workflow: {trigger_error}", exc_info=True)
-
-        except Exception as e:
-            logger.error(f"Failed to handle event {event.event_type.value}: {str(e)}", exc_info=True)
+                finally:
+                    db.close()
+                    self._in_flight_agents[handler.agent_type] -= 1
+                    self._latency[handler.agent_type].append(time.monotonic() - started)
+
+        results = await asyncio.gather(*(trigger(handler, data) for _, handler, data in runs), return_exceptions=True)
+
+        failures = []
+        for (key, handler, _), result in zip(runs, results):
+            if isinstance(result, Exception) or result.get("workflow_id") is None:
+                failures.append(
+                    f"{handler.agent_type}: {result if isinstance(result, Exception) else result.get('error')}"
+                )
+            else:
+                event.started_runs.append(key)
+        if failures:
+            raise EventHandlingError("; ".join(failures))
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def notify(self):
+        """Wake the dispatcher now (called after an event is written)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._changed = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.durable:
+            self._wakeup = asyncio.Event()
+            self._tasks.append(asyncio.create_task(self._run_claimer()))
+            self._tasks.append(asyncio.create_task(self._run_heartbeat()))
+        logger.info(f"Event dispatcher started ({self.backend} backend, {self.workers} workers)")
+
+    async def stop(self, grace_seconds: float = 0):
+        """
+        Stop the dispatcher. Claimed events that haven't started go back to
+        the outbox; running ones get up to `grace_seconds` to finish before
+        being cancelled (their claims then expire and they are retried).
+        """
+        if not self._running:
+            return
+        self._running = False
+
+        async with self._changed:
+            unstarted = [event for queue in self._ready.values() for event in queue]
+            self._ready.clear()
+            self._ready_count = 0
+            self._changed.notify_all()
+        if self.durable and unstarted:
+            try:
+                await asyncio.to_thread(self._release, unstarted)
+            except Exception as e:
+                logger.warning(f"Could not release {len(unstarted)} claimed events: {e}")
+
+        if grace_seconds > 0:
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: not any(self._in_flight_tenants.values())),
+                        timeout=grace_seconds
+                    )
+            except asyncio.TimeoutError:
+                logger.warning("Event dispatcher stopping with workflows still running")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Event dispatcher stopped")
 
     def _check_conditions(self, conditions: Dict[str, Any], data: Dict[str, Any]) -> bool:
         """
@@ -308,32 +1046,34 @@ def get_event_bus() -> EventBus:
 
 # Helper functions for common event emissions
 
-async def emit_lead_created(lead_id: int, lead_data: Dict[str, Any], db_session=None):
+async def emit_lead_created(lead_id: int, lead_data: Dict[str, Any], owner_id: int = None):
     """Emit a lead created event"""
     event_bus = get_event_bus()
-
-    # Set DB session for agent triggering
-    if db_session:
-        event_bus._db_session = db_session
-
     await event_bus.emit(
         event_type=EventType.LEAD_CREATED,
         entity_type="lead",
         entity_id=lead_id,
         data=lead_data,
-        source="crm"
+        source="crm",
+        tenant_id=owner_id
     )
 
 
-async def emit_lead_stage_changed(lead_id: int, old_stage: str, new_stage: str):
-    """Emit a lead stage changed event"""
+async def emit_lead_stage_changed(
+    lead_id: int,
+    old_stage: str,
+    new_stage: str,
+    owner_id: int = None
+):
+    """Emit a lead stage changed event (coalesced per lead, see EventBus)"""
     event_bus = get_event_bus()
     await event_bus.emit(
         event_type=EventType.LEAD_STAGE_CHANGED,
         entity_type="lead",
         entity_id=lead_id,
-        data={"old_stage": old_stage, "new_stage": new_stage},
-        source="crm"
+        data={"lead_id": lead_id, "old_stage": old_stage, "new_stage": new_stage},
+        source="crm",
+        tenant_id=owner_id
     )
 
 
@@ -367,15 +1107,71 @@ async def emit_incoming_communication(
     )
 
 
+def task_overdue_event(
+    task_id: int,
+    lead_id: int = None,
+    assigned_to_id: int = None,
+    entity_type: str = "task",
+    loan_id: int = None,
+    due_date: datetime = None
+) -> Event:
+    """TASK_OVERDUE event for a Task (entity_type "task") or AITask ("ai_task")"""
+    return Event(
+        event_type=EventType.TASK_OVERDUE,
+        entity_type=entity_type,
+        entity_id=task_id,
+        data={
+            "task_id": task_id,
+            "task_kind": entity_type,
+            "lead_id": lead_id,
+            "loan_id": loan_id,
+            "assigned_to_id": assigned_to_id,
+            "due_date": due_date.isoformat() if due_date else None
+        },
+        timestamp=datetime.now(timezone.utc),
+        source="scheduler",
+        tenant_id=assigned_to_id
+    )
+
+
 async def emit_task_overdue(task_id: int, lead_id: int = None, assigned_to_id: int = None):
     """Emit a task overdue event"""
+    event = task_overdue_event(task_id, lead_id=lead_id, assigned_to_id=assigned_to_id)
     event_bus = get_event_bus()
     await event_bus.emit(
-        event_type=EventType.TASK_OVERDUE,
-        entity_type="task",
-        entity_id=task_id,
-        data={"lead_id": lead_id, "assigned_to_id": assigned_to_id},
-        source="scheduler"
+        event_type=event.event_type,
+        entity_type=event.entity_type,
+        entity_id=event.entity_id,
+        data=event.data,
+        source=event.source,
+        tenant_id=event.tenant_id
+    )
+
+
+async def emit_manual_trigger(
+    agent_type: str,
+    goal: str,
+    entity_type: str = None,
+    entity_id: int = None,
+    context: Dict[str, Any] = None,
+    created_by: int = None,
+    permissions: List[str] = None
+) -> Event:
+    """Queue a workflow for a specific agent (run by whichever process dispatches events)"""
+    event_bus = get_event_bus()
+    return await event_bus.emit(
+        event_type=EventType.MANUAL_TRIGGER,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        data={
+            **(context or {}),
+            "agent_type": agent_type,
+            "goal": goal,
+            "created_by": created_by,
+            "permissions": permissions or []
+        },
+        source="api",
+        tenant_id=created_by
     )
 
 
@@ -424,11 +1220,11 @@ def setup_default_handlers():
         priority=100
     )
 
-    # AI Pipeline Ops: Daily pipeline review
+    # AI Pipeline Ops: Daily pipeline review, one event per user (see services/pipeline_review.py)
     event_bus.register_handler(
         event_type=EventType.DAILY_PIPELINE_REVIEW,
         agent_type="pipeline_ops",
-        goal_template="Conduct daily pipeline review: check for stalled deals, missing data, and upcoming milestones",
+        goal_template="Conduct daily pipeline review for user {user_id} (pipeline changed since {changed_since}): check their leads and loans for stalled deals, missing data, and upcoming milestones",
         permissions=["leads:read", "loans:read", "tasks:write", "communications:send"],
         priority=50
     )
@@ -437,7 +1233,7 @@ def setup_default_handlers():
     event_bus.register_handler(
         event_type=EventType.TASK_OVERDUE,
         agent_type="pipeline_ops",
-        goal_template="Handle overdue task {task_id}: notify assignee and escalate if needed",
+        goal_template="Handle overdue {task_kind} {task_id} (due {due_date}): notify assignee and escalate if needed",
         permissions=["tasks:read", "tasks:write", "communications:send"],
         priority=75
     )
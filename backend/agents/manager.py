@@ -6,6 +6,7 @@ and coordinates workflow execution across the system.
 """
 
 import logging
+from contextvars import ContextVar
 from typing import Dict, Any, Optional, List, Type
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
@@ -14,6 +15,9 @@ from .base_agent import BaseAgent
 
 logger = logging.getLogger(__name__)
 
+# Session of the request or task using the manager (see get_agent_manager)
+_current_db: ContextVar[Optional[Session]] = ContextVar("agent_manager_db", default=None)
+
 
 class AgentManager:
     """
@@ -25,14 +29,29 @@ class AgentManager:
     - Manage workflow lifecycle (create, execute, track, resume)
     - Persist workflow state to database
     - Coordinate human-in-the-loop reviews
+
+    One manager lives for the whole process. Agent instances, and with them
+    their LLM clients and compiled graphs, are cached per agent type and
+    permission set and shared by concurrent workflows. Database sessions are
+    never shared: each workflow run uses its own, and `db` is whatever
+    session the calling request or task bound with get_agent_manager(db).
     """
 
-    def __init__(self, db: Session):
-        self.db = db
+    def __init__(self, db: Session = None):
+        if db is not None:
+            _current_db.set(db)
         self._agent_registry: Dict[str, Type[BaseAgent]] = {}
         self._agent_instances: Dict[str, BaseAgent] = {}
         logger.info("AgentManager initialized")
 
+    @property
+    def db(self) -> Optional[Session]:
+        return _current_db.get()
+
+    @db.setter
+    def db(self, session: Optional[Session]):
+        _current_db.set(session)
+
     def register_agent_type(self, agent_type: str, agent_class: Type[BaseAgent]):
         """
         Register an agent class by type name.
@@ -41,12 +60,20 @@ class AgentManager:
             agent_type: Unique identifier for this agent type (e.g., "receptionist", "pipeline_ops")
             agent_class: The agent class (subclass of BaseAgent)
         """
+        if self._agent_registry.get(agent_type) is agent_class:
+            return
+
         self._agent_registry[agent_type] = agent_class
+        # Drop instances built from a previously registered class
+        for key in [k for k in self._agent_instances if k.split(":", 1)[0] == agent_type]:
+            del self._agent_instances[key]
         logger.info(f"Registered agent type: {agent_type}")
 
     def get_agent(self, agent_type: str, permissions: List[str] = None, **kwargs) -> Optional[BaseAgent]:
         """
-        Get or create an agent instance of the specified type.
+        Get or create the shared agent instance of the specified type.
+
+        Agent classes set their own agent_type; instances hold no session.
 
         Args:
             agent_type: Type of agent to get
@@ -67,12 +94,10 @@ class AgentManager:
             logger.error(f"Agent type not registered: {agent_type}")
             return None
 
-        # Create new instance
+        # Create new instance (shared by all runs; each run passes its own session)
         agent_class = self._agent_registry[agent_type]
         agent_instance = agent_class(
-            agent_type=agent_type,
             permissions=permissions or [],
-            db=self.db,
             **kwargs
         )
 
@@ -90,11 +115,15 @@ class AgentManager:
         context: Dict[str, Any] = None,
         trigger_event: str = None,
         created_by: int = None,
-        permissions: List[str] = None
+        permissions: List[str] = None,
+        db: Session = None
     ) -> Dict[str, Any]:
         """
         Start a new agent workflow.
 
+        The run uses `db` if given, else the session bound to the caller, else
+        a fresh session from the pool that is closed when the run ends.
+
         Args:
             agent_type: Type of agent to use
             goal: The goal/objective for the agent
@@ -104,10 +133,39 @@ class AgentManager:
             trigger_event: Event that triggered this workflow
             created_by: User ID who triggered this (if human-initiated)
             permissions: Agent permissions
+            db: Database session for this run
 
         Returns:
             Dict with workflow_id, status, and results
         """
+        from main import SessionLocal
+
+        db = db if db is not None else self.db
+        if db is not None:
+            return await self._run_workflow(
+                db, agent_type, goal, entity_type, entity_id, context, trigger_event, created_by, permissions
+            )
+
+        db = SessionLocal()
+        try:
+            return await self._run_workflow(
+                db, agent_type, goal, entity_type, entity_id, context, trigger_event, created_by, permissions
+            )
+        finally:
+            db.close()
+
+    async def _run_workflow(
+        self,
+        db: Session,
+        agent_type: str,
+        goal: str,
+        entity_type: Optional[str],
+        entity_id: Optional[int],
+        context: Optional[Dict[str, Any]],
+        trigger_event: Optional[str],
+        created_by: Optional[int],
+        permissions: Optional[List[str]]
+    ) -> Dict[str, Any]:
         try:
             from main import AgentWorkflow
 
@@ -127,9 +185,9 @@ class AgentManager:
                 created_by=created_by
             )
 
-            self.db.add(workflow)
-            self.db.commit()
-            self.db.refresh(workflow)
+            db.add(workflow)
+            db.commit()
+            db.refresh(workflow)
 
             workflow_id = workflow.id
             logger.info(f"Created workflow {workflow_id}")
@@ -142,7 +200,7 @@ class AgentManager:
                 workflow.status = "failed"
                 workflow.error = error_msg
                 workflow.completed_at = datetime.now(timezone.utc)
-                self.db.commit()
+                db.commit()
                 return {
                     "success": False,
                     "error": error_msg,
@@ -155,48 +213,11 @@ class AgentManager:
                 entity_type=entity_type,
                 entity_id=entity_id,
                 context=context,
-                workflow_id=workflow_id
-            )
-
-            # Update workflow with results
-            workflow.status = "completed" if result.get("success") else "failed"
-            workflow.state = {
-                "actions_taken": result.get("actions_taken", []),
-                "messages": result.get("messages", []),
-                "confidence": result.get("confidence", 1.0)
-            }
-            workflow.completed_at = datetime.now(timezone.utc)
-
-            if result.get("error"):
-                workflow.error = result["error"]
-
-            self.db.commit()
-
-            # Log all actions to agent_actions table
-            await self._log_actions(
                 workflow_id=workflow_id,
-                agent_type=agent_type,
-                actions=result.get("actions_taken", [])
+                db=db
             )
 
-            # Create review items if needed
-            if result.get("requires_review"):
-                await self._create_review_items(
-                    workflow_id=workflow_id,
-                    agent_type=agent_type,
-                    actions=result.get("actions_taken", [])
-                )
-
-            logger.info(f"Workflow {workflow_id} completed: success={result.get('success')}")
-
-            return {
-                "success": result.get("success"),
-                "workflow_id": workflow_id,
-                "actions_taken": result.get("actions_taken", []),
-                "requires_review": result.get("requires_review", False),
-                "confidence": result.get("confidence", 1.0),
-                "error": result.get("error")
-            }
+            return await self._finish_workflow(db, workflow, result)
 
         except Exception as e:
             logger.error(f"Workflow execution failed: {str(e)}", exc_info=True)
@@ -206,7 +227,7 @@ class AgentManager:
                 workflow.status = "failed"
                 workflow.error = str(e)
                 workflow.completed_at = datetime.now(timezone.utc)
-                self.db.commit()
+                db.commit()
 
             return {
                 "success": False,
@@ -214,6 +235,96 @@ class AgentManager:
                 "workflow_id": workflow.id if 'workflow' in locals() else None
             }
 
+    async def _finish_workflow(self, db: Session, workflow, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a run's outcome, log its actions, queue reviews and drop checkpoints no longer needed"""
+        workflow_id = workflow.id
+        agent_type = workflow.agent_type
+
+        # Update workflow with results
+        workflow.status = "completed" if result.get("success") else "failed"
+        workflow.state = {
+            "actions_taken": result.get("actions_taken", []),
+            "messages": result.get("messages", []),
+            "confidence": result.get("confidence", 1.0),
+            "tool_cache": result.get("tool_cache", {})
+        }
+        workflow.completed_at = datetime.now(timezone.utc)
+
+        if result.get("error"):
+            workflow.error = result["error"]
+
+        db.commit()
+
+        # Log all actions to agent_actions table
+        await self._log_actions(
+            db,
+            workflow_id=workflow_id,
+            agent_type=agent_type,
+            actions=result.get("actions_taken", [])
+        )
+
+        # Create review items if needed
+        if result.get("requires_review"):
+            await self._create_review_items(
+                db,
+                workflow_id=workflow_id,
+                agent_type=agent_type,
+                actions=result.get("actions_taken", [])
+            )
+        elif result.get("success"):
+            # Finished and nothing to review: the checkpoints will never be resumed
+            await self._drop_checkpoints(workflow_id)
+
+        logger.info(f"Workflow {workflow_id} completed: success={result.get('success')}")
+
+        return {
+            "success": result.get("success"),
+            "workflow_id": workflow_id,
+            "actions_taken": result.get("actions_taken", []),
+            "requires_review": result.get("requires_review", False),
+            "confidence": result.get("confidence", 1.0),
+            "error": result.get("error")
+        }
+
+    async def _drop_checkpoints(self, workflow_id: int):
+        from .checkpointer import checkpoint_saver
+
+        try:
+            if hasattr(checkpoint_saver, "adelete_thread"):
+                await checkpoint_saver.adelete_thread(str(workflow_id))
+        except Exception as e:
+            logger.warning(f"Failed to drop checkpoints of workflow {workflow_id}: {e}")
+
+    async def resume_workflow(self, workflow_id: int, db: Session = None) -> Dict[str, Any]:
+        """
+        Resume a workflow from its last checkpoint, e.g. one left "running"
+        by a process that stopped mid-run.
+
+        Args:
+            workflow_id: ID of the workflow
+            db: Database session for the run (defaults to the caller's)
+
+        Returns:
+            Dict with workflow_id, status, and results
+        """
+        from main import AgentWorkflow
+
+        db = db if db is not None else self.db
+        workflow = db.query(AgentWorkflow).filter(AgentWorkflow.id == workflow_id).first()
+        if not workflow:
+            return {"success": False, "error": "Workflow not found", "workflow_id": workflow_id}
+
+        agent = self.get_agent(workflow.agent_type)
+        if not agent:
+            return {"success": False, "error": f"Agent type not found: {workflow.agent_type}", "workflow_id": workflow_id}
+
+        workflow.status = "running"
+        workflow.error = None
+        db.commit()
+
+        result = await agent.resume(workflow_id, db=db)
+        return await self._finish_workflow(db, workflow, result)
+
     async def get_workflow_status(self, workflow_id: int) -> Optional[Dict[str, Any]]:
         """
         Get the current status of a workflow.
@@ -311,6 +422,7 @@ class AgentManager:
 
     async def _log_actions(
         self,
+        db: Session,
         workflow_id: int,
         agent_type: str,
         actions: List[Dict[str, Any]]
@@ -319,6 +431,7 @@ class AgentManager:
         Log agent actions to the agent_actions table.
 
         Args:
+            db: Session of the workflow run
             workflow_id: Workflow ID
             agent_type: Type of agent
             actions: List of actions taken
@@ -338,9 +451,9 @@ class AgentManager:
                     created_at=datetime.now(timezone.utc)
                 )
 
-                self.db.add(action_record)
+                db.add(action_record)
 
-            self.db.commit()
+            db.commit()
             logger.info(f"Logged {len(actions)} actions for workflow {workflow_id}")
 
         except Exception as e:
@@ -348,6 +461,7 @@ class AgentManager:
 
     async def _create_review_items(
         self,
+        db: Session,
         workflow_id: int,
         agent_type: str,
         actions: List[Dict[str, Any]]
@@ -356,6 +470,7 @@ class AgentManager:
         Create review queue items for actions requiring human approval.
 
         Args:
+            db: Session of the workflow run
             workflow_id: Workflow ID
             agent_type: Type of agent
             actions: List of actions taken
@@ -384,9 +499,9 @@ class AgentManager:
                     created_at=datetime.now(timezone.utc)
                 )
 
-                self.db.add(review_item)
+                db.add(review_item)
 
-            self.db.commit()
+            db.commit()
             logger.info(f"Created {len(actions)} review items for workflow {workflow_id}")
 
         except Exception as e:
@@ -423,16 +538,18 @@ class AgentManager:
             return 0
 
 
-# Global agent manager instance (will be initialized with DB session)
+# Global agent manager instance
 _global_agent_manager: Optional[AgentManager] = None
 
 
-def get_agent_manager(db: Session) -> AgentManager:
+def get_agent_manager(db: Session = None) -> AgentManager:
     """
     Get or create the global agent manager instance.
 
     Args:
-        db: Database session
+        db: Database session of the calling request or task. It is bound to
+            the current async context only, so concurrent callers never see
+            each other's sessions.
 
     Returns:
         AgentManager instance
@@ -440,10 +557,10 @@ def get_agent_manager(db: Session) -> AgentManager:
     global _global_agent_manager
 
     if _global_agent_manager is None:
-        _global_agent_manager = AgentManager(db)
+        _global_agent_manager = AgentManager()
         logger.info("Created global AgentManager instance")
 
-    # Update DB session
-    _global_agent_manager.db = db
+    if db is not None:
+        _current_db.set(db)
 
     return _global_agent_manager
@@ -2,11 +2,15 @@
 Agent Scheduler
 
 Handles scheduled tasks for agent system:
-- Daily pipeline reviews
+- Daily pipeline reviews (one per user with pipeline changes)
 - Hourly checks
 - Weekly reports
+- Precomputed coach daily briefings
+- Overdue task sweeps
+- Purging expired agent checkpoints
 """
 
+import os
 import logging
 import asyncio
 from datetime import datetime, timezone
@@ -34,15 +38,16 @@ class AgentScheduler:
     def setup_scheduled_tasks(self):
         """Set up all scheduled tasks"""
 
-        # Daily Pipeline Review - Every day at 9:00 AM
+        # Daily Pipeline Review - Every day at 9:00 AM, fanned out per user
+        review_hour = int(os.getenv("PIPELINE_REVIEW_HOUR", "9"))
         self.scheduler.add_job(
             self._daily_pipeline_review,
-            trigger=CronTrigger(hour=9, minute=0),
+            trigger=CronTrigger(hour=review_hour, minute=0),
             id='daily_pipeline_review',
             name='Daily Pipeline Review',
             replace_existing=True
         )
-        logger.info("Scheduled: Daily Pipeline Review at 9:00 AM")
+        logger.info(f"Scheduled: Daily Pipeline Review at {review_hour}:00")
 
         # Hourly Check - Every hour
         self.scheduler.add_job(
@@ -64,17 +69,45 @@ class AgentScheduler:
         )
         logger.info("Scheduled: Weekly Report every Monday at 8:00 AM")
 
+        # Coach Daily Briefings - Every day before the workday starts
+        briefing_hour = int(os.getenv("COACH_BRIEFING_HOUR", "6"))
+        self.scheduler.add_job(
+            self._coach_daily_briefings,
+            trigger=CronTrigger(hour=briefing_hour, minute=0),
+            id='coach_daily_briefings',
+            name='Coach Daily Briefings',
+            replace_existing=True
+        )
+        logger.info(f"Scheduled: Coach Daily Briefings at {briefing_hour}:00")
+
+        # Overdue Task Sweep - Every few minutes
+        sweep_minutes = int(os.getenv("OVERDUE_SWEEP_MINUTES", "5"))
+        self.scheduler.add_job(
+            self._sweep_overdue_tasks,
+            trigger=CronTrigger(minute=f"*/{sweep_minutes}"),
+            id='overdue_task_sweep',
+            name='Overdue Task Sweep',
+            replace_existing=True
+        )
+        logger.info(f"Scheduled: Overdue Task Sweep every {sweep_minutes} minutes")
+
+        # Agent Checkpoint Purge - Every hour, off the top of the hour
+        self.scheduler.add_job(
+            self._purge_checkpoints,
+            trigger=CronTrigger(minute=30),
+            id='purge_agent_checkpoints',
+            name='Purge Agent Checkpoints',
+            replace_existing=True
+        )
+        logger.info("Scheduled: Agent Checkpoint Purge at half past every hour")
+
     async def _daily_pipeline_review(self):
-        """Trigger daily pipeline review"""
+        """Queue a jittered pipeline review for each user whose pipeline changed"""
         try:
+            from services.pipeline_review import schedule_pipeline_reviews
+
             logger.info("Triggering daily pipeline review")
-            await emit_scheduled_event(
-                EventType.DAILY_PIPELINE_REVIEW,
-                context={
-                    "date": datetime.now(timezone.utc).isoformat(),
-                    "trigger": "scheduled"
-                }
-            )
+            await schedule_pipeline_reviews()
             logger.info("Daily pipeline review triggered successfully")
         except Exception as e:
             logger.error(f"Failed to trigger daily pipeline review: {e}", exc_info=True)
@@ -109,6 +142,35 @@ class AgentScheduler:
         except Exception as e:
             logger.error(f"Failed to trigger weekly report: {e}", exc_info=True)
 
+    async def _coach_daily_briefings(self):
+        """Precompute today's Performance Coach briefing for active users"""
+        try:
+            from services.coach_context import precompute_daily_briefings
+
+            logger.info("Precomputing coach daily briefings")
+            await precompute_daily_briefings()
+        except Exception as e:
+            logger.error(f"Failed to precompute coach daily briefings: {e}", exc_info=True)
+
+    async def _sweep_overdue_tasks(self):
+        """Emit TASK_OVERDUE for tasks that fell due since the last sweep"""
+        try:
+            from services.overdue_sweeper import overdue_sweeper
+
+            await overdue_sweeper.sweep()
+        except Exception as e:
+            logger.error(f"Failed to sweep overdue tasks: {e}", exc_info=True)
+
+    async def _purge_checkpoints(self):
+        """Drop expired agent checkpoints"""
+        try:
+            from .checkpointer import checkpoint_saver, SQLCheckpointSaver
+
+            if isinstance(checkpoint_saver, SQLCheckpointSaver):
+                await asyncio.to_thread(checkpoint_saver.purge_expired)
+        except Exception as e:
+            logger.error(f"Failed to purge agent checkpoints: {e}", exc_info=True)
+
     def start(self):
         """Start the scheduler"""
         if not self._is_running:
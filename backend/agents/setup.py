@@ -5,6 +5,7 @@ Initializes the agent system by registering all tools and event handlers.
 This should be called during application startup.
 """
 
+import os
 import logging
 from sqlalchemy.orm import Session
 
@@ -17,6 +18,16 @@ from . import crm_tools
 
 logger = logging.getLogger(__name__)
 
+# Where agent workflows run:
+# - inline: the API process dispatches events and runs the scheduler (development)
+# - worker: the API only emits events; agent_worker.py processes run them
+AGENT_RUNTIME = os.getenv("AGENT_RUNTIME", "inline")
+
+
+def agents_run_in_process() -> bool:
+    """Whether this API process should dispatch agent events and run scheduled jobs"""
+    return AGENT_RUNTIME != "worker"
+
 
 def initialize_agent_system(db: Session = None):
     """
@@ -28,7 +39,7 @@ def initialize_agent_system(db: Session = None):
     3. Register agent types
 
     Args:
-        db: Optional database session
+        db: Optional database session (agent runs use their own sessions)
     """
     try:
         logger.info("Initializing agent system...")
@@ -40,11 +51,9 @@ def initialize_agent_system(db: Session = None):
         setup_default_handlers()
         logger.info("Event handlers registered")
 
-        # Register agent types (if db session provided)
-        if db:
-            agent_manager = get_agent_manager(db)
-            register_agents(agent_manager)
-            logger.info("Agent types registered")
+        # Register agent types with the process-wide manager
+        register_agents(get_agent_manager(db))
+        logger.info("Agent types registered")
 
         logger.info("Agent system initialized successfully")
 
@@ -3,16 +3,30 @@ Tool Registry for Agent System
 
 Provides a registry of callable tools that agents can use to interact with
 the CRM system, external APIs, and perform actions.
+
+Tools declare whether they are read-only and which arguments identify the
+records they touch (conflict keys). When the model asks for several tools in
+one turn, calls that cannot interfere run concurrently, each with its own
+session; conflicting calls keep the order the model gave them.
+
+Results of tools marked cacheable are memoized per workflow, keyed by tool
+name and canonical arguments. A write tool drops the cached results that
+share one of its conflict keys (e.g. the same lead_id), so a workflow never
+reads its own stale writes.
 """
 
+import os
+import asyncio
 import logging
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 import json
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TOOL_CONCURRENCY = 4
+
 
 class ToolDefinition(BaseModel):
     """Definition of a tool that agents can call"""
@@ -20,17 +34,69 @@ class ToolDefinition(BaseModel):
     description: str
     parameters: Dict[str, Any]
     required_permissions: List[str] = Field(default_factory=list)
+    read_only: bool = False
+    # Arguments naming the records the tool touches; a write tool without any conflicts with every call
+    conflict_keys: List[str] = Field(default_factory=list)
+    # Read-only tools whose results can be reused within a workflow
+    cacheable: bool = False
     function: Optional[Callable] = None
 
     class Config:
         arbitrary_types_allowed = True
 
 
+class ToolResultCache:
+    """Memoized tool results of one workflow"""
+
+    def __init__(self):
+        # (tool name, canonical arguments) -> (resource keys, result)
+        self._results: Dict[Tuple[str, str], Tuple[Optional[FrozenSet[Tuple[str, Any]]], Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(name: str, arguments: Dict[str, Any]) -> Tuple[str, str]:
+        return name, json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        entry = self._results.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], keys: Optional[FrozenSet[Tuple[str, Any]]], result: Dict[str, Any]):
+        self._results[key] = (keys, result)
+
+    def invalidate(self, keys: Optional[FrozenSet[Tuple[str, Any]]]):
+        """Drop results touching any of `keys` (everything when keys is None)"""
+        stale = [
+            key for key, (entry_keys, _) in self._results.items()
+            if keys is None or entry_keys is None or entry_keys & keys
+        ]
+        for key in stale:
+            del self._results[key]
+        self.invalidations += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
 class ToolRegistry:
     """Registry for managing agent tools"""
 
     def __init__(self):
         self._tools: Dict[str, ToolDefinition] = {}
+        # workflow_id -> result cache, dropped when the workflow's run ends
+        self._caches: Dict[int, ToolResultCache] = {}
         logger.info("ToolRegistry initialized")
 
     def register(
@@ -38,7 +104,10 @@ class ToolRegistry:
         name: str,
         description: str,
         parameters: Dict[str, Any],
-        permissions: List[str] = None
+        permissions: List[str] = None,
+        read_only: bool = False,
+        conflict_keys: List[str] = None,
+        cacheable: bool = False
     ):
         """Decorator to register a tool function"""
         def decorator(func: Callable):
@@ -47,6 +116,9 @@ class ToolRegistry:
                 description=description,
                 parameters=parameters,
                 required_permissions=permissions or [],
+                read_only=read_only or cacheable,
+                conflict_keys=conflict_keys or [],
+                cacheable=cacheable,
                 function=func
             )
             self._tools[name] = tool_def
@@ -103,19 +175,37 @@ class ToolRegistry:
             logger.error(error_msg)
             return {"error": error_msg, "success": False}
 
+        cache = self._caches.get(workflow_id) if workflow_id is not None else None
+        keys = resource_keys(tool.conflict_keys, arguments)
+        cache_key = ToolResultCache.key(name, arguments) if cache is not None and tool.cacheable else None
+
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Tool {name} served from workflow {workflow_id} cache")
+                return {"success": True, "result": cached, "duration_ms": 0, "cached": True}
+
         try:
             start_time = datetime.now(timezone.utc)
 
-            # Execute the tool function
-            if db:
-                result = await tool.function(db=db, **arguments)
+            # Execute the tool function; synchronous (blocking DB) tools run in a
+            # worker thread so the calls of a concurrent wave actually overlap
+            call_arguments = {"db": db, **arguments} if db else arguments
+            if asyncio.iscoroutinefunction(tool.function):
+                result = await tool.function(**call_arguments)
             else:
-                result = await tool.function(**arguments)
+                result = await asyncio.to_thread(tool.function, **call_arguments)
 
             duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
 
             logger.info(f"Tool {name} executed successfully in {duration_ms}ms")
 
+            if cache is not None:
+                if not tool.read_only:
+                    cache.invalidate(keys)
+                elif cache_key is not None and not (isinstance(result, dict) and result.get("success") is False):
+                    cache.put(cache_key, keys, result)
+
             return {
                 "success": True,
                 "result": result,
@@ -131,11 +221,150 @@ class ToolRegistry:
                 "tool_name": name
             }
 
+    # ------------------------------------------------------------------
+    # Per-workflow result cache
+    # ------------------------------------------------------------------
+
+    def open_cache(self, workflow_id: Optional[int]):
+        """Start memoizing cacheable tool results for a workflow run"""
+        if workflow_id is not None:
+            self._caches.setdefault(workflow_id, ToolResultCache())
+
+    def close_cache(self, workflow_id: Optional[int]) -> Dict[str, Any]:
+        """Drop a workflow's cache. Returns its final stats."""
+        cache = self._caches.pop(workflow_id, None) if workflow_id is not None else None
+        return cache.stats() if cache else {}
+
+    def cache_stats(self, workflow_id: Optional[int]) -> Dict[str, Any]:
+        cache = self._caches.get(workflow_id) if workflow_id is not None else None
+        return cache.stats() if cache else {}
+
+    async def execute_tools(
+        self,
+        calls: Sequence[Tuple[str, Dict[str, Any]]],
+        agent_type: str = None,
+        workflow_id: int = None,
+        db = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute several (name, arguments) tool calls from one model turn.
+
+        Calls run in waves (see plan_waves); a wave with more than one call
+        runs concurrently and gives each call its own session. Results are
+        returned in the order of `calls`.
+        """
+        effects = []
+        for name, arguments in calls:
+            tool = self.get_tool(name)
+            if tool is None:
+                effects.append((True, frozenset()))  # Fails without touching anything
+            else:
+                effects.append((tool.read_only, resource_keys(tool.conflict_keys, arguments)))
+
+        async def run_one(index: int, session) -> Dict[str, Any]:
+            name, arguments = calls[index]
+            return await self.execute_tool(
+                name=name,
+                arguments=arguments,
+                agent_type=agent_type,
+                workflow_id=workflow_id,
+                db=session
+            )
+
+        return await run_waves(plan_waves(effects), run_one, db)
+
+
+# ============================================================================
+# CONCURRENT EXECUTION
+# ============================================================================
+
+# (read_only, resource keys); keys of None means "may touch anything"
+ToolEffect = Tuple[bool, Optional[FrozenSet[Tuple[str, Any]]]]
+
+
+def resource_keys(conflict_keys: Sequence[str], arguments: Dict[str, Any]) -> Optional[FrozenSet[Tuple[str, Any]]]:
+    """(argument, value) pairs naming the records a call touches; None if the tool declares none"""
+    if not conflict_keys:
+        return None
+    return frozenset(
+        (key, arguments[key]) for key in conflict_keys if arguments.get(key) is not None
+    )
+
+
+def _conflicts(a: ToolEffect, b: ToolEffect) -> bool:
+    (a_read_only, a_keys), (b_read_only, b_keys) = a, b
+    if a_read_only and b_read_only:
+        return False
+    if (not a_read_only and a_keys is None) or (not b_read_only and b_keys is None):
+        return True
+    return bool(a_keys and b_keys and a_keys & b_keys)
+
+
+def plan_waves(effects: Sequence[ToolEffect]) -> List[List[int]]:
+    """
+    Group call indexes into waves that can each run concurrently.
+
+    A call goes in the wave after the last earlier call it conflicts with,
+    so conflicting calls keep their order and everything else starts at once.
+    """
+    wave_of: List[int] = []
+    for i, effect in enumerate(effects):
+        wave_of.append(1 + max(
+            (wave_of[j] for j in range(i) if _conflicts(effects[j], effect)),
+            default=-1
+        ))
+
+    waves: List[List[int]] = [[] for _ in range(max(wave_of, default=-1) + 1)]
+    for i, wave in enumerate(wave_of):
+        waves[wave].append(i)
+    return waves
+
+
+async def run_waves(
+    waves: List[List[int]],
+    run_one: Callable[[int, Any], Any],
+    db = None
+) -> List[Any]:
+    """
+    Run `run_one(index, session)` for every planned call and return results
+    by index. Single-call waves use `db`; calls in a concurrent wave get a
+    session of their own (at most TOOL_CONCURRENCY at a time), so `run_one`
+    must hand blocking work to a thread for the calls to overlap.
+    """
+    from main import SessionLocal
+
+    semaphore = asyncio.Semaphore(int(os.getenv("TOOL_CONCURRENCY", DEFAULT_TOOL_CONCURRENCY)))
+    results: Dict[int, Any] = {}
+
+    async def run_isolated(index: int):
+        async with semaphore:
+            session = SessionLocal()
+            try:
+                results[index] = await run_one(index, session)
+            finally:
+                session.close()
+
+    for wave in waves:
+        if len(wave) == 1:
+            results[wave[0]] = await run_one(wave[0], db)
+        else:
+            await asyncio.gather(*(run_isolated(index) for index in wave))
+
+    return [results[index] for index in sorted(results)]
+
 
 # Global tool registry instance
 tool_registry = ToolRegistry()
 
 # Convenience decorator
-def tool(name: str, description: str, parameters: Dict[str, Any], permissions: List[str] = None):
+def tool(
+    name: str,
+    description: str,
+    parameters: Dict[str, Any],
+    permissions: List[str] = None,
+    read_only: bool = False,
+    conflict_keys: List[str] = None,
+    cacheable: bool = False
+):
     """Decorator to register a tool"""
-    return tool_registry.register(name, description, parameters, permissions)
+    return tool_registry.register(name, description, parameters, permissions, read_only, conflict_keys, cacheable)
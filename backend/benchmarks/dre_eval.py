@@ -0,0 +1,263 @@
+"""
+DRE Extraction Evaluation
+
+Compares the original two-step flow (classify_email_content on gpt-4o-mini,
+then extract_loan_fields on gpt-4o), the single-call classify_and_extract
+flow, and the full triage path (local pre-classifier, then single call) on a
+labeled set of emails. Reports category accuracy, field
+precision/recall, latency, LLM calls and token cost per email.
+
+The response cache is disabled so every email costs real calls.
+
+Labeled set format (JSON lines):
+    {"subject": "...", "body": "...", "sender": "...", "category": "rate_lock",
+     "fields": {"loan_number": "LN-1234", "rate": 6.125}}
+
+Usage:
+    # Build a labeled set from reviewed DRE extractions (approved/applied rows,
+    # which include any user corrections)
+    DATABASE_URL=postgresql://... python benchmarks/dre_eval.py export --out dre_labeled.jsonl
+
+    # Run all flows and compare (triage needs DATABASE_URL for the sender index)
+    OPENAI_API_KEY=... python benchmarks/dre_eval.py run dre_labeled.jsonl --json-out dre_eval.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# USD per 1M tokens (input, output). Update when list prices change.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+REVIEWED_STATUSES = ("approved", "applied")
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def export_labeled_set(out_path: str, limit: int):
+    import main
+
+    db = main.SessionLocal()
+    try:
+        rows = (
+            db.query(main.ExtractedData, main.IncomingDataEvent)
+            .join(main.IncomingDataEvent, main.ExtractedData.event_id == main.IncomingDataEvent.id)
+            .filter(main.ExtractedData.status.in_(REVIEWED_STATUSES))
+            .order_by(main.ExtractedData.id.desc())
+            .limit(limit)
+            .all()
+        )
+        with open(out_path, "w") as f:
+            for extracted, event in rows:
+                fields = {
+                    name: field.get("value")
+                    for name, field in (extracted.fields or {}).items()
+                    if isinstance(field, dict) and field.get("value") is not None
+                }
+                f.write(json.dumps({
+                    "subject": event.subject or "",
+                    "sender": event.sender or "",
+                    "body": event.raw_text or event.raw_html or "",
+                    "category": extracted.category,
+                    "fields": fields,
+                }, default=str) + "\n")
+    finally:
+        db.close()
+
+    print(f"Exported {len(rows)} reviewed emails to {out_path}")
+
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, (int, float)):
+        return round(float(value), 3)
+    if isinstance(value, list):
+        return sorted(str(v).strip().lower() for v in value)
+    text = str(value).strip().lower()
+    try:
+        return round(float(text.replace(",", "").replace("$", "").replace("%", "")), 3)
+    except ValueError:
+        return text
+
+
+def score_fields(expected: Dict[str, Any], predicted: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    predicted_values = {
+        name: field.get("value") for name, field in predicted.items()
+        if isinstance(field, dict) and field.get("value") is not None
+    }
+    correct = sum(
+        1 for name, value in expected.items()
+        if name in predicted_values and _normalize_value(predicted_values[name]) == _normalize_value(value)
+    )
+    return {"correct": correct, "expected": len(expected), "predicted": len(predicted_values)}
+
+
+def _usage_delta(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    delta = {}
+    for model, counts in after.items():
+        base = before.get(model, {})
+        delta[model] = {name: counts[name] - base.get(name, 0) for name in counts}
+    return delta
+
+
+def _cost(usage: Dict[str, Dict[str, int]]) -> float:
+    total = 0.0
+    for model, counts in usage.items():
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        total += counts["prompt_tokens"] / 1e6 * input_price
+        total += counts["completion_tokens"] / 1e6 * output_price
+    return total
+
+
+# ============================================================================
+# FLOWS
+# ============================================================================
+
+async def two_step(subject: str, body: str, sender: str) -> Dict[str, Any]:
+    from services.email_extraction import classify_email_content, extract_loan_fields
+
+    classification = await classify_email_content(body, subject)
+    fields = {}
+    if classification.get("category") != "unrelated" and classification.get("confidence", 0.0) >= 0.5:
+        fields = await extract_loan_fields(body, classification["category"])
+    return {"category": classification.get("category"), "fields": fields or {}, "escalated": False}
+
+
+async def single_call(subject: str, body: str, sender: str) -> Dict[str, Any]:
+    from services.email_extraction import classify_and_extract
+
+    result = await classify_and_extract(body, subject)
+    return {"category": result["category"], "fields": result["fields"], "escalated": result["escalated"]}
+
+
+async def triage(subject: str, body: str, sender: str) -> Dict[str, Any]:
+    from services.email_extraction import triage_email
+
+    result = await triage_email(body, subject, sender)
+    return {"category": result["category"], "fields": result["fields"], "escalated": result["escalated"]}
+
+
+FLOWS = {"two_step": two_step, "single_call": single_call, "triage": triage}
+
+
+async def evaluate(flow_name: str, emails: List[Dict[str, Any]]) -> Dict[str, Any]:
+    from integrations.llm_gateway import llm_gateway
+
+    flow = FLOWS[flow_name]
+    latencies = []
+    category_correct = 0
+    field_totals = {"correct": 0, "expected": 0, "predicted": 0}
+    escalations = 0
+
+    usage_before = llm_gateway.usage_snapshot()
+    for email in emails:
+        started = time.perf_counter()
+        result = await flow(email["subject"], email["body"], email.get("sender", ""))
+        latencies.append(time.perf_counter() - started)
+
+        category_correct += int(result["category"] == email["category"])
+        escalations += int(result["escalated"])
+        for name, count in score_fields(email.get("fields", {}), result["fields"]).items():
+            field_totals[name] += count
+    usage = _usage_delta(usage_before, llm_gateway.usage_snapshot())
+
+    n = len(emails) or 1
+    latencies.sort()
+    precision = field_totals["correct"] / field_totals["predicted"] if field_totals["predicted"] else 0.0
+    recall = field_totals["correct"] / field_totals["expected"] if field_totals["expected"] else 0.0
+    return {
+        "flow": flow_name,
+        "emails": len(emails),
+        "category_accuracy": category_correct / n,
+        "field_precision": precision,
+        "field_recall": recall,
+        "field_f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "latency_mean_s": sum(latencies) / n,
+        "latency_p95_s": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        "llm_calls_per_email": sum(c["calls"] for c in usage.values()) / n,
+        "tokens_per_email": sum(c["prompt_tokens"] + c["completion_tokens"] for c in usage.values()) / n,
+        "cost_per_email_usd": _cost(usage) / n,
+        "escalation_rate": escalations / n,
+        "usage": usage,
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    columns = [
+        ("flow", "{:<12}"), ("category_accuracy", "{:>9.1%}"), ("field_f1", "{:>8.1%}"),
+        ("latency_mean_s", "{:>8.2f}"), ("llm_calls_per_email", "{:>6.2f}"),
+        ("tokens_per_email", "{:>8.0f}"), ("cost_per_email_usd", "{:>10.5f}"), ("escalation_rate", "{:>8.1%}"),
+    ]
+    headers = ["flow", "cat acc", "field F1", "lat (s)", "calls", "tokens", "cost ($)", "escal."]
+    widths = [12, 9, 8, 8, 6, 8, 10, 8]
+    print(" ".join(h.rjust(w) if i else h.ljust(w) for i, (h, w) in enumerate(zip(headers, widths))))
+    for result in results:
+        print(" ".join(fmt.format(result[name]) for name, fmt in columns))
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="DRE extraction evaluation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export reviewed extractions as a labeled set")
+    export.add_argument("--out", required=True)
+    export.add_argument("--limit", type=int, default=500)
+
+    run = sub.add_parser("run", help="Evaluate flows on a labeled set")
+    run.add_argument("labeled_set")
+    run.add_argument("--flows", nargs="+", choices=list(FLOWS), default=list(FLOWS))
+    run.add_argument("--limit", type=int, help="Only evaluate the first N emails")
+    run.add_argument("--json-out", help="Write results to this JSON file")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_labeled_set(args.out, args.limit)
+        return
+
+    from integrations.llm_cache import llm_cache
+    from integrations.llm_gateway import llm_gateway
+
+    if not llm_gateway.openai_enabled:
+        sys.exit("OPENAI_API_KEY is required to run the evaluation")
+    llm_cache.enabled = False
+
+    with open(args.labeled_set) as f:
+        emails = [json.loads(line) for line in f if line.strip()]
+    if args.limit:
+        emails = emails[:args.limit]
+
+    async def run_all():
+        results = [await evaluate(flow, emails) for flow in args.flows]
+        await llm_gateway.close()
+        return results
+
+    results = asyncio.run(run_all())
+    print_report(results)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
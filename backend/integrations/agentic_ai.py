@@ -2,13 +2,13 @@
 Agentic AI System
 Autonomous AI agent that executes tasks based on triggers and context
 """
-import os
 import logging
 import re
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from openai import OpenAI
 from enum import Enum
+from integrations.llm_gateway import llm_gateway
+from integrations.llm_scheduler import AGENT
 
 logger = logging.getLogger(__name__)
 
@@ -41,13 +41,11 @@ class AgenticAI:
     """Autonomous AI agent for task execution"""
 
     def __init__(self):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
-        if self.openai_api_key:
-            self.client = OpenAI(api_key=self.openai_api_key)
+        self.llm = llm_gateway
+        if self.llm.openai_enabled:
             self.enabled = True
             logger.info("Agentic AI initialized successfully")
         else:
-            self.client = None
             self.enabled = False
             logger.warning("Agentic AI not enabled - OpenAI API key not configured")
 
@@ -125,8 +123,10 @@ Please analyze this situation and recommend actions.
 """
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self.llm.chat(
                 model="gpt-4o-mini",
+                priority=AGENT,
+                tenant=context.get("user_id"),
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -349,6 +349,79 @@ class EmailService:
 
         return self._send_email(to_email, subject, html_content)
 
+    def send_invitation_email(self, to_email: str, setup_token: str, user_name: str = None):
+        """
+        Send an account invitation with a password setup link
+
+        Args:
+            to_email: Invited user's email address
+            setup_token: One-time password setup token
+            user_name: User's name (optional)
+        """
+        setup_url = f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/setup-password?token={setup_token}"
+
+        subject = "You've Been Invited to Mortgage CRM"
+
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{
+                    font-family: Arial, sans-serif;
+                    line-height: 1.6;
+                    color: #333;
+                }}
+                .container {{
+                    max-width: 600px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }}
+                .content {{
+                    background-color: #f9f9f9;
+                    padding: 30px;
+                    border-radius: 8px;
+                }}
+                .button {{
+                    display: inline-block;
+                    padding: 12px 30px;
+                    background-color: #18a0a6;
+                    color: white;
+                    text-decoration: none;
+                    border-radius: 5px;
+                    margin: 20px 0;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="content">
+                    <h2>Welcome to Mortgage CRM</h2>
+
+                    <p>Hi {user_name or 'there'},</p>
+
+                    <p>An account has been created for you on Mortgage CRM.</p>
+
+                    <p>Click the button below to choose your password and sign in:</p>
+
+                    <div style="text-align: center;">
+                        <a href="{setup_url}" class="button">Set Up Password</a>
+                    </div>
+
+                    <p>Or copy and paste this link into your browser:</p>
+                    <p style="word-break: break-all; color: #18a0a6;">{setup_url}</p>
+
+                    <p><strong>This link will expire in 7 days.</strong></p>
+
+                    <p>Best regards,<br>The Mortgage CRM Team</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+        return self._send_email(to_email, subject, html_content)
+
 
 class VerificationTokenService:
     """Service for managing email verification tokens"""
@@ -373,9 +446,10 @@ class VerificationTokenService:
         """
         from main import EmailVerificationToken  # Import here to avoid circular imports
 
-        # Delete any existing tokens for this user
+        # Delete any existing verification tokens for this user
         db.query(EmailVerificationToken).filter(
-            EmailVerificationToken.user_id == user_id
+            EmailVerificationToken.user_id == user_id,
+            EmailVerificationToken.purpose == "verify_email"
         ).delete()
 
         # Generate new token
@@ -387,6 +461,7 @@ class VerificationTokenService:
             token=token,
             user_id=user_id,
             email=email,
+            purpose="verify_email",
             expires_at=expires_at
         )
         db.add(db_token)
@@ -395,13 +470,14 @@ class VerificationTokenService:
         return token
 
     @staticmethod
-    def verify_token(db: Session, token: str) -> Optional[int]:
+    def verify_token(db: Session, token: str, purpose: str = "verify_email") -> Optional[int]:
         """
         Verify a token and return the user ID if valid
 
         Args:
             db: Database session
             token: Verification token
+            purpose: Token kind to accept (verify_email or password_setup)
 
         Returns:
             User ID if valid, None otherwise
@@ -409,7 +485,8 @@ class VerificationTokenService:
         from main import EmailVerificationToken
 
         token_record = db.query(EmailVerificationToken).filter(
-            EmailVerificationToken.token == token
+            EmailVerificationToken.token == token,
+            EmailVerificationToken.purpose == purpose
         ).first()
 
         if not token_record:
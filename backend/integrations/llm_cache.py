@@ -0,0 +1,259 @@
+"""
+LLM Response Cache
+Caches deterministic LLM responses keyed by provider, model, normalized
+messages and parameters. An in-memory LRU sits in front of the
+`llm_response_cache` table so repeats survive restarts and are shared
+across workers.
+
+Only call sites that opt in (by passing `cache_site` to the gateway) are
+cached; each site has its own TTL. Tool-calling chat and other
+non-deterministic sites (e.g. the coach, which samples at temperature 0.7
+so "ask again" gives a fresh answer) don't pass a site and are never cached.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default TTL per call site, in seconds. Override with LLM_CACHE_TTL_<SITE>
+# (e.g. LLM_CACHE_TTL_UNDERWRITER=3600); a TTL of 0 disables that site.
+DEFAULT_SITE_TTLS = {
+    "underwriter": 7 * 24 * 3600,       # Guideline answers change rarely
+    "email_classification": 24 * 3600,  # Vendor templates repeat daily
+    "loan_extraction": 24 * 3600,
+    "email_triage": 24 * 3600,          # Combined classify + extract
+}
+
+DEFAULT_MEMORY_ENTRIES = 1000
+PURGE_EVERY_WRITES = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_text(value: str) -> str:
+    return _WHITESPACE.sub(" ", value).strip()
+
+
+def _normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    normalized = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            content = _normalize_text(content)
+        normalized.append({**message, "content": content})
+    return normalized
+
+
+def cache_key(provider: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """SHA-256 of the provider, model, normalized messages and call parameters"""
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": _normalize_messages(messages),
+            "params": params,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + database) cache for serialized LLM responses"""
+
+    def __init__(self, memory_entries: Optional[int] = None):
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.memory_entries = memory_entries or int(
+            os.getenv("LLM_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)
+        )
+        # key -> (expires_at epoch seconds, response payload)
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0}
+        )
+        self._writes = 0
+
+    def ttl_for(self, site: str) -> int:
+        """TTL in seconds for a call site (0 = not cached)"""
+        override = os.getenv(f"LLM_CACHE_TTL_{site.upper()}")
+        if override is not None:
+            return int(override)
+        return DEFAULT_SITE_TTLS.get(site, 0)
+
+    def is_cacheable(self, site: Optional[str]) -> bool:
+        return self.enabled and bool(site) and self.ttl_for(site) > 0
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return payload
+
+    def _memory_put(self, key: str, payload: Dict[str, Any], expires_at: float):
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Persistent tier (sync; run in a thread)
+    # ------------------------------------------------------------------
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        from main import SessionLocal, LLMResponseCacheEntry
+
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMResponseCacheEntry).filter(LLMResponseCacheEntry.cache_key == key).first()
+            if not entry:
+                return None
+
+            expires_at = entry.expires_at
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= datetime.now(timezone.utc):
+                db.delete(entry)
+                db.commit()
+                return None
+
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_used_at = datetime.now(timezone.utc)
+            db.commit()
+            return expires_at.timestamp(), entry.response
+        finally:
+            db.close()
+
+    def _db_put(self, key: str, site: str, provider: str, model: str, payload: Dict[str, Any], ttl: int):
+        from main import SessionLocal, LLMResponseCacheEntry
+
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMResponseCacheEntry).filter(LLMResponseCacheEntry.cache_key == key).first()
+            if entry:
+                entry.response = payload
+                entry.expires_at = now + timedelta(seconds=ttl)
+                entry.last_used_at = now
+            else:
+                db.add(LLMResponseCacheEntry(
+                    cache_key=key,
+                    call_site=site,
+                    provider=provider,
+                    model=model,
+                    response=payload,
+                    hit_count=0,
+                    created_at=now,
+                    last_used_at=now,
+                    expires_at=now + timedelta(seconds=ttl)
+                ))
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows from the persistent store. Returns number removed."""
+        from main import SessionLocal, LLMResponseCacheEntry
+
+        db = SessionLocal()
+        try:
+            removed = db.query(LLMResponseCacheEntry).filter(
+                LLMResponseCacheEntry.expires_at < datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        if removed:
+            logger.info(f"Purged {removed} expired LLM cache entries")
+        return removed
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def get(self, site: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached response payload for `key`, or None"""
+        payload = self._memory_get(key)
+        if payload is not None:
+            self._stats[site]["memory_hits"] += 1
+            return payload
+
+        try:
+            stored = await asyncio.to_thread(self._db_get, key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            stored = None
+
+        if stored is not None:
+            expires_at, payload = stored
+            self._memory_put(key, payload, expires_at)
+            self._stats[site]["persistent_hits"] += 1
+            return payload
+
+        self._stats[site]["misses"] += 1
+        return None
+
+    async def put(self, site: str, key: str, provider: str, model: str, payload: Dict[str, Any]):
+        """Store a response payload under `key` with the site's TTL"""
+        ttl = self.ttl_for(site)
+        self._memory_put(key, payload, time.time() + ttl)
+        self._stats[site]["stores"] += 1
+
+        try:
+            await asyncio.to_thread(self._db_put, key, site, provider, model, payload, ttl)
+            self._writes += 1
+            if self._writes % PURGE_EVERY_WRITES == 0:
+                await asyncio.to_thread(self.purge_expired)
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics per call site and overall"""
+        sites = {}
+        totals = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0}
+        for site, counts in self._stats.items():
+            lookups = counts["memory_hits"] + counts["persistent_hits"] + counts["misses"]
+            hits = counts["memory_hits"] + counts["persistent_hits"]
+            sites[site] = {
+                **counts,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "ttl_seconds": self.ttl_for(site),
+            }
+            for name in totals:
+                totals[name] += counts[name]
+
+        lookups = totals["memory_hits"] + totals["persistent_hits"] + totals["misses"]
+        hits = totals["memory_hits"] + totals["persistent_hits"]
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "memory_capacity": self.memory_entries,
+            **totals,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "sites": sites,
+        }
+
+    def clear_memory(self):
+        self._memory.clear()
+
+
+# Global instance
+llm_cache = LLMResponseCache()
@@ -0,0 +1,344 @@
+"""
+LLM Gateway
+Shared async clients for OpenAI and Anthropic with pooled HTTP connections,
+timeouts and retries. Every LLM call in the request path goes through here so
+no handler blocks the event loop waiting on a model.
+
+Uncached calls are admitted by the LLM scheduler (priority class, per-tenant
+and global token budgets). `priority` and `tenant` default to the scheduler
+context, i.e. an interactive call with no tenant.
+"""
+import os
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import openai
+import anthropic
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from anthropic import AsyncAnthropic
+from anthropic.types import Message
+
+from integrations.llm_cache import llm_cache, cache_key
+from integrations.llm_scheduler import llm_scheduler, estimate_tokens, INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_MAX_CONNECTIONS = 50
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_RATE_LIMIT_RETRIES = 3
+
+RATE_LIMIT_ERRORS = (openai.RateLimitError, anthropic.RateLimitError)
+
+
+class LLMNotConfiguredError(RuntimeError):
+    """Raised when a provider is called without an API key"""
+
+
+class LLMGateway:
+    """Lazily built AsyncOpenAI / AsyncAnthropic clients over one connection pool each"""
+
+    def __init__(self):
+        self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
+        self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY", "")
+        self.timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS))
+        self.connect_timeout_seconds = float(
+            os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", DEFAULT_CONNECT_TIMEOUT_SECONDS)
+        )
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+        self.max_keepalive_connections = int(
+            os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)
+        )
+        # Extra attempts for background calls after the SDK's own retries hit 429
+        self.rate_limit_retries = int(os.getenv("LLM_RATE_LIMIT_RETRIES", DEFAULT_RATE_LIMIT_RETRIES))
+        self._openai: Optional[AsyncOpenAI] = None
+        self._anthropic: Optional[AsyncAnthropic] = None
+        # model -> {"calls", "prompt_tokens", "completion_tokens"} for uncached calls
+        self.usage: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        )
+
+        if not self.openai_api_key:
+            logger.warning("OpenAI API key not configured - OpenAI features disabled")
+        if not self.anthropic_api_key:
+            logger.warning("Anthropic API key not configured - Anthropic features disabled")
+
+    @property
+    def openai_enabled(self) -> bool:
+        return bool(self.openai_api_key)
+
+    @property
+    def anthropic_enabled(self) -> bool:
+        return bool(self.anthropic_api_key)
+
+    def _http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout_seconds, connect=self.connect_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections
+            )
+        )
+
+    @property
+    def openai(self) -> AsyncOpenAI:
+        if not self.openai_enabled:
+            raise LLMNotConfiguredError("OpenAI API key not configured")
+        if self._openai is None:
+            self._openai = AsyncOpenAI(
+                api_key=self.openai_api_key,
+                timeout=self.timeout_seconds,
+                max_retries=self.max_retries,
+                http_client=self._http_client()
+            )
+        return self._openai
+
+    @property
+    def anthropic(self) -> AsyncAnthropic:
+        if not self.anthropic_enabled:
+            raise LLMNotConfiguredError("Anthropic API key not configured")
+        if self._anthropic is None:
+            self._anthropic = AsyncAnthropic(
+                api_key=self.anthropic_api_key,
+                timeout=self.timeout_seconds,
+                max_retries=self.max_retries,
+                http_client=self._http_client()
+            )
+        return self._anthropic
+
+    def _record_usage(self, model: str, prompt_tokens: int, completion_tokens: int):
+        counts = self.usage[model]
+        counts["calls"] += 1
+        counts["prompt_tokens"] += prompt_tokens or 0
+        counts["completion_tokens"] += completion_tokens or 0
+
+    def usage_snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Copy of the per-model call and token counters"""
+        return {model: dict(counts) for model, counts in self.usage.items()}
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        value = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    async def _admitted(
+        self,
+        priority: Optional[str],
+        tenant: Optional[Any],
+        tokens: int,
+        call: Callable[[], Awaitable[Any]]
+    ):
+        """
+        Run `call` inside a scheduler lease. Returns (lease, result); the
+        caller must release the lease. On 429 the scheduler pauses background
+        classes and background calls are re-queued (interactive calls fail fast).
+        """
+        priority, tenant = llm_scheduler.current(priority, tenant)
+        attempt = 0
+        while True:
+            lease = await llm_scheduler.acquire(priority, tenant, tokens)
+            try:
+                result = await call()
+            except RATE_LIMIT_ERRORS as e:
+                llm_scheduler.report_rate_limit(priority, self._retry_after(e))
+                llm_scheduler.release(lease)
+                if priority == INTERACTIVE or attempt >= self.rate_limit_retries:
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                llm_scheduler.release(lease)
+                raise
+            llm_scheduler.report_success()
+            return lease, result
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        cache_site: Optional[str] = None,
+        priority: Optional[str] = None,
+        tenant: Optional[Any] = None,
+        **params
+    ):
+        """
+        OpenAI chat completion.
+
+        Args:
+            model: Model name (e.g. "gpt-4o-mini")
+            messages: Chat messages
+            cache_site: Call site name for deterministic calls that may be served
+                from the response cache (see llm_cache.DEFAULT_SITE_TTLS); None
+                disables caching
+            priority: Scheduler class ("interactive", "agent" or "batch")
+            tenant: Budget owner, normally the user id
+            **params: Any other chat.completions.create argument
+
+        Returns:
+            The ChatCompletion response
+        """
+        key = None
+        if llm_cache.is_cacheable(cache_site):
+            key = cache_key("openai", model, messages, params)
+            cached = await llm_cache.get(cache_site, key)
+            if cached is not None:
+                return ChatCompletion.model_validate(cached)
+
+        lease, response = await self._admitted(
+            priority, tenant, estimate_tokens(messages, params.get("max_tokens")),
+            lambda: self.openai.chat.completions.create(model=model, messages=messages, **params)
+        )
+        lease.record_usage(response.usage.total_tokens if response.usage else None)
+        llm_scheduler.release(lease)
+        self._record_usage(model, response.usage.prompt_tokens if response.usage else 0,
+                           response.usage.completion_tokens if response.usage else 0)
+
+        if key:
+            await llm_cache.put(cache_site, key, "openai", model, response.model_dump())
+        return response
+
+    async def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        priority: Optional[str] = None,
+        tenant: Optional[Any] = None,
+        **params
+    ) -> AsyncIterator[Any]:
+        """
+        Streaming OpenAI chat completion.
+        Yields ChatCompletionChunk objects as they arrive. The scheduler slot
+        is held until the stream ends.
+        """
+        lease, stream = await self._admitted(
+            priority, tenant, estimate_tokens(messages, params.get("max_tokens")),
+            lambda: self.openai.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        )
+        try:
+            self._record_usage(model, 0, 0)  # Token usage isn't reported on streams
+            async for chunk in stream:
+                yield chunk
+        finally:
+            llm_scheduler.release(lease)
+
+    async def embed(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-3-small",
+        priority: Optional[str] = None,
+        tenant: Optional[Any] = None
+    ) -> List[List[float]]:
+        """OpenAI embeddings for a batch of texts, in input order"""
+        lease, response = await self._admitted(
+            priority, tenant, sum(len(text) for text in texts) // 4 + len(texts),
+            lambda: self.openai.embeddings.create(model=model, input=texts)
+        )
+        lease.record_usage(response.usage.total_tokens if response.usage else None)
+        llm_scheduler.release(lease)
+        self._record_usage(model, response.usage.prompt_tokens if response.usage else 0, 0)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def anthropic_message(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        system: Optional[str] = None,
+        cache_site: Optional[str] = None,
+        priority: Optional[str] = None,
+        tenant: Optional[Any] = None,
+        **params
+    ):
+        """Anthropic Messages API call. Returns the Message response (cached like chat)."""
+        if system is not None:
+            params["system"] = system
+
+        key = None
+        if llm_cache.is_cacheable(cache_site):
+            key = cache_key("anthropic", model, messages, {"max_tokens": max_tokens, **params})
+            cached = await llm_cache.get(cache_site, key)
+            if cached is not None:
+                return Message.model_validate(cached)
+
+        lease, response = await self._admitted(
+            priority, tenant, estimate_tokens(messages, max_tokens),
+            lambda: self.anthropic.messages.create(model=model, messages=messages, max_tokens=max_tokens, **params)
+        )
+        lease.record_usage(response.usage.input_tokens + response.usage.output_tokens)
+        llm_scheduler.release(lease)
+        self._record_usage(model, response.usage.input_tokens, response.usage.output_tokens)
+
+        if key:
+            await llm_cache.put(cache_site, key, "anthropic", model, response.model_dump())
+        return response
+
+    async def anthropic_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        system: Optional[str] = None,
+        cache_site: Optional[str] = None,
+        priority: Optional[str] = None,
+        tenant: Optional[Any] = None,
+        **params
+    ) -> AsyncIterator[str]:
+        """
+        Streaming Anthropic Messages API call. Yields text deltas.
+        A cache hit is yielded as a single delta; a miss is cached once complete.
+        """
+        if system is not None:
+            params["system"] = system
+
+        key = None
+        if llm_cache.is_cacheable(cache_site):
+            key = cache_key("anthropic", model, messages, {"max_tokens": max_tokens, **params})
+            cached = await llm_cache.get(cache_site, key)
+            if cached is not None:
+                yield "".join(block.text for block in Message.model_validate(cached).content if block.type == "text")
+                return
+
+        priority, tenant = llm_scheduler.current(priority, tenant)
+        lease = await llm_scheduler.acquire(priority, tenant, estimate_tokens(messages, max_tokens))
+        try:
+            async with self.anthropic.messages.stream(
+                model=model, messages=messages, max_tokens=max_tokens, **params
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final_message = await stream.get_final_message()
+            lease.record_usage(final_message.usage.input_tokens + final_message.usage.output_tokens)
+            llm_scheduler.report_success()
+        except RATE_LIMIT_ERRORS as e:
+            llm_scheduler.report_rate_limit(priority, self._retry_after(e))
+            raise
+        finally:
+            llm_scheduler.release(lease)
+        self._record_usage(model, final_message.usage.input_tokens, final_message.usage.output_tokens)
+
+        if key:
+            await llm_cache.put(cache_site, key, "anthropic", model, final_message.model_dump())
+
+    async def close(self):
+        """Close pooled connections (called on app shutdown)"""
+        if self._openai is not None:
+            await self._openai.close()
+            self._openai = None
+        if self._anthropic is not None:
+            await self._anthropic.close()
+            self._anthropic = None
+        logger.info("LLM gateway connections closed")
+
+
+# Global instance
+llm_gateway = LLMGateway()
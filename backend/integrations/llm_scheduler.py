@@ -0,0 +1,432 @@
+"""
+LLM Scheduler
+Admission control in front of every LLM call. Calls are queued by priority
+class (interactive > agent > batch) and admitted when a concurrency slot and
+tokens-per-minute budget are available, both globally and for the calling
+tenant (user). A slice of the global concurrency and token budget is held
+back for interactive calls, so background extraction and agent runs can
+saturate the rest of the quota without making chat wait or fail.
+
+When a provider answers 429, background classes are paused with exponential
+backoff (honouring Retry-After) while interactive calls keep flowing.
+
+Budgets are enforced per process. Every process that calls the providers
+(each API worker, and each agent_worker.py) runs its own scheduler, so
+LLM_GLOBAL_TPM and LLM_TENANT_TPM are the account-wide figures and each
+process takes 1/LLM_SCHEDULER_PROCESSES of them. Set it to the number of
+such processes in the deployment.
+
+Call sites choose a priority and tenant with `llm_scheduler.context(...)`
+or by passing them to the gateway; anything unset runs as interactive.
+"""
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import contextvars
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+AGENT = "agent"
+BATCH = "batch"
+PRIORITIES = {INTERACTIVE: 0, AGENT: 1, BATCH: 2}
+
+# Seconds a call may wait in the queue before giving up, per class
+DEFAULT_DEADLINES = {INTERACTIVE: 30, AGENT: 300, BATCH: 900}
+
+DEFAULT_MAX_CONCURRENT = 16
+DEFAULT_INTERACTIVE_RESERVED_SLOTS = 4
+DEFAULT_GLOBAL_TPM = 400_000
+DEFAULT_TENANT_TPM = 60_000
+DEFAULT_INTERACTIVE_TPM_RESERVE = 0.2
+DEFAULT_BACKOFF_BASE_SECONDS = 2
+DEFAULT_BACKOFF_MAX_SECONDS = 60
+DEFAULT_PROCESSES = 1
+
+# Idle tenant buckets (refilled to capacity) are dropped this often
+TENANT_BUCKET_SWEEP_SECONDS = 60
+
+# Completion budget assumed when a call doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+_WAIT_SAMPLES = 200
+
+_context: contextvars.ContextVar[Tuple[str, Optional[Any]]] = contextvars.ContextVar(
+    "llm_scheduler_context", default=(INTERACTIVE, None)
+)
+
+
+class LLMQueueTimeoutError(RuntimeError):
+    """Raised when a call can't be admitted before its deadline"""
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> int:
+    """Rough prompt + completion token estimate (about 4 characters per token)"""
+    prompt_chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        prompt_chars += len(content) if isinstance(content, str) else len(str(content or ""))
+    return prompt_chars // 4 + 4 * len(messages) + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """Tokens-per-minute budget refilled continuously; may run negative after under-estimates"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def consume(self, tokens: float):
+        self._refill()
+        self.tokens -= tokens
+
+    def seconds_until(self, tokens: float) -> float:
+        """Seconds until `tokens` are available"""
+        missing = tokens - self.available()
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: str, tenant: Optional[Any], tokens: int):
+        self.priority = priority
+        self.tenant = tenant
+        self.tokens = tokens
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class LLMLease:
+    """An admitted call. Report actual usage so the budgets stay accurate."""
+
+    def __init__(self, scheduler: "LLMScheduler", priority: str, tenant: Optional[Any], tokens: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tenant = tenant
+        self.estimated_tokens = tokens
+        self.actual_tokens: Optional[int] = None
+
+    def record_usage(self, tokens: Optional[int]):
+        if tokens:
+            self.actual_tokens = tokens
+
+
+class LLMScheduler:
+    """Priority queue with global/per-tenant concurrency and TPM budgets"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_SCHEDULER_ENABLED", "true").lower() == "true"
+        self.max_concurrent = int(os.getenv("LLM_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT))
+        self.interactive_reserved_slots = int(
+            os.getenv("LLM_INTERACTIVE_RESERVED_SLOTS", DEFAULT_INTERACTIVE_RESERVED_SLOTS)
+        )
+        # This process's share of the account-wide budgets
+        self.processes = max(1, int(os.getenv("LLM_SCHEDULER_PROCESSES", DEFAULT_PROCESSES)))
+        self.global_tpm = int(os.getenv("LLM_GLOBAL_TPM", DEFAULT_GLOBAL_TPM)) // self.processes
+        self.tenant_tpm = int(os.getenv("LLM_TENANT_TPM", DEFAULT_TENANT_TPM)) // self.processes
+        self.interactive_tpm_reserve = float(
+            os.getenv("LLM_INTERACTIVE_TPM_RESERVE", DEFAULT_INTERACTIVE_TPM_RESERVE)
+        )
+        self.backoff_base_seconds = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", DEFAULT_BACKOFF_BASE_SECONDS))
+        self.backoff_max_seconds = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", DEFAULT_BACKOFF_MAX_SECONDS))
+        self.deadlines = {
+            name: float(os.getenv(f"LLM_DEADLINE_{name.upper()}_SECONDS", seconds))
+            for name, seconds in DEFAULT_DEADLINES.items()
+        }
+
+        self._global_bucket = TokenBucket(self.global_tpm)
+        self._tenant_buckets: Dict[Any, TokenBucket] = {}
+        self._buckets_swept_at = time.monotonic()
+        # Heap of (priority rank, sequence, waiter)
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._inflight = 0
+        self._inflight_background = 0
+        self._backoff_until = 0.0
+        self._consecutive_rate_limits = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"admitted": 0, "timeouts": 0, "rate_limited": 0}
+        )
+        self._waits: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_WAIT_SAMPLES))
+
+    # ------------------------------------------------------------------
+    # Call context
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def context(self, priority: Optional[str] = None, tenant: Optional[Any] = None):
+        """Set the priority class and/or tenant for LLM calls made inside the block"""
+        current_priority, current_tenant = _context.get()
+        token = _context.set((priority or current_priority, tenant if tenant is not None else current_tenant))
+        try:
+            yield
+        finally:
+            _context.reset(token)
+
+    def current(self, priority: Optional[str] = None, tenant: Optional[Any] = None) -> Tuple[str, Optional[Any]]:
+        """Resolve explicit arguments against the surrounding context"""
+        current_priority, current_tenant = _context.get()
+        priority = priority or current_priority
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority class: {priority}")
+        return priority, tenant if tenant is not None else current_tenant
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def _tenant_bucket(self, tenant: Any) -> TokenBucket:
+        bucket = self._tenant_buckets.get(tenant)
+        if bucket is None:
+            bucket = self._tenant_buckets[tenant] = TokenBucket(self.tenant_tpm)
+        return bucket
+
+    def _evict_idle_buckets(self):
+        """Drop tenant buckets that refilled to capacity; a fresh bucket is identical"""
+        now = time.monotonic()
+        if now - self._buckets_swept_at < TENANT_BUCKET_SWEEP_SECONDS:
+            return
+        self._buckets_swept_at = now
+        waiting = {waiter.tenant for _, _, waiter in self._queue}
+        for tenant in [
+            tenant for tenant, bucket in self._tenant_buckets.items()
+            if tenant not in waiting and bucket.available() >= bucket.capacity
+        ]:
+            del self._tenant_buckets[tenant]
+
+    def _blocked_for(self, waiter: _Waiter) -> Tuple[Optional[str], float]:
+        """
+        Why `waiter` can't start now, and how long until that may change.
+        Returns (None, 0) when it can be admitted. Reasons starting with
+        "global" hold back every lower-priority waiter as well.
+        """
+        interactive = waiter.priority == INTERACTIVE
+
+        if self._inflight >= self.max_concurrent:
+            return "global_concurrency", 0.0
+        if not interactive:
+            if self._inflight_background >= self.max_concurrent - self.interactive_reserved_slots:
+                return "global_concurrency", 0.0
+            backoff = self._backoff_until - time.monotonic()
+            if backoff > 0:
+                return "global_backoff", backoff
+
+        reserve = 0.0 if interactive else self._global_bucket.capacity * self.interactive_tpm_reserve
+        needed = min(waiter.tokens, self._global_bucket.capacity - reserve)
+        if self._global_bucket.available() - reserve < needed:
+            return "global_tokens", self._global_bucket.seconds_until(needed + reserve)
+
+        if waiter.tenant is not None:
+            bucket = self._tenant_bucket(waiter.tenant)
+            needed = min(waiter.tokens, bucket.capacity)
+            if bucket.available() < needed:
+                return "tenant_tokens", bucket.seconds_until(needed)
+
+        return None, 0.0
+
+    def _admit(self, waiter: _Waiter):
+        self._inflight += 1
+        if waiter.priority != INTERACTIVE:
+            self._inflight_background += 1
+        self._global_bucket.consume(waiter.tokens)
+        if waiter.tenant is not None:
+            self._tenant_bucket(waiter.tenant).consume(waiter.tokens)
+
+        self._counters[waiter.priority]["admitted"] += 1
+        self._waits[waiter.priority].append(time.monotonic() - waiter.enqueued_at)
+        waiter.future.set_result(None)
+
+    def _dispatch(self):
+        """Admit every waiter that fits, in priority order"""
+        self._timer = None
+        retry_in: Optional[float] = None
+        blocked_rank: Optional[int] = None
+        remaining = []
+
+        for rank, sequence, waiter in sorted(self._queue):
+            if waiter.future.done():
+                continue  # Timed out or cancelled
+            if blocked_rank is not None and rank > blocked_rank:
+                remaining.append((rank, sequence, waiter))
+                continue
+
+            reason, wait = self._blocked_for(waiter)
+            if reason is None:
+                self._admit(waiter)
+                continue
+
+            remaining.append((rank, sequence, waiter))
+            if reason.startswith("global") and blocked_rank is None:
+                blocked_rank = rank
+            if wait > 0:
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+
+        heapq.heapify(remaining)
+        self._queue = remaining
+
+        # Concurrency frees up on release; token refill and backoff need a timer
+        if self._queue and retry_in is not None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(min(max(retry_in, 0.05), 5.0), self._dispatch)
+
+    def _release(self, lease: LLMLease):
+        self._inflight -= 1
+        if lease.priority != INTERACTIVE:
+            self._inflight_background -= 1
+
+        # Correct the budgets with real usage (refund or charge the difference)
+        if lease.actual_tokens is not None:
+            delta = lease.actual_tokens - lease.estimated_tokens
+            self._global_bucket.consume(delta)
+            if lease.tenant is not None:
+                self._tenant_bucket(lease.tenant).consume(delta)
+        self._evict_idle_buckets()
+
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    async def acquire(
+        self,
+        priority: str,
+        tenant: Optional[Any],
+        tokens: int,
+        deadline: Optional[float] = None
+    ) -> LLMLease:
+        """
+        Wait for admission. Raises LLMQueueTimeoutError if the call isn't
+        admitted within `deadline` seconds (the class default when None).
+        """
+        lease = LLMLease(self, priority, tenant, tokens)
+        if not self.enabled:
+            return lease
+
+        timeout = deadline if deadline is not None else self.deadlines[priority]
+        waiter = _Waiter(priority, tenant, tokens)
+        heapq.heappush(self._queue, (PRIORITIES[priority], next(self._sequence), waiter))
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self._counters[priority]["timeouts"] += 1
+                raise LLMQueueTimeoutError(
+                    f"LLM call ({priority}) not admitted within {timeout:.0f}s"
+                )
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(lease)  # Admitted just as the caller went away
+            else:
+                waiter.future.cancel()
+            raise
+        return lease
+
+    def release(self, lease: LLMLease):
+        if self.enabled:
+            self._release(lease)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Optional[str] = None,
+        tenant: Optional[Any] = None,
+        tokens: int = DEFAULT_COMPLETION_TOKENS,
+        deadline: Optional[float] = None
+    ):
+        """Hold an admitted slot for the duration of the block"""
+        priority, tenant = self.current(priority, tenant)
+        lease = await self.acquire(priority, tenant, tokens, deadline)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    # ------------------------------------------------------------------
+    # Rate limits
+    # ------------------------------------------------------------------
+
+    def report_rate_limit(self, priority: str, retry_after: Optional[float] = None) -> float:
+        """
+        Record a provider 429 and pause background classes.
+        Returns the backoff applied, in seconds.
+        """
+        self._consecutive_rate_limits += 1
+        self._counters[priority]["rate_limited"] += 1
+
+        backoff = min(
+            self.backoff_max_seconds,
+            self.backoff_base_seconds * 2 ** (self._consecutive_rate_limits - 1)
+        )
+        if retry_after:
+            backoff = max(backoff, min(retry_after, self.backoff_max_seconds))
+
+        self._backoff_until = max(self._backoff_until, time.monotonic() + backoff)
+        logger.warning(f"LLM provider rate limited ({priority}); pausing background calls for {backoff:.1f}s")
+        return backoff
+
+    def report_success(self):
+        self._consecutive_rate_limits = 0
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        queued = defaultdict(int)
+        for _, _, waiter in self._queue:
+            if not waiter.future.done():
+                queued[waiter.priority] += 1
+
+        classes = {}
+        for name in PRIORITIES:
+            waits = sorted(self._waits[name])
+            classes[name] = {
+                **self._counters[name],
+                "queued": queued[name],
+                "wait_mean_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_p95_s": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "deadline_s": self.deadlines[name],
+            }
+
+        return {
+            "enabled": self.enabled,
+            "inflight": self._inflight,
+            "inflight_background": self._inflight_background,
+            "max_concurrent": self.max_concurrent,
+            "interactive_reserved_slots": self.interactive_reserved_slots,
+            "processes": self.processes,
+            "global_tpm": self.global_tpm,
+            "global_tokens_available": int(self._global_bucket.available()),
+            "tenant_tpm": self.tenant_tpm,
+            "tenants_tracked": len(self._tenant_buckets),
+            "backoff_remaining_s": round(max(0.0, self._backoff_until - time.monotonic()), 1),
+            "classes": classes,
+        }
+
+
+# Global instance
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,150 @@
+"""
+Prompt Builder
+Token-aware prompt assembly for chat and agent calls. Counts tokens (tiktoken
+when installed, a character estimate otherwise), enforces a per-call prompt
+budget and trims the oldest history turns first, replacing them with a
+summary when one is available.
+
+Messages are ordered stable-first: the fixed system prompt, then tool
+schemas (sent alongside by the caller), then per-request context, summary,
+history and the new turn. Keeping the long, unchanging part at the front
+lets provider-side prompt caching reuse it across calls.
+"""
+import os
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    logger.warning("tiktoken not installed - prompt token counts are estimated. Install with: pip install tiktoken")
+
+# Per-message framing overhead in chat formats (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+CHARS_PER_TOKEN = 4
+
+DEFAULT_PROMPT_BUDGETS = {
+    "ai_chat": 6000,
+    "agent": 8000,
+}
+
+
+def prompt_budget(site: str) -> int:
+    """Max prompt tokens for a call site. Override with PROMPT_MAX_TOKENS_<SITE>."""
+    return int(os.getenv(f"PROMPT_MAX_TOKENS_{site.upper()}", DEFAULT_PROMPT_BUDGETS.get(site, 8000)))
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base" if model.startswith(("gpt-4o", "o1", "o3")) else "cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _message_text(message: Any) -> str:
+    """Text of an OpenAI dict message, SDK message object or LangChain message"""
+    if isinstance(message, dict):
+        content = message.get("content")
+        tool_calls = message.get("tool_calls")
+    else:
+        content = getattr(message, "content", "")
+        tool_calls = getattr(message, "tool_calls", None)
+
+    text = content if isinstance(content, str) else json.dumps(content, default=str) if content else ""
+    if tool_calls:
+        text += json.dumps(tool_calls, default=str)
+    return text
+
+
+def count_message_tokens(messages: Sequence[Any], model: str = "gpt-4o-mini") -> int:
+    return sum(count_tokens(_message_text(m), model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def count_tool_tokens(tools: Optional[Sequence[Dict[str, Any]]], model: str = "gpt-4o-mini") -> int:
+    if not tools:
+        return 0
+    return count_tokens(json.dumps(list(tools), sort_keys=True), model)
+
+
+def fit_history(
+    turns: Sequence[Sequence[Any]],
+    budget: int,
+    model: str = "gpt-4o-mini"
+) -> Tuple[List[Any], int]:
+    """
+    Keep the newest turns that fit in `budget` tokens.
+
+    `turns` is oldest-first; each turn is a group of messages that must stay
+    together (e.g. a user message and its reply, or an assistant tool call
+    and its tool results). Returns (kept messages, number of turns dropped).
+    """
+    kept: List[Sequence[Any]] = []
+    used = 0
+    for turn in reversed(turns):
+        tokens = count_message_tokens(turn, model)
+        if used + tokens > budget:
+            break
+        kept.append(turn)
+        used += tokens
+
+    kept.reverse()
+    return [message for turn in kept for message in turn], len(turns) - len(kept)
+
+
+def summary_message(summary: str) -> Dict[str, str]:
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+
+def build_messages(
+    system: str,
+    user: str,
+    model: str,
+    budget: int,
+    turns: Sequence[Sequence[Dict[str, Any]]] = (),
+    context: Optional[str] = None,
+    summary: Optional[str] = None,
+    tools: Optional[Sequence[Dict[str, Any]]] = None,
+    completion_tokens: int = 0
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Assemble a chat prompt within `budget` tokens.
+
+    Order: static system prompt, per-request context, summary of older turns,
+    as many recent turns as fit, then the new user message. Tool schemas are
+    not part of the list but count against the budget, as does
+    `completion_tokens` when the budget covers the whole context window.
+
+    Returns (messages, number of history turns dropped).
+    """
+    head = [{"role": "system", "content": system}]
+    if context:
+        head.append({"role": "system", "content": context})
+    if summary:
+        head.append(summary_message(summary))
+    tail = [{"role": "user", "content": user}]
+
+    fixed = (
+        count_message_tokens(head, model)
+        + count_message_tokens(tail, model)
+        + count_tool_tokens(tools, model)
+        + completion_tokens
+    )
+    history, dropped = fit_history(turns, max(0, budget - fixed), model)
+    if dropped:
+        logger.debug(f"Prompt budget {budget}: dropped {dropped} of {len(turns)} history turns")
+    return head + history + tail, dropped
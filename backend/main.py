@@ -16,15 +16,14 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, Enum as SQLEnum, func, text, or_
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, Date, DateTime, Text, LargeBinary, ForeignKey, JSON, Enum as SQLEnum, func, text, or_, true
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from pydantic import BaseModel, EmailStr, validator
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uvicorn
 import os
 import json
@@ -33,11 +32,10 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 import enum
+import asyncio
 import logging
 import random
 import secrets
-from openai import OpenAI
-import anthropic
 import requests
 
 # For Microsoft Teams Integration
@@ -67,8 +65,11 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Shared async LLM clients (pooled connections, timeouts, retries, response cache)
+from integrations.llm_gateway import llm_gateway
+from integrations.llm_cache import llm_cache
+from integrations.llm_scheduler import llm_scheduler
+from integrations.prompt_builder import build_messages, prompt_budget
 
 # Microsoft Graph API configuration
 MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID")
@@ -326,6 +327,7 @@ class AITask(Base):
     ai_completed = Column(Boolean, default=False)  # AI completion flag
     ai_approved = Column(Boolean, default=False)  # User approval flag
     ai_edited = Column(Boolean, default=False)  # User edit flag
+    overdue_notified_at = Column(DateTime)  # TASK_OVERDUE emitted (see services/overdue_sweeper.py)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     loan = relationship("Loan", back_populates="tasks")
@@ -349,6 +351,7 @@ class Task(Base):
     ai_approved = Column(Boolean, default=False)  # True if user approved AI's work
     ai_edited = Column(Boolean, default=False)  # True if user made corrections
     completed_at = Column(DateTime)
+    overdue_notified_at = Column(DateTime)  # TASK_OVERDUE emitted (see services/overdue_sweeper.py)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     owner = relationship("User", backref="tasks")
@@ -633,10 +636,60 @@ class AgentMemory(Base):
     memory_type = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     meta_data = Column(JSON)  # Renamed from metadata (reserved word)
-    embedding_vector = Column(Text)  # Will use pgvector later
+    embedding_vector = Column(Text)  # base64 float32 embedding (NumPy backend; pgvector uses the `embedding` column)
+    embedded_at = Column(DateTime, index=True)  # Set by the vector store embedder
+    claim_token = Column(String)  # Embedder batch that owns this row while embedding
+    claimed_at = Column(DateTime)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+class AgentEvent(Base):
+    """Durable agent event outbox (see agents/events.py EventBus)"""
+    __tablename__ = "agent_events"
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    entity_type = Column(String)
+    entity_id = Column(Integer)
+    tenant_id = Column(Integer)  # User the event belongs to (fair claiming across tenants)
+    data = Column(JSON)
+    source = Column(String)
+    status = Column(String, default="pending", index=True)  # pending, processing, done, dead
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime, index=True)  # Next time the event may be claimed (retry backoff / visibility timeout)
+    claim_token = Column(String)  # Dispatcher batch that owns the event while processing
+    claimed_at = Column(DateTime)
+    last_error = Column(Text)
+    started_runs = Column(JSON)  # Handler runs already started by an earlier attempt (not re-run on retry)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class AgentCheckpoint(Base):
+    """LangGraph checkpoint of an agent workflow run (see agents/checkpointer.py)"""
+    __tablename__ = "agent_checkpoints"
+    id = Column(Integer, primary_key=True, index=True)
+    thread_id = Column(String, nullable=False, index=True)  # Workflow id
+    checkpoint_ns = Column(String, nullable=False, default="")
+    checkpoint_id = Column(String, nullable=False)
+    parent_checkpoint_id = Column(String)
+    type = Column(String, nullable=False)  # Serializer type (+zlib when compressed)
+    checkpoint = Column(LargeBinary, nullable=False)
+    metadata_type = Column(String, nullable=False)
+    meta_data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+class AgentCheckpointWrite(Base):
+    """Pending writes recorded against an agent checkpoint"""
+    __tablename__ = "agent_checkpoint_writes"
+    id = Column(Integer, primary_key=True, index=True)
+    thread_id = Column(String, nullable=False, index=True)
+    checkpoint_ns = Column(String, nullable=False, default="")
+    checkpoint_id = Column(String, nullable=False)
+    task_id = Column(String, nullable=False)
+    idx = Column(Integer, nullable=False)
+    channel = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    value = Column(LargeBinary)
+
 class AgentConfig(Base):
     """Agent configuration"""
     __tablename__ = "agent_config"
@@ -717,6 +770,7 @@ class EmailVerificationToken(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     email = Column(String, nullable=False)
     token = Column(String, unique=True, nullable=False)
+    purpose = Column(String, default="verify_email", nullable=False)  # verify_email or password_setup
     expires_at = Column(DateTime, nullable=False)
     verified_at = Column(DateTime)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -902,14 +956,18 @@ class IncomingDataEvent(Base):
     recipients = Column(JSON)
     attachments = Column(JSON)
     received_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    processed = Column(Boolean, default=False)
+    processed = Column(Boolean, default=False, index=True)
+    claim_token = Column(String, index=True)  # DRE worker batch that owns this event
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, default=0)  # DRE worker extraction attempts (claims)
+    last_error = Column(Text)  # Last extraction failure
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 class ExtractedData(Base):
     __tablename__ = "extracted_data"
     id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(Integer, ForeignKey("incoming_data_events.id"))
+    event_id = Column(Integer, ForeignKey("incoming_data_events.id"), index=True)
     category = Column(String)  # 'lead_update', 'loan_update', 'portfolio_update', etc.
     subcategory = Column(String)  # 'rate_lock', 'appraisal', 'title_clear', etc.
     fields = Column(JSON)  # {field_name: {value, confidence}}
@@ -931,6 +989,7 @@ class AITrainingEvent(Base):
     original_value = Column(String)
     corrected_value = Column(String)
     label = Column(String)  # 'correct', 'incorrect', 'overridden'
+    notes = Column(Text)  # Reviewer's reason (rejections)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -1104,6 +1163,7 @@ class ProcessRole(Base):
     responsibilities = Column(Text)  # AI-extracted responsibilities summary
     skills_required = Column(JSON)  # Array of required skills
     key_activities = Column(JSON)  # Array of key activities
+    source_document_hash = Column(String, index=True)  # SHA-256 of the document this came from
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -1119,6 +1179,7 @@ class ProcessMilestone(Base):
     description = Column(Text)
     sequence_order = Column(Integer, default=0)
     estimated_duration = Column(Integer)  # Total duration in hours
+    source_document_hash = Column(String, index=True)  # SHA-256 of the document this came from
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -1144,6 +1205,7 @@ class ProcessTask(Base):
     is_required = Column(Boolean, default=True)
     is_active = Column(Boolean, default=True)
     status = Column(String, default="pending")  # pending, in_progress, completed
+    source_document_hash = Column(String, index=True)  # SHA-256 of the document this came from
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationships
@@ -1152,6 +1214,68 @@ class ProcessTask(Base):
     role = relationship("ProcessRole", backref="assigned_tasks")
     assigned_user = relationship("User", foreign_keys=[assigned_user_id])
 
+class ParsedDocumentCache(Base):
+    """Parse results for onboarding documents, keyed by content hash and parser version"""
+    __tablename__ = "parsed_document_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True, nullable=False)  # sha256:parser_version
+    content_hash = Column(String, nullable=False)
+    parser_version = Column(String, nullable=False)
+    filename = Column(String)
+    result = Column(JSON, nullable=False)  # {"roles": [...], "milestones": [...], "tasks": [...]}
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_used_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+class LLMResponseCacheEntry(Base):
+    """Persistent tier of the LLM response cache (see integrations/llm_cache.py)"""
+    __tablename__ = "llm_response_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True, nullable=False)  # sha256 of provider/model/messages/params
+    call_site = Column(String, index=True)  # underwriter, email_classification, ...
+    provider = Column(String)  # openai, anthropic
+    model = Column(String)
+    response = Column(JSON, nullable=False)  # Serialized ChatCompletion / Message
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_used_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class CoachBriefing(Base):
+    """Precomputed daily_briefing coach reply (one row per user, replaced each day)"""
+    __tablename__ = "coach_briefings"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
+    briefing_date = Column(Date, nullable=False, index=True)
+    context = Column(JSON)  # Coach context the briefing was generated from
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class PipelineReview(Base):
+    """Change watermark of the last daily pipeline review queued for a user (see services/pipeline_review.py)"""
+    __tablename__ = "pipeline_reviews"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
+    reviewed_through = Column(DateTime, nullable=False)  # Newest lead/loan change the review covers
+    scheduled_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class JobWatermark(Base):
+    """How far an incremental background job has processed (e.g. the overdue task sweeper)"""
+    __tablename__ = "job_watermarks"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+    watermark = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class ConversationSummary(Base):
+    """Rolling summary of a user's older AI chat turns that no longer fit the prompt budget"""
+    __tablename__ = "conversation_summaries"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
+    summary = Column(Text, nullable=False)
+    summarized_through_id = Column(Integer, nullable=False)  # Last Conversation.id folded into the summary
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
 # ============================================================================
 # PYDANTIC SCHEMAS
 # ============================================================================
@@ -2029,13 +2153,17 @@ app.add_middleware(
 
 # Auth - Define BEFORE importing routes that use these functions
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# One shared bcrypt context; request handlers should use the async
+# password_hasher.hash/verify so bcrypt runs off the event loop
+from services.password_hashing import password_hasher
+pwd_context = password_hasher.context
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return password_hasher.verify_sync(plain, hashed)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash_sync(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -2241,99 +2369,10 @@ def calculate_lead_score(lead: Lead) -> int:
 # DATA RECONCILIATION ENGINE (DRE) - AI EXTRACTION
 # ============================================================================
 
-def classify_email_content(content: str, subject: str) -> Dict[str, Any]:
-    """Use AI to classify email content and determine category"""
-
-    if not openai_client:
-        return {"category": "unknown", "subcategory": "", "confidence": 0.0}
-
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an email classification expert for mortgage loan processing.
-
-Classify emails into categories:
-- lead_update: New lead information or lead status changes
-- loan_update: Active loan milestone updates
-- rate_lock: Rate lock confirmations or expirations
-- appraisal: Appraisal scheduling or results
-- title: Title work, clear to close
-- insurance: HOI binders, insurance updates
-- closing: Closing date/time, CD delivery
-- document: Document receipt confirmations
-- portfolio: Servicing, escrow, tax updates
-- unrelated: Not mortgage-related
-
-Return JSON: {"category": "...", "subcategory": "...", "confidence": 0.0-1.0}"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Subject: {subject}\n\nContent: {content[:1000]}"
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
-
-        result = json.loads(response.choices[0].message.content)
-        return result
-    except Exception as e:
-        logger.error(f"Email classification error: {e}")
-        return {"category": "error", "subcategory": "", "confidence": 0.0}
-
-def extract_loan_fields(content: str, category: str) -> Dict[str, Dict[str, Any]]:
-    """Extract structured loan fields from email content"""
-
-    if not openai_client:
-        return {}
-
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""Extract mortgage loan fields from this {category} email.
-
-Extract any present fields:
-- loan_number: string
-- borrower_name: string
-- property_address: string
-- loan_amount: float
-- rate: float (as decimal, e.g., 6.125)
-- rate_lock_date: ISO date
-- lock_expiration: ISO date
-- appraisal_date: ISO date
-- appraisal_value: float
-- closing_date: ISO datetime
-- milestone: string (e.g., "RateLocked", "AppraisalOrdered", "ClearToClose")
-- documents_received: list of strings
-- lender: string
-- realtor_name: string
-- title_company: string
-
-For each field found, return:
-{{"field_name": {{"value": actual_value, "confidence": 0.0-1.0}}}}
-
-Return JSON object. Only include fields you found. Use null for missing."""
-                },
-                {
-                    "role": "user",
-                    "content": content[:2000]
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.2
-        )
-
-        fields = json.loads(response.choices[0].message.content)
-        return fields
-    except Exception as e:
-        logger.error(f"Field extraction error: {e}")
-        return {}
+from services.email_extraction import triage_email
+from services.email_preclassifier import email_preclassifier
+from services.dre_worker import dre_worker
+from services.vector_store import vector_store
 
 def match_entity(fields: Dict[str, Any], db: Session, user_id: int) -> Dict[str, Any]:
     """Match extracted fields to existing CRM entities"""
@@ -2395,9 +2434,14 @@ def match_entity(fields: Dict[str, Any], db: Session, user_id: int) -> Dict[str,
     return match_results
 
 def apply_extracted_data(extracted_data: ExtractedData, db: Session) -> bool:
-    """Apply extracted data to CRM entities"""
+    """
+    Apply extracted data to CRM entities.
+    Returns True only if at least one field was written; rows with nothing
+    confident (or recognized) enough to apply are left for review.
+    """
 
     try:
+        applied = []
         if extracted_data.match_entity_type == "loan" and extracted_data.match_entity_id:
             loan = db.query(Loan).filter(Loan.id == extracted_data.match_entity_id).first()
             if not loan:
@@ -2408,21 +2452,28 @@ def apply_extracted_data(extracted_data: ExtractedData, db: Session) -> bool:
 
             if "rate" in fields and fields["rate"]["confidence"] > 0.85:
                 loan.rate = float(fields["rate"]["value"])
+                applied.append("rate")
 
             if "loan_amount" in fields and fields["loan_amount"]["confidence"] > 0.85:
                 loan.loan_amount = float(fields["loan_amount"]["value"])
+                applied.append("loan_amount")
 
             if "closing_date" in fields and fields["closing_date"]["confidence"] > 0.80:
                 loan.closing_date = datetime.fromisoformat(fields["closing_date"]["value"])
+                applied.append("closing_date")
 
             if "milestone" in fields and fields["milestone"]["confidence"] > 0.90:
                 # Update stage based on milestone
                 milestone = fields["milestone"]["value"]
                 if "ClearToClose" in milestone or "CTC" in milestone:
                     loan.stage = LoanStage.CTC
+                    applied.append("milestone")
                 elif "Processing" in milestone:
                     loan.stage = LoanStage.PROCESSING
+                    applied.append("milestone")
 
+            if not applied:
+                return False
             db.commit()
             return True
 
@@ -2435,10 +2486,14 @@ def apply_extracted_data(extracted_data: ExtractedData, db: Session) -> bool:
 
             if "credit_score" in fields and fields["credit_score"]["confidence"] > 0.85:
                 lead.credit_score = int(fields["credit_score"]["value"])
+                applied.append("credit_score")
 
             if "loan_amount" in fields and fields["loan_amount"]["confidence"] > 0.80:
                 lead.loan_amount = float(fields["loan_amount"]["value"])
+                applied.append("loan_amount")
 
+            if not applied:
+                return False
             db.commit()
             return True
 
@@ -2448,6 +2503,44 @@ def apply_extracted_data(extracted_data: ExtractedData, db: Session) -> bool:
         db.rollback()
         return False
 
+def build_extracted_data(event: IncomingDataEvent, classification: Dict[str, Any], db: Session) -> Optional[ExtractedData]:
+    """
+    Turn a triage_email() result into an ExtractedData row (not added or committed).
+    Returns None when the email is unrelated, low confidence or has no fields.
+    """
+    if classification["category"] == "unrelated" or classification["confidence"] < 0.5:
+        return None
+
+    fields = classification["fields"]
+    if not fields:
+        return None
+
+    # Calculate overall AI confidence
+    confidences = [field.get("confidence", 0.0) for field in fields.values()]
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+
+    # Match entity
+    entity_match = match_entity(fields, db, event.user_id)
+
+    # Determine status based on confidence
+    status = "pending_review"
+    if avg_confidence > 0.85 and entity_match["confidence"] > 0.90:
+        status = "auto_approved"
+    elif avg_confidence < 0.60 or entity_match["confidence"] < 0.50:
+        status = "needs_review"
+
+    return ExtractedData(
+        event_id=event.id,
+        category=classification["category"],
+        subcategory=classification.get("subcategory"),
+        fields=fields,
+        match_entity_type=entity_match["entity_type"],
+        match_entity_id=entity_match["entity_id"],
+        match_confidence=entity_match["confidence"],
+        ai_confidence=avg_confidence,
+        status=status
+    )
+
 # ============================================================================
 # MICROSOFT OAUTH & EMAIL SYNC FUNCTIONS
 # ============================================================================
@@ -2568,85 +2661,35 @@ async def fetch_microsoft_emails(oauth_record: MicrosoftOAuthToken, db: Session,
         logger.error(f"Error fetching Microsoft emails: {e}")
         return {"error": str(e)}
 
-async def process_microsoft_email_to_dre(email_data: dict, user_id: int, db: Session):
-    """Process a Microsoft Graph email and ingest into DRE"""
-    try:
-        # Extract email data
-        subject = email_data.get("subject", "")
-        sender = email_data.get("from", {}).get("emailAddress", {}).get("address", "")
-        recipients = [r.get("emailAddress", {}).get("address", "") for r in email_data.get("toRecipients", [])]
-        received_at = email_data.get("receivedDateTime", "")
-
-        # Get body content
-        body = email_data.get("body", {})
-        raw_html = body.get("content", "") if body.get("contentType") == "html" else None
-        raw_text = body.get("content", "") if body.get("contentType") == "text" else None
-
-        # Create incoming data event
-        db_event = IncomingDataEvent(
-            source="microsoft365",
-            raw_text=raw_text,
-            raw_html=raw_html,
-            subject=subject,
-            sender=sender,
-            recipients=recipients,
-            received_at=datetime.fromisoformat(received_at.replace('Z', '+00:00')) if received_at else datetime.now(timezone.utc),
-            user_id=user_id,
-            processed=False
-        )
-        db.add(db_event)
-        db.commit()
-        db.refresh(db_event)
-
-        logger.info(f"Ingested Microsoft email {db_event.id} from {sender}")
-
-        # Trigger extraction
-        content = raw_text or raw_html or ""
-        classification = classify_email_content(content, subject)
-
-        if classification["category"] != "unrelated" and classification["confidence"] >= 0.5:
-            fields = extract_loan_fields(content, classification["category"])
-
-            if fields:
-                confidences = [field.get("confidence", 0.0) for field in fields.values()]
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-
-                entity_match = match_entity(fields, db, user_id)
-
-                status = "pending_review"
-                if avg_confidence > 0.85 and entity_match["confidence"] > 0.90:
-                    status = "auto_approved"
-                elif avg_confidence < 0.60 or entity_match["confidence"] < 0.50:
-                    status = "needs_review"
-
-                extracted = ExtractedData(
-                    event_id=db_event.id,
-                    category=classification["category"],
-                    subcategory=classification.get("subcategory"),
-                    fields=fields,
-                    match_entity_type=entity_match["entity_type"],
-                    match_entity_id=entity_match["entity_id"],
-                    match_confidence=entity_match["confidence"],
-                    ai_confidence=avg_confidence,
-                    status=status
-                )
-                db.add(extracted)
-                db_event.processed = True
-                db.commit()
-
-                # Auto-apply if high confidence
-                if status == "auto_approved":
-                    if apply_extracted_data(extracted, db):
-                        extracted.status = "applied"
-                        db.commit()
-                        logger.info(f"Auto-applied extraction from email {db_event.id}")
-
-        return {"status": "success", "event_id": db_event.id}
-
-    except Exception as e:
-        logger.error(f"Error processing Microsoft email: {e}")
-        db.rollback()
-        return {"status": "error", "error": str(e)}
+def ingest_microsoft_email(email_data: dict, user_id: int, db: Session) -> IncomingDataEvent:
+    """
+    Stage a Microsoft Graph email as an IncomingDataEvent (caller commits).
+    Classification and extraction happen later in the DRE worker.
+    """
+    # Extract email data
+    subject = email_data.get("subject", "")
+    sender = email_data.get("from", {}).get("emailAddress", {}).get("address", "")
+    recipients = [r.get("emailAddress", {}).get("address", "") for r in email_data.get("toRecipients", [])]
+    received_at = email_data.get("receivedDateTime", "")
+
+    # Get body content
+    body = email_data.get("body", {})
+    raw_html = body.get("content", "") if body.get("contentType") == "html" else None
+    raw_text = body.get("content", "") if body.get("contentType") == "text" else None
+
+    db_event = IncomingDataEvent(
+        source="microsoft365",
+        raw_text=raw_text,
+        raw_html=raw_html,
+        subject=subject,
+        sender=sender,
+        recipients=recipients,
+        received_at=datetime.fromisoformat(received_at.replace('Z', '+00:00')) if received_at else datetime.now(timezone.utc),
+        user_id=user_id,
+        processed=False
+    )
+    db.add(db_event)
+    return db_event
 
 # ============================================================================
 # DATA RECONCILIATION ENGINE - API ENDPOINTS
@@ -2677,6 +2720,7 @@ async def ingest_email_data(
         db.refresh(db_event)
 
         logger.info(f"Ingested email data event {db_event.id} for user {current_user.id}")
+        dre_worker.notify()
 
         return {
             "status": "success",
@@ -2688,6 +2732,24 @@ async def ingest_email_data(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/reconciliation/preclassifier/stats")
+async def get_preclassifier_stats(current_user: User = Depends(get_current_user)):
+    """How much DRE traffic the local pre-classifier handles without an LLM call"""
+    return email_preclassifier.stats()
+
+@app.get("/api/v1/reconciliation/worker/stats")
+async def get_dre_worker_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """DRE worker throughput and this user's extraction backlog"""
+    backlog = db.query(func.count(IncomingDataEvent.id)).filter(
+        IncomingDataEvent.user_id == current_user.id,
+        IncomingDataEvent.processed.is_(False)
+    ).scalar()
+
+    return {**dre_worker.stats, "backlog": backlog}
+
 @app.post("/api/v1/reconciliation/extract/{event_id}")
 async def extract_email_data(
     event_id: int,
@@ -2705,59 +2767,40 @@ async def extract_email_data(
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
 
-        # Classify the email
-        content = event.raw_text or event.raw_html or ""
-        subject = event.subject or ""
-
-        classification = classify_email_content(content, subject)
-
-        if classification["category"] == "unrelated" or classification["confidence"] < 0.5:
-            event.processed = True
-            db.commit()
+        # Already handled (by the DRE worker or an earlier call) - don't extract twice
+        extracted = db.query(ExtractedData).filter(ExtractedData.event_id == event.id).first()
+        if extracted:
             return {
-                "status": "skipped",
-                "reason": "Email classified as unrelated or low confidence",
-                "classification": classification
+                "status": "already_processed",
+                "extracted_data_id": extracted.id,
+                "category": extracted.category,
+                "extraction_status": extracted.status
             }
 
-        # Extract fields
-        fields = extract_loan_fields(content, classification["category"])
+        content = event.raw_text or event.raw_html or ""
+        subject = event.subject or ""
+
+        # Classify the email and extract loan fields (local rules first, then one LLM call)
+        with llm_scheduler.context(tenant=current_user.id):
+            classification = await triage_email(content, subject, event.sender or "")
+        extracted = build_extracted_data(event, classification, db)
+        classification.pop("fields")
 
-        if not fields:
+        if extracted is None:
             event.processed = True
             db.commit()
+            if classification["category"] == "unrelated" or classification["confidence"] < 0.5:
+                return {
+                    "status": "skipped",
+                    "reason": "Email classified as unrelated or low confidence",
+                    "classification": classification
+                }
             return {
                 "status": "no_data",
                 "reason": "No extractable fields found",
                 "classification": classification
             }
 
-        # Calculate overall AI confidence
-        confidences = [field.get("confidence", 0.0) for field in fields.values()]
-        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-
-        # Match entity
-        entity_match = match_entity(fields, db, current_user.id)
-
-        # Determine status based on confidence
-        status = "pending_review"
-        if avg_confidence > 0.85 and entity_match["confidence"] > 0.90:
-            status = "auto_approved"
-        elif avg_confidence < 0.60 or entity_match["confidence"] < 0.50:
-            status = "needs_review"
-
-        # Create extracted data record
-        extracted = ExtractedData(
-            event_id=event.id,
-            category=classification["category"],
-            subcategory=classification.get("subcategory"),
-            fields=fields,
-            match_entity_type=entity_match["entity_type"],
-            match_entity_id=entity_match["entity_id"],
-            match_confidence=entity_match["confidence"],
-            ai_confidence=avg_confidence,
-            status=status
-        )
         db.add(extracted)
 
         # Mark event as processed
@@ -2767,11 +2810,11 @@ async def extract_email_data(
         db.refresh(extracted)
 
         # Auto-apply if high confidence
-        if status == "auto_approved":
+        if extracted.status == "auto_approved":
             applied = apply_extracted_data(extracted, db)
-            if applied:
-                extracted.status = "applied"
-                db.commit()
+            # Nothing applicable: hand it to a reviewer instead
+            extracted.status = "applied" if applied else "pending_review"
+            db.commit()
 
         logger.info(f"Extracted data from event {event_id}, status: {extracted.status}")
 
@@ -2788,6 +2831,8 @@ async def extract_email_data(
                 "id": extracted.match_entity_id
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Extraction error: {e}")
         db.rollback()
@@ -3280,28 +3325,34 @@ async def sync_microsoft_emails_now(
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
 
-        # Process each email through DRE
+        # Stage emails for the DRE worker; extraction runs in the background
         emails = result.get("emails", [])
-        processed_count = 0
+        queued_count = 0
 
         for email_data in emails:
-            process_result = await process_microsoft_email_to_dre(email_data, current_user.id, db)
-            if process_result.get("status") == "success":
-                processed_count += 1
+            try:
+                ingest_microsoft_email(email_data, current_user.id, db)
+                queued_count += 1
+            except Exception as e:
+                logger.error(f"Error ingesting Microsoft email: {e}")
+
+        db.commit()
+        dre_worker.notify()
 
-        logger.info(f"Synced {processed_count}/{len(emails)} emails for user {current_user.id}")
+        logger.info(f"Queued {queued_count}/{len(emails)} emails for DRE extraction for user {current_user.id}")
 
         return {
             "status": "success",
             "fetched_count": len(emails),
-            "processed_count": processed_count,
-            "message": f"Synced {processed_count} emails successfully"
+            "queued_count": queued_count,
+            "message": f"Synced {queued_count} emails; extraction is running in the background"
         }
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Microsoft sync error: {e}")
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.patch("/api/v1/microsoft/settings")
@@ -3759,7 +3810,7 @@ async def create_zapier_api_key(db: Session = Depends(get_db)):
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -4728,7 +4779,7 @@ async def create_lead(lead: LeadCreate, db: Session = Depends(get_db), current_u
                 "property_value": float(db_lead.property_value) if db_lead.property_value else None,
                 "ai_score": db_lead.ai_score
             },
-            db_session=db
+            owner_id=current_user.id
         )
         logger.info(f"Triggered AI Receptionist for lead {db_lead.id}")
     except Exception as e:
@@ -4777,6 +4828,7 @@ async def update_lead(lead_id: int, lead_update: LeadUpdate, db: Session = Depen
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
 
+    old_stage = lead.stage
     for key, value in lead_update.dict(exclude_unset=True).items():
         setattr(lead, key, value)
 
@@ -4787,6 +4839,20 @@ async def update_lead(lead_id: int, lead_update: LeadUpdate, db: Session = Depen
     db.commit()
     db.refresh(lead)
     logger.info(f"Lead updated: {lead.name}")
+
+    if lead.stage != old_stage:
+        # Bursts for the same lead (bulk edits, imports) are coalesced into one event
+        try:
+            from agents.events import emit_lead_stage_changed
+            await emit_lead_stage_changed(
+                lead_id=lead.id,
+                old_stage=old_stage.value if old_stage else None,
+                new_stage=lead.stage.value if lead.stage else None,
+                owner_id=lead.owner_id
+            )
+        except Exception as e:
+            logger.error(f"Failed to emit lead stage change: {e}")
+
     return lead
 
 @app.delete("/api/v1/leads/{lead_id}", status_code=204)
@@ -5393,6 +5459,14 @@ async def delete_task(task_id: int, db: Session = Depends(get_db), current_user:
 # AI TASK LEARNING & AUTOMATION
 # ============================================================================
 
+TASK_EXAMPLE_AGENT_TYPE = "task_drafting"
+TASK_EXAMPLE_MEMORY_TYPE = "approved_example"
+TASK_EXAMPLE_COUNT = 3
+
+def task_example_text(task: AITask) -> str:
+    """Text a task is matched on when looking up similar approved drafts"""
+    return f"{task.task_type or 'task'}: {task.title}\n{task.description or ''}".strip()
+
 @app.post("/api/v1/tasks/{task_id}/generate-ai-draft")
 async def generate_ai_task_draft(
     task_id: int,
@@ -5401,7 +5475,7 @@ async def generate_ai_task_draft(
 ):
     """Generate AI-drafted message/action for a task"""
 
-    if not openai_client:
+    if not llm_gateway.openai_enabled:
         raise HTTPException(status_code=503, detail="OpenAI API not configured")
 
     task = db.query(AITask).filter(AITask.id == task_id).first()
@@ -5422,19 +5496,32 @@ async def generate_ai_task_draft(
             if loan:
                 context += f"\nLoan: {loan.loan_amount}, Stage: {loan.stage}"
 
-        # Get previous successful completions for this task type
-        previous_approvals = []
-        if task.task_type:
+        # Few-shot examples: approved drafts for the most similar past tasks
+        example_messages = []
+        try:
+            similar = await vector_store.search(
+                task_example_text(task), TASK_EXAMPLE_AGENT_TYPE, TASK_EXAMPLE_MEMORY_TYPE, k=TASK_EXAMPLE_COUNT * 2
+            )
+            # Prefer examples of the same task type, then by similarity
+            similar.sort(key=lambda m: m["meta_data"].get("task_type") != task.task_type)
+            example_messages = [m["meta_data"]["message"] for m in similar[:TASK_EXAMPLE_COUNT]]
+        except Exception as e:
+            logger.warning(f"Similar example lookup failed for task {task_id}: {e}")
+
+        if not example_messages and task.task_type:
+            # Nothing embedded yet - fall back to the most recent approvals for this task type
             previous_approvals = db.query(TaskApproval).filter(
                 TaskApproval.task_type == task.task_type,
                 TaskApproval.approved == True
-            ).order_by(TaskApproval.created_at.desc()).limit(3).all()
+            ).order_by(TaskApproval.created_at.desc()).limit(TASK_EXAMPLE_COUNT).all()
+            example_messages = [approval.ai_message for approval in previous_approvals if approval.ai_message]
 
-        examples = "\n".join([f"Example: {approval.ai_message}" for approval in previous_approvals]) if previous_approvals else "No previous examples available."
+        examples = "\n".join([f"Example: {message}" for message in example_messages]) if example_messages else "No previous examples available."
 
         # Generate AI draft
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat(
             model="gpt-4o-mini",
+            tenant=current_user.id,
             messages=[
                 {
                     "role": "system",
@@ -5532,6 +5619,18 @@ async def approve_ai_action(
             task.ai_approved = True
             task.ai_edited = False
 
+            # Keep the approved draft as a few-shot example for similar tasks
+            if task.ai_drafted_message:
+                vector_store.add(
+                    db,
+                    agent_type=TASK_EXAMPLE_AGENT_TYPE,
+                    memory_type=TASK_EXAMPLE_MEMORY_TYPE,
+                    content=task_example_text(task),
+                    meta_data={"task_type": task.task_type, "message": task.ai_drafted_message},
+                    entity_type="task",
+                    entity_id=task.id
+                )
+
             # Update AI status based on consecutive approvals
             if ai_learning.consecutive_approvals >= 5:
                 ai_learning.ai_status = "approved"  # Fully autonomous
@@ -5556,6 +5655,8 @@ async def approve_ai_action(
 
         db.commit()
         db.refresh(ai_learning)
+        if request.approved:
+            vector_store.notify()
 
         return {
             "task_id": task_id,
@@ -5916,11 +6017,28 @@ async def start_agent_workflow(
         entity_type: Optional entity type (lead, loan, etc.)
         entity_id: Optional entity ID
         context: Optional additional context
+
+    When agents run in a separate worker process (AGENT_RUNTIME=worker) the
+    workflow is queued and the response carries the event id instead.
     """
     try:
+        from agents.setup import agents_run_in_process
         from agents.manager import get_agent_manager
         from agents.receptionist_agent import register_agents
 
+        if not agents_run_in_process():
+            from agents.events import emit_manual_trigger
+
+            event = await emit_manual_trigger(
+                agent_type=agent_type,
+                goal=goal,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                context=context,
+                created_by=current_user.id
+            )
+            return {"success": True, "queued": True, "event_id": event.id}
+
         # Get agent manager
         agent_manager = get_agent_manager(db)
 
@@ -6010,6 +6128,36 @@ async def get_agent_workflow(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/agent/workflows/{workflow_id}/resume")
+async def resume_agent_workflow(
+    workflow_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Resume an interrupted workflow from its last checkpoint (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can resume workflows")
+
+    try:
+        from agents.manager import get_agent_manager
+        from agents.receptionist_agent import register_agents
+
+        agent_manager = get_agent_manager(db)
+        register_agents(agent_manager)
+
+        result = await agent_manager.resume_workflow(workflow_id, db=db)
+        if result.get("error") == "Workflow not found":
+            raise HTTPException(status_code=404, detail="Workflow not found")
+
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to resume workflow: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/v1/agent/review-queue")
 async def get_review_queue(
     status: Optional[str] = "pending",
@@ -6180,6 +6328,60 @@ async def get_agent_stats(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/agent/events/stats")
+async def get_agent_event_stats(current_user: User = Depends(get_current_user)):
+    """Event bus throughput, queue depth, in-flight workflows and handler latency (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can view event bus metrics")
+
+    from agents.events import get_event_bus
+    return await get_event_bus().get_stats()
+
+
+@app.get("/api/v1/agent/events/dead")
+async def list_dead_agent_events(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Dead-lettered agent events, newest first (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can view dead-lettered events")
+
+    events = db.query(AgentEvent).filter(AgentEvent.status == "dead").order_by(
+        AgentEvent.completed_at.desc()
+    ).limit(limit).all()
+
+    return {
+        "events": [
+            {
+                "id": e.id,
+                "event_type": e.event_type,
+                "entity_type": e.entity_type,
+                "entity_id": e.entity_id,
+                "attempts": e.attempts,
+                "last_error": e.last_error,
+                "created_at": e.created_at.isoformat() if e.created_at else None,
+                "completed_at": e.completed_at.isoformat() if e.completed_at else None
+            }
+            for e in events
+        ]
+    }
+
+
+@app.post("/api/v1/agent/events/{event_id}/requeue")
+async def requeue_agent_event(event_id: int, current_user: User = Depends(get_current_user)):
+    """Retry a dead-lettered agent event (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can requeue events")
+
+    from agents.events import get_event_bus
+    if not await asyncio.to_thread(get_event_bus().requeue, event_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered event not found")
+
+    return {"requeued": event_id}
+
+
 # ============================================================================
 # REFERRAL PARTNERS CRUD
 # ============================================================================
@@ -7052,7 +7254,7 @@ async def get_portfolio_stats(
 # AI ASSISTANT & CONVERSATIONS
 # ============================================================================
 
-async def execute_ai_function(
+def execute_ai_function(
     function_name: str,
     function_args: dict,
     db: Session,
@@ -7263,198 +7465,215 @@ async def execute_ai_function(
         logger.error(f"Error executing AI function {function_name}: {e}")
         return {"success": False, "error": str(e)}
 
-@app.post("/api/v1/ai/chat", response_model=ConversationResponse)
-async def ai_chat(
-    conversation: ConversationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """AI Assistant chat endpoint with agentic function calling capabilities"""
-
-    if not openai_client:
-        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
-
-    # Build context from lead or loan if provided
-    context_info = ""
-    context_lead = None
-    context_loan = None
-
-    if conversation.lead_id:
-        context_lead = db.query(Lead).filter(Lead.id == conversation.lead_id).first()
-        if context_lead:
-            context_info = f"Lead: {context_lead.name}, Stage: {context_lead.stage.value}, Score: {context_lead.ai_score}, Credit: {context_lead.credit_score}"
+# (read_only, conflict keys) of each AI function; see agents/tools.py for how calls are grouped
+AI_FUNCTION_EFFECTS = {
+    "create_task": (False, ["lead_id", "loan_id"]),
+    "update_lead_stage": (False, ["lead_id"]),
+    "add_activity": (False, ["lead_id", "loan_id"]),
+    "get_lead_details": (True, ["lead_id"]),
+    "get_high_priority_leads": (True, []),
+    "search_leads": (True, []),
+}
+
+async def execute_ai_functions(
+    calls: List[Tuple[str, dict]],
+    db: Session,
+    current_user: User,
+    context_lead: Optional[Lead] = None,
+    context_loan: Optional[Loan] = None
+) -> List[dict]:
+    """
+    Execute the (name, args) function calls of one AI turn. Independent calls
+    run concurrently in worker threads, each with its own session; results
+    keep the call order.
+    """
+    from agents.tools import resource_keys, plan_waves, run_waves
 
-    if conversation.loan_id:
-        context_loan = db.query(Loan).filter(Loan.id == conversation.loan_id).first()
-        if context_loan:
-            context_info = f"Loan: {context_loan.loan_number}, Borrower: {context_loan.borrower_name}, Stage: {context_loan.stage.value}, Amount: ${context_loan.amount:,.0f}"
+    # Calls without an explicit lead/loan act on the one the chat is about
+    defaults = {
+        "lead_id": context_lead.id if context_lead else None,
+        "loan_id": context_loan.id if context_loan else None
+    }
+    effects = []
+    for function_name, function_args in calls:
+        read_only, conflict_keys = AI_FUNCTION_EFFECTS.get(function_name, (True, []))
+        arguments = {**defaults, **{k: v for k, v in function_args.items() if v is not None}}
+        effects.append((read_only, resource_keys(conflict_keys, arguments)))
+
+    async def run_one(index: int, session: Session) -> dict:
+        function_name, function_args = calls[index]
+        return await asyncio.to_thread(
+            execute_ai_function, function_name, function_args, session, current_user, context_lead, context_loan
+        )
 
-    # Define available functions for AI to call
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "create_task",
-                "description": "Create a new task for a lead or loan. Use this when the user asks you to create a task, reminder, or follow-up.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "title": {
-                            "type": "string",
-                            "description": "The task title (e.g., 'Call John about pre-approval')"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Detailed description of the task"
-                        },
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID this task is for (if applicable)"
-                        },
-                        "loan_id": {
-                            "type": "integer",
-                            "description": "The loan ID this task is for (if applicable)"
-                        },
-                        "due_date": {
-                            "type": "string",
-                            "description": "Due date in ISO format (e.g., '2025-11-10T10:00:00')"
-                        },
-                        "priority": {
-                            "type": "string",
-                            "enum": ["high", "medium", "low"],
-                            "description": "Task priority level"
-                        }
+    return await run_waves(plan_waves(effects), run_one, db)
+
+# Headers for Server-Sent Event responses (disable proxy buffering so tokens flush)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# Functions the AI assistant can call
+AI_CHAT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "create_task",
+            "description": "Create a new task for a lead or loan. Use this when the user asks you to create a task, reminder, or follow-up.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "The task title (e.g., 'Call John about pre-approval')"
                     },
-                    "required": ["title"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "update_lead_stage",
-                "description": "Update a lead's stage in the pipeline. Use this when progressing a lead or changing their status.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID to update"
-                        },
-                        "new_stage": {
-                            "type": "string",
-                            "enum": ["New", "Attempted Contact", "Prospect", "Pre-Qualified", "Pre-Approved", "Application", "Completed", "Withdrawn", "Does Not Qualify"],
-                            "description": "The new stage for the lead"
-                        },
-                        "reason": {
-                            "type": "string",
-                            "description": "Brief reason for the stage change"
-                        }
+                    "description": {
+                        "type": "string",
+                        "description": "Detailed description of the task"
                     },
-                    "required": ["lead_id", "new_stage"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "add_activity",
-                "description": "Add a note, activity, or log entry to a lead or loan. Use this to record conversations, notes, or important events.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID (if applicable)"
-                        },
-                        "loan_id": {
-                            "type": "integer",
-                            "description": "The loan ID (if applicable)"
-                        },
-                        "activity_type": {
-                            "type": "string",
-                            "enum": ["note", "call", "email", "meeting", "sms", "other"],
-                            "description": "Type of activity"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "The activity description or note content"
-                        }
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID this task is for (if applicable)"
                     },
-                    "required": ["description", "activity_type"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_lead_details",
-                "description": "Retrieve detailed information about a specific lead. Use this when you need more information about a lead.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {
-                            "type": "integer",
-                            "description": "The lead ID to retrieve"
-                        }
+                    "loan_id": {
+                        "type": "integer",
+                        "description": "The loan ID this task is for (if applicable)"
                     },
-                    "required": ["lead_id"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_high_priority_leads",
-                "description": "Get a list of high-priority leads that need attention. Use this when asked about priorities or what to work on.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "limit": {
-                            "type": "integer",
-                            "description": "Maximum number of leads to return (default 10)",
-                            "default": 10
-                        }
+                    "due_date": {
+                        "type": "string",
+                        "description": "Due date in ISO format (e.g., '2025-11-10T10:00:00')"
+                    },
+                    "priority": {
+                        "type": "string",
+                        "enum": ["high", "medium", "low"],
+                        "description": "Task priority level"
                     }
-                }
+                },
+                "required": ["title"]
             }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "search_leads",
-                "description": "Search for leads by name, email, or other criteria.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Search query (name, email, etc.)"
-                        },
-                        "stage": {
-                            "type": "string",
-                            "description": "Filter by stage"
-                        }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_lead_stage",
+            "description": "Update a lead's stage in the pipeline. Use this when progressing a lead or changing their status.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID to update"
+                    },
+                    "new_stage": {
+                        "type": "string",
+                        "enum": ["New", "Attempted Contact", "Prospect", "Pre-Qualified", "Pre-Approved", "Application", "Completed", "Withdrawn", "Does Not Qualify"],
+                        "description": "The new stage for the lead"
+                    },
+                    "reason": {
+                        "type": "string",
+                        "description": "Brief reason for the stage change"
+                    }
+                },
+                "required": ["lead_id", "new_stage"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "add_activity",
+            "description": "Add a note, activity, or log entry to a lead or loan. Use this to record conversations, notes, or important events.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID (if applicable)"
                     },
-                    "required": ["query"]
+                    "loan_id": {
+                        "type": "integer",
+                        "description": "The loan ID (if applicable)"
+                    },
+                    "activity_type": {
+                        "type": "string",
+                        "enum": ["note", "call", "email", "meeting", "sms", "other"],
+                        "description": "Type of activity"
+                    },
+                    "description": {
+                        "type": "string",
+                        "description": "The activity description or note content"
+                    }
+                },
+                "required": ["description", "activity_type"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_lead_details",
+            "description": "Retrieve detailed information about a specific lead. Use this when you need more information about a lead.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lead_id": {
+                        "type": "integer",
+                        "description": "The lead ID to retrieve"
+                    }
+                },
+                "required": ["lead_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_high_priority_leads",
+            "description": "Get a list of high-priority leads that need attention. Use this when asked about priorities or what to work on.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of leads to return (default 10)",
+                        "default": 10
+                    }
                 }
             }
         }
-    ]
-
-    # Get conversation history for context
-    history = db.query(Conversation).filter(
-        Conversation.user_id == current_user.id
-    ).order_by(Conversation.created_at.desc()).limit(5).all()
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_leads",
+            "description": "Search for leads by name, email, or other criteria.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Search query (name, email, etc.)"
+                    },
+                    "stage": {
+                        "type": "string",
+                        "description": "Filter by stage"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
 
-    # Build messages for OpenAI
-    messages = [
-        {
-            "role": "system",
-            "content": f"""You are an agentic AI assistant for a mortgage CRM system. You can autonomously execute actions to help loan officers.
+AI_CHAT_MODEL = "gpt-4o-mini"
+AI_CHAT_MAX_COMPLETION_TOKENS = 1000
+AI_CHAT_HISTORY_TURNS = 30
 
-Current user: {current_user.full_name or current_user.email}
-{f'Context: {context_info}' if context_info else ''}
+# Kept free of per-request details so the prefix is identical across calls
+AI_CHAT_SYSTEM_PROMPT = """You are an agentic AI assistant for a mortgage CRM system. You can autonomously execute actions to help loan officers.
 
 You have the ability to:
 - Create tasks and reminders
@@ -7467,27 +7686,168 @@ You have the ability to:
 When a user asks you to do something, use the available functions to actually perform the action. Don't just suggest - DO IT.
 
 Be proactive, professional, and action-oriented. Always confirm what you've done."""
-        }
-    ]
 
-    # Add recent history
-    for msg in reversed(history):
-        messages.append({"role": "user", "content": msg.message})
-        if msg.response:
-            messages.append({"role": "assistant", "content": msg.response})
+AI_CHAT_SUMMARY_PROMPT = """Update the running summary of a conversation between a loan officer and their CRM assistant.
+Keep names, loan numbers, dates, commitments and open requests. Drop pleasantries. Reply with the summary only, at most 200 words."""
+
+def ai_chat_turn(row: Conversation) -> List[Dict[str, str]]:
+    turn = [{"role": "user", "content": row.message}]
+    if row.response:
+        turn.append({"role": "assistant", "content": row.response})
+    return turn
+
+async def summarize_ai_chat_turns(previous_summary: Optional[str], rows: List[Conversation], user_id: int) -> str:
+    """Fold older chat turns into the running summary"""
+    transcript = "\n".join(
+        f"{message['role'].title()}: {message['content']}"
+        for row in rows for message in ai_chat_turn(row)
+    )
+    response = await llm_gateway.chat(
+        model=AI_CHAT_MODEL,
+        tenant=user_id,
+        messages=[
+            {"role": "system", "content": AI_CHAT_SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ],
+        temperature=0,
+        max_tokens=400
+    )
+    return response.choices[0].message.content.strip()
+
+async def build_ai_chat_messages(conversation: ConversationCreate, db: Session, current_user: User):
+    """
+    Build the OpenAI message list for an AI chat turn within the ai_chat
+    prompt budget. Turns that no longer fit are folded into the user's
+    ConversationSummary, so each old turn is summarized once.
+    Returns (messages, context_lead, context_loan).
+    """
+    # Build context from lead or loan if provided
+    context_info = ""
+    context_lead = None
+    context_loan = None
+
+    if conversation.lead_id:
+        context_lead = db.query(Lead).filter(Lead.id == conversation.lead_id).first()
+        if context_lead:
+            context_info = f"Lead: {context_lead.name}, Stage: {context_lead.stage.value}, Score: {context_lead.ai_score}, Credit: {context_lead.credit_score}"
 
-    # Add current message
-    messages.append({"role": "user", "content": conversation.message})
+    if conversation.loan_id:
+        context_loan = db.query(Loan).filter(Loan.id == conversation.loan_id).first()
+        if context_loan:
+            context_info = f"Loan: {context_loan.loan_number}, Borrower: {context_loan.borrower_name}, Stage: {context_loan.stage.value}, Amount: ${context_loan.amount:,.0f}"
+
+    request_context = f"Current user: {current_user.full_name or current_user.email}"
+    if context_info:
+        request_context += f"\nContext: {context_info}"
+
+    # Unsummarized history; each "user" row holds one message and its reply
+    summary = db.query(ConversationSummary).filter(ConversationSummary.user_id == current_user.id).first()
+    history = db.query(Conversation).filter(
+        Conversation.user_id == current_user.id,
+        Conversation.role == "user",
+        Conversation.id > (summary.summarized_through_id if summary else 0)
+    ).order_by(Conversation.id.desc()).limit(AI_CHAT_HISTORY_TURNS).all()
+    history.reverse()
+
+    def assemble():
+        return build_messages(
+            system=AI_CHAT_SYSTEM_PROMPT,
+            user=conversation.message,
+            model=AI_CHAT_MODEL,
+            budget=prompt_budget("ai_chat"),
+            turns=[ai_chat_turn(row) for row in history],
+            context=request_context,
+            summary=summary.summary if summary else None,
+            tools=AI_CHAT_TOOLS,
+            completion_tokens=AI_CHAT_MAX_COMPLETION_TOKENS
+        )
+
+    messages, dropped = assemble()
+    if dropped:
+        # Fold at least half the window so the summary isn't rewritten every turn
+        folded = history[:max(dropped, len(history) // 2)]
+        try:
+            text = await summarize_ai_chat_turns(summary.summary if summary else None, folded, current_user.id)
+            if summary is None:
+                summary = ConversationSummary(user_id=current_user.id, summary=text, summarized_through_id=folded[-1].id)
+                db.add(summary)
+            else:
+                summary.summary = text
+                summary.summarized_through_id = folded[-1].id
+            summary.updated_at = datetime.now(timezone.utc)
+            db.commit()
+            history = history[len(folded):]
+            messages, dropped = assemble()
+        except Exception as e:
+            # Keep the trimmed prompt; the turns are folded on a later request
+            db.rollback()
+            logger.warning(f"AI chat summary update failed for user {current_user.id}: {e}")
+
+    return messages, context_lead, context_loan
+
+def save_ai_chat(
+    conversation: ConversationCreate,
+    ai_response: str,
+    actions_taken: List[Dict[str, Any]],
+    db: Session,
+    current_user: User
+) -> Conversation:
+    """Persist the user turn and the assistant reply of an AI chat"""
+    # Save conversation with actions metadata
+    metadata = conversation.context or {}
+    if actions_taken:
+        metadata["actions_taken"] = actions_taken
+
+    db_conversation = Conversation(
+        user_id=current_user.id,
+        lead_id=conversation.lead_id,
+        loan_id=conversation.loan_id,
+        message=conversation.message,
+        response=ai_response,
+        role="user",
+        metadata=metadata
+    )
+    db.add(db_conversation)
+
+    # Save assistant response
+    db_assistant = Conversation(
+        user_id=current_user.id,
+        lead_id=conversation.lead_id,
+        loan_id=conversation.loan_id,
+        message=ai_response,
+        role="assistant",
+        metadata={"actions": actions_taken} if actions_taken else None
+    )
+    db.add(db_assistant)
+
+    db.commit()
+    db.refresh(db_conversation)
+
+    return db_conversation
+
+@app.post("/api/v1/ai/chat", response_model=ConversationResponse)
+async def ai_chat(
+    conversation: ConversationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """AI Assistant chat endpoint with agentic function calling capabilities"""
+
+    if not llm_gateway.openai_enabled:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+
+    messages, context_lead, context_loan = await build_ai_chat_messages(conversation, db, current_user)
 
     try:
         # Call OpenAI with function calling
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await llm_gateway.chat(
+            model=AI_CHAT_MODEL,
+            tenant=current_user.id,
             messages=messages,
-            tools=tools,
+            tools=AI_CHAT_TOOLS,
             tool_choice="auto",
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=AI_CHAT_MAX_COMPLETION_TOKENS
         )
 
         response_message = response.choices[0].message
@@ -7498,22 +7858,14 @@ Be proactive, professional, and action-oriented. Always confirm what you've done
         if tool_calls:
             messages.append(response_message)
 
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-
+            calls = [(tool_call.function.name, json.loads(tool_call.function.arguments)) for tool_call in tool_calls]
+            for function_name, function_args in calls:
                 logger.info(f"AI calling function: {function_name} with args: {function_args}")
 
-                # Execute the function
-                function_response = await execute_ai_function(
-                    function_name,
-                    function_args,
-                    db,
-                    current_user,
-                    context_lead,
-                    context_loan
-                )
+            # Execute the functions
+            function_responses = await execute_ai_functions(calls, db, current_user, context_lead, context_loan)
 
+            for tool_call, (function_name, function_args), function_response in zip(tool_calls, calls, function_responses):
                 actions_taken.append({
                     "function": function_name,
                     "args": function_args,
@@ -7529,8 +7881,9 @@ Be proactive, professional, and action-oriented. Always confirm what you've done
                 })
 
             # Get final response from AI after function execution
-            second_response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
+            second_response = await llm_gateway.chat(
+                model=AI_CHAT_MODEL,
+                tenant=current_user.id,
                 messages=messages,
                 temperature=0.7,
                 max_tokens=500
@@ -7540,35 +7893,7 @@ Be proactive, professional, and action-oriented. Always confirm what you've done
         else:
             ai_response = response_message.content
 
-        # Save conversation with actions metadata
-        metadata = conversation.context or {}
-        if actions_taken:
-            metadata["actions_taken"] = actions_taken
-
-        db_conversation = Conversation(
-            user_id=current_user.id,
-            lead_id=conversation.lead_id,
-            loan_id=conversation.loan_id,
-            message=conversation.message,
-            response=ai_response,
-            role="user",
-            metadata=metadata
-        )
-        db.add(db_conversation)
-
-        # Save assistant response
-        db_assistant = Conversation(
-            user_id=current_user.id,
-            lead_id=conversation.lead_id,
-            loan_id=conversation.loan_id,
-            message=ai_response,
-            role="assistant",
-            metadata={"actions": actions_taken} if actions_taken else None
-        )
-        db.add(db_assistant)
-
-        db.commit()
-        db.refresh(db_conversation)
+        db_conversation = save_ai_chat(conversation, ai_response, actions_taken, db, current_user)
 
         logger.info(f"AI chat completed for user {current_user.email}. Actions taken: {len(actions_taken)}")
         return db_conversation
@@ -7577,6 +7902,190 @@ Be proactive, professional, and action-oriented. Always confirm what you've done
         logger.error(f"OpenAI API error: {e}")
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
 
+@app.post("/api/v1/ai/chat/stream")
+async def ai_chat_stream(
+    conversation: ConversationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming AI Assistant chat over Server-Sent Events.
+
+    Events:
+        token: {"content"} - a chunk of the reply as it is generated
+        tool_call: {"function", "args"} - the AI started an action
+        tool_result: {"function", "result"} - the action finished
+        done: the saved conversation (same shape as /api/v1/ai/chat)
+        error: {"detail"}
+    """
+
+    if not llm_gateway.openai_enabled:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+
+    messages, context_lead, context_loan = await build_ai_chat_messages(conversation, db, current_user)
+
+    async def event_stream():
+        actions_taken = []
+        content_parts = []
+        tool_call_parts = {}  # stream index -> {"id", "name", "arguments"}
+
+        try:
+            # First pass: stream the reply, accumulating any tool call fragments
+            async for chunk in llm_gateway.chat_stream(
+                model=AI_CHAT_MODEL,
+                tenant=current_user.id,
+                messages=messages,
+                tools=AI_CHAT_TOOLS,
+                tool_choice="auto",
+                temperature=0.7,
+                max_tokens=AI_CHAT_MAX_COMPLETION_TOKENS
+            ):
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield sse_event("token", {"content": delta.content})
+
+                for tool_call in delta.tool_calls or []:
+                    part = tool_call_parts.setdefault(tool_call.index, {"id": None, "name": "", "arguments": ""})
+                    if tool_call.id:
+                        part["id"] = tool_call.id
+                    if tool_call.function:
+                        part["name"] += tool_call.function.name or ""
+                        part["arguments"] += tool_call.function.arguments or ""
+
+            # Execute any function calls, then stream the follow-up reply
+            if tool_call_parts:
+                calls = [tool_call_parts[index] for index in sorted(tool_call_parts)]
+                messages.append({
+                    "role": "assistant",
+                    "content": "".join(content_parts) or None,
+                    "tool_calls": [
+                        {
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]}
+                        }
+                        for call in calls
+                    ]
+                })
+
+                function_calls = [(call["name"], json.loads(call["arguments"] or "{}")) for call in calls]
+                for function_name, function_args in function_calls:
+                    logger.info(f"AI calling function: {function_name} with args: {function_args}")
+                    yield sse_event("tool_call", {"function": function_name, "args": function_args})
+
+                function_responses = await execute_ai_functions(
+                    function_calls, db, current_user, context_lead, context_loan
+                )
+
+                for call, (function_name, function_args), function_response in zip(calls, function_calls, function_responses):
+                    actions_taken.append({
+                        "function": function_name,
+                        "args": function_args,
+                        "result": function_response
+                    })
+                    yield sse_event("tool_result", {"function": function_name, "result": function_response})
+
+                    messages.append({
+                        "tool_call_id": call["id"],
+                        "role": "tool",
+                        "name": function_name,
+                        "content": json.dumps(function_response)
+                    })
+
+                content_parts = []
+                async for chunk in llm_gateway.chat_stream(
+                    model=AI_CHAT_MODEL,
+                    tenant=current_user.id,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=500
+                ):
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        content_parts.append(chunk.choices[0].delta.content)
+                        yield sse_event("token", {"content": chunk.choices[0].delta.content})
+
+            # Persist once the full reply is known
+            ai_response = "".join(content_parts)
+            db_conversation = save_ai_chat(conversation, ai_response, actions_taken, db, current_user)
+
+            logger.info(f"AI chat stream completed for user {current_user.email}. Actions taken: {len(actions_taken)}")
+            yield sse_event("done", ConversationResponse.model_validate(db_conversation).model_dump(mode="json"))
+
+        except Exception as e:
+            logger.error(f"OpenAI streaming error: {e}")
+            db.rollback()
+            yield sse_event("error", {"detail": f"AI service error: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/v1/ai/cache/stats")
+async def get_llm_cache_stats(current_user: User = Depends(get_current_user)):
+    """LLM response cache hit rates per call site (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can view cache metrics")
+
+    return llm_cache.stats()
+
+@app.get("/api/v1/ai/memory/stats")
+async def get_vector_store_stats(current_user: User = Depends(get_current_user)):
+    """Vector store backend, namespace sizes and embedding progress (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can view memory metrics")
+
+    return vector_store.get_stats()
+
+@app.post("/api/v1/ai/memory/backfill-task-examples")
+async def backfill_task_examples(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Add approved task drafts recorded before the vector store existed (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can backfill memories")
+
+    existing = {
+        row.entity_id for row in db.query(AgentMemory.entity_id).filter(
+            AgentMemory.agent_type == TASK_EXAMPLE_AGENT_TYPE,
+            AgentMemory.memory_type == TASK_EXAMPLE_MEMORY_TYPE
+        )
+    }
+    approvals = db.query(TaskApproval, AITask).join(AITask, TaskApproval.task_id == AITask.id).filter(
+        TaskApproval.approved == True,
+        TaskApproval.ai_message.isnot(None)
+    ).all()
+
+    added = 0
+    for approval, task in approvals:
+        if task.id in existing:
+            continue
+        vector_store.add(
+            db,
+            agent_type=TASK_EXAMPLE_AGENT_TYPE,
+            memory_type=TASK_EXAMPLE_MEMORY_TYPE,
+            content=task_example_text(task),
+            meta_data={"task_type": approval.task_type, "message": approval.ai_message},
+            entity_type="task",
+            entity_id=task.id
+        )
+        existing.add(task.id)
+        added += 1
+    db.commit()
+    vector_store.notify()
+
+    return {"added": added}
+
+@app.get("/api/v1/ai/scheduler/stats")
+async def get_llm_scheduler_stats(current_user: User = Depends(get_current_user)):
+    """LLM scheduler queue depth, wait times and budgets per priority class (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only administrators can view scheduler metrics")
+
+    return llm_scheduler.stats()
+
 @app.get("/api/v1/conversations", response_model=List[ConversationResponse])
 async def get_conversations(
     skip: int = 0,
@@ -7605,7 +8114,7 @@ async def ai_complete_task(
 ):
     """Use AI to suggest task completion"""
 
-    if not openai_client:
+    if not llm_gateway.openai_enabled:
         raise HTTPException(status_code=503, detail="OpenAI API key not configured")
 
     task = db.query(AITask).filter(
@@ -7626,8 +8135,9 @@ async def ai_complete_task(
                 context += f"\nLoan: {loan.loan_number}, Stage: {loan.stage.value}"
 
         # Ask AI for completion suggestion
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat(
             model="gpt-4o-mini",
+            tenant=current_user.id,
             messages=[
                 {
                     "role": "system",
@@ -7912,6 +8422,60 @@ def init_db():
                         END $$;
                     """))
 
+                    # Track which onboarding document each process row came from
+                    for table_name in ("process_roles", "process_milestones", "process_tasks"):
+                        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS source_document_hash VARCHAR"))
+                        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table_name}_source_document_hash ON {table_name}(source_document_hash)"))
+
+                    # DRE worker batch claims
+                    conn.execute(text("ALTER TABLE incoming_data_events ADD COLUMN IF NOT EXISTS claim_token VARCHAR"))
+                    conn.execute(text("ALTER TABLE incoming_data_events ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_incoming_data_events_claim_token ON incoming_data_events(claim_token)"))
+                    conn.execute(text("ALTER TABLE incoming_data_events ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0"))
+                    conn.execute(text("ALTER TABLE incoming_data_events ADD COLUMN IF NOT EXISTS last_error TEXT"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_incoming_data_events_processed ON incoming_data_events(processed)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_extracted_data_event_id ON extracted_data(event_id)"))
+
+                    # Vector store: embedding state and namespace lookups
+                    conn.execute(text("ALTER TABLE agent_memory ADD COLUMN IF NOT EXISTS embedded_at TIMESTAMP"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_agent_memory_embedded_at ON agent_memory(embedded_at)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_agent_memory_namespace ON agent_memory(agent_type, memory_type)"))
+                    conn.execute(text("ALTER TABLE agent_memory ADD COLUMN IF NOT EXISTS claim_token VARCHAR"))
+                    conn.execute(text("ALTER TABLE agent_memory ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP"))
+
+                    # Agent event outbox claiming (due events by status)
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_agent_events_status_available_at ON agent_events(status, available_at)"))
+                    conn.execute(text("ALTER TABLE agent_events ADD COLUMN IF NOT EXISTS tenant_id INTEGER"))
+                    conn.execute(text("ALTER TABLE agent_events ADD COLUMN IF NOT EXISTS started_runs JSON"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_agent_events_tenant_due ON agent_events(tenant_id, status, available_at)"))
+
+                    # Agent checkpoint lookups (newest checkpoint of a workflow thread)
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_agent_checkpoints_thread ON agent_checkpoints(thread_id, checkpoint_ns, checkpoint_id)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_agent_checkpoint_writes_checkpoint ON agent_checkpoint_writes(thread_id, checkpoint_ns, checkpoint_id)"))
+
+                    # Pipeline review change watermarks (newest lead/loan change per user)
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_leads_owner_id_updated_at ON leads(owner_id, updated_at)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_loans_loan_officer_id_updated_at ON loans(loan_officer_id, updated_at)"))
+
+                    # Invitation password-setup tokens are kept apart from email verification
+                    conn.execute(text("ALTER TABLE email_verification_tokens ADD COLUMN IF NOT EXISTS purpose VARCHAR NOT NULL DEFAULT 'verify_email'"))
+
+                    # Overdue task sweeper: range scans over open tasks by due date, emitted marker
+                    conn.execute(text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS overdue_notified_at TIMESTAMP"))
+                    conn.execute(text("ALTER TABLE ai_tasks ADD COLUMN IF NOT EXISTS overdue_notified_at TIMESTAMP"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_status_due_date ON tasks(status, due_date)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ai_tasks_type_due_date ON ai_tasks(type, due_date)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_status_updated_at ON tasks(status, updated_at)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ai_tasks_type_updated_at ON ai_tasks(type, updated_at)"))
+
+                    # Coach context aggregates and staleness queries
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_leads_owner_id_stage ON leads(owner_id, stage)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_loans_loan_officer_id_stage ON loans(loan_officer_id, stage)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ai_tasks_assigned_to_id_due_date ON ai_tasks(assigned_to_id, due_date)"))
+
+                    # Reviewer notes on DRE training events (rejection reasons)
+                    conn.execute(text("ALTER TABLE ai_training_events ADD COLUMN IF NOT EXISTS notes TEXT"))
+
                     # Add partner_category column to referral_partners if it doesn't exist
                     conn.execute(text("""
                         DO $$
@@ -8152,30 +8716,7 @@ def create_sample_data(db: Session):
 # AI UNDERWRITER - INTELLIGENT Q&A
 # ============================================================================
 
-@app.post("/api/v1/ai-underwriter/ask")
-async def ask_underwriter_question(
-    request: dict,
-    current_user: User = Depends(get_current_user)
-):
-    """
-    AI Underwriter: Answer mortgage lending questions using Claude AI.
-    Provides comprehensive answers with source citations from mortgageguidelines.com.
-    """
-    question = request.get("question", "").strip()
-
-    if not question:
-        raise HTTPException(status_code=400, detail="Question is required")
-
-    # Get Claude API key
-    anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not anthropic_api_key:
-        raise HTTPException(status_code=500, detail="AI service not configured")
-
-    try:
-        # Call Claude API with expert mortgage underwriter system prompt
-        client = anthropic.Anthropic(api_key=anthropic_api_key)
-
-        system_prompt = """You are an expert mortgage underwriter assistant with deep knowledge of:
+UNDERWRITER_SYSTEM_PROMPT = """You are an expert mortgage underwriter assistant with deep knowledge of:
 - FHA, VA, USDA, and Conventional loan guidelines
 - Fannie Mae and Freddie Mac requirements
 - DTI ratios, credit score requirements, and LTV limits
@@ -8188,101 +8729,126 @@ Provide clear, accurate, and comprehensive answers to mortgage lending questions
 Be specific with numbers, percentages, and requirements.
 If you're not certain about specific current limits or requirements, acknowledge that guidelines may change."""
 
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=2048,
-            system=system_prompt,
-            messages=[{"role": "user", "content": question}]
-        )
+def underwriter_sources(question: str) -> List[Dict[str, str]]:
+    """Map an underwriting question to relevant mortgageguidelines.com pages"""
+    # Generate intelligent source links based on question topic
+    sources = []
+    question_lower = question.lower()
+
+    # Map common topics to relevant guideline pages
+    if 'fha' in question_lower:
+        sources.append({
+            "title": "FHA Loan Guidelines",
+            "url": "https://my.mortgageguidelines.com/single-family/fha"
+        })
 
-        answer = message.content[0].text
+    if 'va' in question_lower or 'veteran' in question_lower:
+        sources.append({
+            "title": "VA Loan Guidelines",
+            "url": "https://my.mortgageguidelines.com/single-family/va"
+        })
 
-        # Generate intelligent source links based on question topic
-        sources = []
-        question_lower = question.lower()
+    if 'usda' in question_lower or 'rural' in question_lower:
+        sources.append({
+            "title": "USDA Loan Guidelines",
+            "url": "https://my.mortgageguidelines.com/single-family/usda"
+        })
 
-        # Map common topics to relevant guideline pages
-        if 'fha' in question_lower:
-            sources.append({
-                "title": "FHA Loan Guidelines",
-                "url": "https://my.mortgageguidelines.com/single-family/fha"
-            })
+    if 'conventional' in question_lower or 'fannie' in question_lower or 'freddie' in question_lower:
+        sources.append({
+            "title": "Conventional Loan Guidelines",
+            "url": "https://my.mortgageguidelines.com/single-family/conventional"
+        })
 
-        if 'va' in question_lower or 'veteran' in question_lower:
-            sources.append({
-                "title": "VA Loan Guidelines",
-                "url": "https://my.mortgageguidelines.com/single-family/va"
-            })
+    if 'dti' in question_lower or 'debt' in question_lower:
+        sources.append({
+            "title": "DTI Requirements",
+            "url": "https://my.mortgageguidelines.com/topics/debt-to-income"
+        })
 
-        if 'usda' in question_lower or 'rural' in question_lower:
-            sources.append({
-                "title": "USDA Loan Guidelines",
-                "url": "https://my.mortgageguidelines.com/single-family/usda"
-            })
+    if 'credit' in question_lower or 'score' in question_lower:
+        sources.append({
+            "title": "Credit Score Requirements",
+            "url": "https://my.mortgageguidelines.com/topics/credit"
+        })
 
-        if 'conventional' in question_lower or 'fannie' in question_lower or 'freddie' in question_lower:
-            sources.append({
-                "title": "Conventional Loan Guidelines",
-                "url": "https://my.mortgageguidelines.com/single-family/conventional"
-            })
+    if 'self-employed' in question_lower or 'self employed' in question_lower:
+        sources.append({
+            "title": "Self-Employed Borrower Guidelines",
+            "url": "https://my.mortgageguidelines.com/topics/self-employed"
+        })
 
-        if 'dti' in question_lower or 'debt' in question_lower:
-            sources.append({
-                "title": "DTI Requirements",
-                "url": "https://my.mortgageguidelines.com/topics/debt-to-income"
-            })
+    if 'investment' in question_lower or 'rental' in question_lower:
+        sources.append({
+            "title": "Investment Property Guidelines",
+            "url": "https://my.mortgageguidelines.com/topics/investment-properties"
+        })
 
-        if 'credit' in question_lower or 'score' in question_lower:
-            sources.append({
-                "title": "Credit Score Requirements",
-                "url": "https://my.mortgageguidelines.com/topics/credit"
-            })
+    if 'cash-out' in question_lower or 'refinance' in question_lower:
+        sources.append({
+            "title": "Refinance Guidelines",
+            "url": "https://my.mortgageguidelines.com/topics/refinance"
+        })
 
-        if 'self-employed' in question_lower or 'self employed' in question_lower:
-            sources.append({
-                "title": "Self-Employed Borrower Guidelines",
-                "url": "https://my.mortgageguidelines.com/topics/self-employed"
-            })
+    if 'ltv' in question_lower or 'loan-to-value' in question_lower:
+        sources.append({
+            "title": "LTV Requirements",
+            "url": "https://my.mortgageguidelines.com/topics/ltv"
+        })
 
-        if 'investment' in question_lower or 'rental' in question_lower:
-            sources.append({
-                "title": "Investment Property Guidelines",
-                "url": "https://my.mortgageguidelines.com/topics/investment-properties"
-            })
+    if 'reserve' in question_lower:
+        sources.append({
+            "title": "Reserve Requirements",
+            "url": "https://my.mortgageguidelines.com/topics/reserves"
+        })
 
-        if 'cash-out' in question_lower or 'refinance' in question_lower:
-            sources.append({
-                "title": "Refinance Guidelines",
-                "url": "https://my.mortgageguidelines.com/topics/refinance"
-            })
+    # If no specific sources matched, add general guidelines page
+    if not sources:
+        sources.append({
+            "title": "Mortgage Guidelines",
+            "url": "https://my.mortgageguidelines.com/"
+        })
 
-        if 'ltv' in question_lower or 'loan-to-value' in question_lower:
-            sources.append({
-                "title": "LTV Requirements",
-                "url": "https://my.mortgageguidelines.com/topics/ltv"
-            })
+    return sources
 
-        if 'reserve' in question_lower:
-            sources.append({
-                "title": "Reserve Requirements",
-                "url": "https://my.mortgageguidelines.com/topics/reserves"
-            })
+def underwriter_confidence(answer: str) -> float:
+    # Higher token usage generally indicates more comprehensive, confident answers
+    return min(0.95, 0.7 + (len(answer) / 2000))
 
-        # If no specific sources matched, add general guidelines page
-        if not sources:
-            sources.append({
-                "title": "Mortgage Guidelines",
-                "url": "https://my.mortgageguidelines.com/"
-            })
+@app.post("/api/v1/ai-underwriter/ask")
+async def ask_underwriter_question(
+    request: dict,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    AI Underwriter: Answer mortgage lending questions using Claude AI.
+    Provides comprehensive answers with source citations from mortgageguidelines.com.
+    """
+    question = request.get("question", "").strip()
 
-        # Calculate confidence based on message usage
-        # Higher token usage generally indicates more comprehensive, confident answers
-        confidence = min(0.95, 0.7 + (len(answer) / 2000))
+    if not question:
+        raise HTTPException(status_code=400, detail="Question is required")
+
+    if not llm_gateway.anthropic_enabled:
+        raise HTTPException(status_code=500, detail="AI service not configured")
+
+    try:
+        # Call Claude API with expert mortgage underwriter system prompt
+        message = await llm_gateway.anthropic_message(
+            model="claude-3-haiku-20240307",
+            tenant=current_user.id,
+            max_tokens=2048,
+            cache_site="underwriter",
+            system=UNDERWRITER_SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": question}]
+        )
+
+        answer = message.content[0].text
 
         return {
             "answer": answer,
-            "sources": sources,
-            "confidence": confidence
+            "sources": underwriter_sources(question),
+            "confidence": underwriter_confidence(answer)
         }
 
     except Exception as e:
@@ -8296,6 +8862,51 @@ If you're not certain about specific current limits or requirements, acknowledge
         else:
             raise HTTPException(status_code=500, detail=f"AI Underwriter error: {error_msg}")
 
+@app.post("/api/v1/ai-underwriter/ask/stream")
+async def ask_underwriter_question_stream(
+    request: dict,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming AI Underwriter over Server-Sent Events.
+    Emits `token` events as Claude answers, then `done` with the full
+    answer, sources and confidence, or `error`.
+    """
+    question = request.get("question", "").strip()
+
+    if not question:
+        raise HTTPException(status_code=400, detail="Question is required")
+
+    if not llm_gateway.anthropic_enabled:
+        raise HTTPException(status_code=500, detail="AI service not configured")
+
+    async def event_stream():
+        answer_parts = []
+        try:
+            async for chunk in llm_gateway.anthropic_stream(
+                model="claude-3-haiku-20240307",
+                tenant=current_user.id,
+                max_tokens=2048,
+                cache_site="underwriter",
+                system=UNDERWRITER_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": question}]
+            ):
+                answer_parts.append(chunk)
+                yield sse_event("token", {"content": chunk})
+
+            answer = "".join(answer_parts)
+            yield sse_event("done", {
+                "answer": answer,
+                "sources": underwriter_sources(question),
+                "confidence": underwriter_confidence(answer)
+            })
+
+        except Exception as e:
+            logger.error(f"Error in AI Underwriter stream: {e}")
+            yield sse_event("error", {"detail": f"AI Underwriter error: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ============================================================================
 # EMAIL INTEGRATION - MICROSOFT GRAPH OAUTH
 # ============================================================================
@@ -9640,9 +10251,8 @@ async def ai_schedule_conversation(
         )
 
     calendly_token = os.getenv("CALENDLY_API_TOKEN")
-    anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 
-    if not calendly_token or not anthropic_api_key:
+    if not calendly_token or not llm_gateway.anthropic_enabled:
         raise HTTPException(status_code=500, detail="Calendly or Anthropic API not configured")
 
     try:
@@ -9704,12 +10314,11 @@ Rules:
 - If no slots available, suggest alternative dates or contact methods"""
 
         # Call Claude
-        client = anthropic.Anthropic(api_key=anthropic_api_key)
-
         messages = conversation_history + [{"role": "user", "content": message}]
 
-        ai_response = client.messages.create(
+        ai_response = await llm_gateway.anthropic_message(
             model="claude-3-5-sonnet-20241022",
+            tenant=current_user.id,
             max_tokens=1024,
             system=system_prompt,
             messages=messages
@@ -10415,82 +11024,17 @@ def parse_document_basic(document_content: str, document_name: str = None):
         "tasks": tasks
     }
 
-@app.post("/api/v1/onboarding/parse-documents-upload")
-async def parse_documents_upload(
-    files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Parse multiple uploaded documents (PDF, DOCX, TXT) and extract roles, milestones, and tasks.
-    Each document is parsed separately to extract its role/tasks, then combined into one process tree.
-    """
-    try:
-        # Import libraries for reading different file types
-        try:
-            import PyPDF2
-            import io
-            from docx import Document as DocxDocument
-        except ImportError as e:
-            logger.error(f"Missing required library for document parsing: {e}")
-            raise HTTPException(status_code=500, detail="Server missing document parsing libraries. Please contact support.")
-
-        # Clear existing parsed data for this user
-        db.query(ProcessTask).filter(ProcessTask.user_id == current_user.id).delete()
-        db.query(ProcessMilestone).filter(ProcessMilestone.user_id == current_user.id).delete()
-        db.query(ProcessRole).filter(ProcessRole.user_id == current_user.id).delete()
-        db.commit()
-
-        all_roles = []
-        all_milestones = []
-        all_tasks = []
-
-        # Process each uploaded file separately
-        for file_idx, file in enumerate(files):
-            logger.info(f"Processing file {file_idx + 1}/{len(files)}: {file.filename}")
-
-            # Read file content based on type
-            file_content = await file.read()
-            document_text = ""
-
-            if file.filename.endswith('.pdf'):
-                # Read PDF
-                try:
-                    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                    for page in pdf_reader.pages:
-                        document_text += page.extract_text() + "\n"
-                except Exception as e:
-                    logger.error(f"Failed to read PDF {file.filename}: {e}")
-                    continue
-
-            elif file.filename.endswith(('.docx', '.doc')):
-                # Read DOCX
-                try:
-                    doc = DocxDocument(io.BytesIO(file_content))
-                    for paragraph in doc.paragraphs:
-                        document_text += paragraph.text + "\n"
-                except Exception as e:
-                    logger.error(f"Failed to read DOCX {file.filename}: {e}")
-                    continue
-
-            elif file.filename.endswith('.txt'):
-                # Read TXT
-                try:
-                    document_text = file_content.decode('utf-8')
-                except Exception as e:
-                    logger.error(f"Failed to read TXT {file.filename}: {e}")
-                    continue
+from services.document_parsing import document_extractor
+from services.document_cache import (
+    document_hash, parser_version, get_cached_parse, store_parse, evict_parsed_documents
+)
 
-            else:
-                logger.warning(f"Unsupported file type: {file.filename}")
-                continue
+# Concurrent LLM calls allowed per document upload request
+DOCUMENT_LLM_CONCURRENCY = int(os.getenv("DOCUMENT_LLM_CONCURRENCY", "4"))
 
-            if not document_text.strip():
-                logger.warning(f"No text extracted from {file.filename}")
-                continue
-
-            # Use the improved AI prompt for each document
-            analysis_prompt = f"""
+def build_document_analysis_prompt(filename: str, document_text: str) -> str:
+    """Prompt asking the LLM to extract the primary role, milestones and tasks from one document"""
+    return f"""
             Analyze this document and identify the PRIMARY role/position being described.
 
             IMPORTANT: This is ONE document describing ONE person's role.
@@ -10498,7 +11042,7 @@ async def parse_documents_upload(
             - Do NOT extract other roles that are merely mentioned or referenced
             - Focus on the actual responsibilities and tasks of this PRIMARY role
 
-            Document name: "{file.filename}"
+            Document name: "{filename}"
 
             Extract:
             1. The PRIMARY role with full responsibility descriptions
@@ -10533,96 +11077,197 @@ async def parse_documents_upload(
             {document_text[:10000]}
 
             Return JSON with keys: roles (array with 1 role), milestones (array), tasks (array)
-            """
+    """
 
-            # Parse with AI
-            if openai_client:
-                try:
-                    completion = openai_client.chat.completions.create(
+@app.post("/api/v1/onboarding/parse-documents-upload")
+async def parse_documents_upload(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Parse multiple uploaded documents (PDF, DOCX, TXT) and extract roles, milestones, and tasks.
+    Each document is parsed separately to extract its role/tasks, then combined into one process tree.
+    """
+    try:
+        # Hash every upload; identical bytes are parsed once
+        documents = {}
+        for file in files:
+            content = await file.read()
+            documents.setdefault(document_hash(content), (content, file.filename))
+
+        # Rows from documents that are no longer uploaded (or predate hashing) are replaced;
+        # rows from unchanged documents are kept as-is
+        existing_hashes = {
+            row.source_document_hash for row in
+            db.query(ProcessRole.source_document_hash).filter(ProcessRole.user_id == current_user.id).distinct()
+        }
+        unchanged_hashes = existing_hashes & set(documents)
+        new_hashes = [h for h in documents if h not in unchanged_hashes]
+
+        stale = or_(
+            ProcessTask.source_document_hash.is_(None),
+            ProcessTask.source_document_hash.notin_(unchanged_hashes)
+        ) if unchanged_hashes else true()
+        db.query(ProcessTask).filter(ProcessTask.user_id == current_user.id, stale).delete(synchronize_session=False)
+
+        # Keep milestones/roles still referenced by surviving tasks from other documents
+        kept_milestone_ids = db.query(ProcessTask.milestone_id).filter(
+            ProcessTask.user_id == current_user.id, ProcessTask.milestone_id.isnot(None)
+        )
+        kept_role_ids = db.query(ProcessTask.role_id).filter(
+            ProcessTask.user_id == current_user.id, ProcessTask.role_id.isnot(None)
+        )
+        for model, kept_ids in ((ProcessMilestone, kept_milestone_ids), (ProcessRole, kept_role_ids)):
+            model_stale = or_(
+                model.source_document_hash.is_(None),
+                model.source_document_hash.notin_(unchanged_hashes)
+            ) if unchanged_hashes else true()
+            db.query(model).filter(
+                model.user_id == current_user.id,
+                model_stale,
+                model.id.notin_(kept_ids)
+            ).delete(synchronize_session=False)
+
+        parse_mode = "gpt-4o" if llm_gateway.openai_enabled else "basic"
+        version = parser_version(parse_mode)
+
+        # Reuse cached parses; only cache misses are extracted and sent to the LLM
+        parsed = {}
+        to_parse = []
+        for content_hash in new_hashes:
+            cached = get_cached_parse(db, content_hash, version)
+            if cached is not None:
+                parsed[content_hash] = cached
+            else:
+                to_parse.append(content_hash)
+
+        # Extract text from cache misses in the process pool (CPU-bound for PDFs)
+        texts = await document_extractor.extract_many([documents[h] for h in to_parse])
+
+        llm_semaphore = asyncio.Semaphore(DOCUMENT_LLM_CONCURRENCY)
+
+        async def parse_document(filename: str, document_text: str) -> Optional[Dict[str, Any]]:
+            """Parse one document's text into roles, milestones and tasks"""
+            if not llm_gateway.openai_enabled:
+                # Fallback without AI
+                logger.warning("No OpenAI client available, using basic parsing")
+                return parse_document_basic(document_text, filename)
+
+            analysis_prompt = build_document_analysis_prompt(filename, document_text)
+
+            try:
+                async with llm_semaphore:
+                    completion = await llm_gateway.chat(
                         model="gpt-4o",
+                        tenant=current_user.id,
                         messages=[
                             {"role": "system", "content": "You are an expert at analyzing job responsibility documents and extracting structured information. Focus on the PRIMARY role being described in each document."},
                             {"role": "user", "content": analysis_prompt}
                         ],
                         response_format={"type": "json_object"}
                     )
-                    ai_response = json.loads(completion.choices[0].message.content)
-
-                    # Collect results from this document
-                    if "roles" in ai_response:
-                        all_roles.extend(ai_response["roles"])
-                    if "milestones" in ai_response:
-                        all_milestones.extend(ai_response["milestones"])
-                    if "tasks" in ai_response:
-                        all_tasks.extend(ai_response["tasks"])
-
-                    logger.info(f"Parsed {file.filename}: {len(ai_response.get('roles', []))} roles, {len(ai_response.get('tasks', []))} tasks")
-
-                except Exception as e:
-                    logger.error(f"AI parsing failed for {file.filename}: {e}")
-                    continue
-            else:
-                # Fallback without AI
-                logger.warning("No OpenAI client available, using basic parsing")
-                fallback_result = parse_document_basic(document_text, file.filename)
-                all_roles.extend(fallback_result.get("roles", []))
-                all_milestones.extend(fallback_result.get("milestones", []))
-                all_tasks.extend(fallback_result.get("tasks", []))
+                ai_response = json.loads(completion.choices[0].message.content)
+                logger.info(f"Parsed {filename}: {len(ai_response.get('roles', []))} roles, {len(ai_response.get('tasks', []))} tasks")
+                return ai_response
 
-        # Now save all collected data to database
-        if not all_roles:
-            raise HTTPException(status_code=400, detail=f"No roles found in any of the {len(files)} uploaded documents. Please upload documents containing role and responsibility information.")
+            except Exception as e:
+                logger.error(f"AI parsing failed for {filename}: {e}")
+                return None
+
+        parse_hashes = []
+        parse_jobs = []
+        for content_hash, document_text in zip(to_parse, texts):
+            filename = documents[content_hash][1]
+            if not document_text or not document_text.strip():
+                logger.warning(f"No text extracted from {filename}")
+                continue
+            parse_hashes.append(content_hash)
+            parse_jobs.append(parse_document(filename, document_text))
 
-        # Create ProcessRole records
-        role_map = {}
-        for role_idx, role_data in enumerate(all_roles):
-            role = ProcessRole(
-                user_id=current_user.id,
-                role_name=role_data["role_name"],
-                role_title=role_data["role_title"],
-                responsibilities=role_data.get("responsibilities"),
-                skills_required=role_data.get("skills_required", []),
-                key_activities=role_data.get("key_activities", [])
-            )
-            db.add(role)
-            db.flush()
-            role_map[role_data["role_name"]] = role.id
+        for content_hash, result in zip(parse_hashes, await asyncio.gather(*parse_jobs)):
+            if not result:
+                continue
+            parsed[content_hash] = result
+            store_parse(db, content_hash, version, documents[content_hash][1], result)
 
-        # Create ProcessMilestone records
-        milestone_map = {}
-        for milestone_idx, milestone_data in enumerate(all_milestones):
-            milestone = ProcessMilestone(
-                user_id=current_user.id,
-                name=milestone_data["name"],
-                description=milestone_data.get("description"),
-                sequence_order=milestone_data.get("sequence_order", milestone_idx),
-                estimated_duration=milestone_data.get("estimated_duration")
-            )
-            db.add(milestone)
-            db.flush()
-            milestone_map[milestone_data["name"]] = milestone.id
+        # Names resolve to the document's own rows first, then to rows kept from other documents
+        kept_role_map = {
+            r.role_name: r.id for r in
+            db.query(ProcessRole).filter(ProcessRole.user_id == current_user.id)
+        }
+        kept_milestone_map = {
+            m.name: m.id for m in
+            db.query(ProcessMilestone).filter(ProcessMilestone.user_id == current_user.id)
+        }
 
-        # Create ProcessTask records
-        for task_data in all_tasks:
-            milestone_id = milestone_map.get(task_data["milestone"])
-            role_id = role_map.get(task_data["role"])
+        # Apply only the delta: rows for new or changed documents, in upload order
+        for content_hash in new_hashes:
+            result = parsed.get(content_hash)
+            if not result:
+                continue
 
-            if milestone_id and role_id:
-                task = ProcessTask(
+            # Create ProcessRole records
+            role_map = {}
+            for role_data in result.get("roles", []):
+                role = ProcessRole(
                     user_id=current_user.id,
-                    milestone_id=milestone_id,
-                    role_id=role_id,
-                    task_name=task_data["task_name"],
-                    task_description=task_data.get("task_description"),
-                    sequence_order=task_data.get("sequence_order", 0),
-                    estimated_duration=task_data.get("estimated_duration"),
-                    sla=task_data.get("sla"),
-                    sla_unit=task_data.get("sla_unit", "hours"),
-                    ai_automatable=task_data.get("ai_automatable", False),
-                    is_required=task_data.get("is_required", True)
+                    role_name=role_data["role_name"],
+                    role_title=role_data["role_title"],
+                    responsibilities=role_data.get("responsibilities"),
+                    skills_required=role_data.get("skills_required", []),
+                    key_activities=role_data.get("key_activities", []),
+                    source_document_hash=content_hash
                 )
-                db.add(task)
+                db.add(role)
+                db.flush()
+                role_map[role_data["role_name"]] = role.id
+
+            # Create ProcessMilestone records
+            milestone_map = {}
+            for milestone_idx, milestone_data in enumerate(result.get("milestones", [])):
+                milestone = ProcessMilestone(
+                    user_id=current_user.id,
+                    name=milestone_data["name"],
+                    description=milestone_data.get("description"),
+                    sequence_order=milestone_data.get("sequence_order", milestone_idx),
+                    estimated_duration=milestone_data.get("estimated_duration"),
+                    source_document_hash=content_hash
+                )
+                db.add(milestone)
+                db.flush()
+                milestone_map[milestone_data["name"]] = milestone.id
+
+            # Create ProcessTask records
+            for task_data in result.get("tasks", []):
+                milestone_id = milestone_map.get(task_data["milestone"]) or kept_milestone_map.get(task_data["milestone"])
+                role_id = role_map.get(task_data["role"]) or kept_role_map.get(task_data["role"])
+
+                if milestone_id and role_id:
+                    task = ProcessTask(
+                        user_id=current_user.id,
+                        milestone_id=milestone_id,
+                        role_id=role_id,
+                        task_name=task_data["task_name"],
+                        task_description=task_data.get("task_description"),
+                        sequence_order=task_data.get("sequence_order", 0),
+                        estimated_duration=task_data.get("estimated_duration"),
+                        sla=task_data.get("sla"),
+                        sla_unit=task_data.get("sla_unit", "hours"),
+                        ai_automatable=task_data.get("ai_automatable", False),
+                        is_required=task_data.get("is_required", True),
+                        source_document_hash=content_hash
+                    )
+                    db.add(task)
 
+            kept_role_map.update(role_map)
+            kept_milestone_map.update(milestone_map)
+
+        db.flush()
+        if not db.query(ProcessRole).filter(ProcessRole.user_id == current_user.id).count():
+            raise HTTPException(status_code=400, detail=f"No roles found in any of the {len(files)} uploaded documents. Please upload documents containing role and responsibility information.")
+
+        evict_parsed_documents(db)
         db.commit()
 
         # Get created records
@@ -10630,7 +11275,11 @@ async def parse_documents_upload(
         milestones = db.query(ProcessMilestone).filter(ProcessMilestone.user_id == current_user.id).all()
         tasks = db.query(ProcessTask).filter(ProcessTask.user_id == current_user.id).all()
 
-        logger.info(f"✅ Successfully parsed {len(files)} documents: {len(roles)} roles, {len(milestones)} milestones, {len(tasks)} tasks")
+        logger.info(
+            f"✅ Successfully parsed {len(files)} documents ({len(unchanged_hashes)} unchanged, "
+            f"{len(new_hashes) - len(to_parse)} from cache, {len(parse_jobs)} parsed): "
+            f"{len(roles)} roles, {len(milestones)} milestones, {len(tasks)} tasks"
+        )
 
         return {
             "roles": [ProcessRoleResponse.from_orm(r) for r in roles],
@@ -10640,10 +11289,16 @@ async def parse_documents_upload(
                 "total_roles": len(roles),
                 "total_milestones": len(milestones),
                 "total_tasks": len(tasks),
-                "files_processed": len(files)
+                "files_processed": len(files),
+                "files_unchanged": len(unchanged_hashes),
+                "files_from_cache": len(new_hashes) - len(to_parse),
+                "files_parsed": len(parse_jobs)
             }
         }
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Parse documents upload error: {e}")
@@ -10727,10 +11382,11 @@ async def parse_onboarding_documents(
         """
 
         # Use OpenAI to actually parse the document, or fall back to basic parsing
-        if openai_client:
+        if llm_gateway.openai_enabled:
             try:
-                completion = openai_client.chat.completions.create(
+                completion = await llm_gateway.chat(
                     model="gpt-4o",
+                    tenant=current_user.id,
                     messages=[
                         {"role": "system", "content": "You are an expert at analyzing process documents and extracting structured information."},
                         {"role": "user", "content": analysis_prompt}
@@ -11261,80 +11917,7 @@ async def get_workflow_team_members(
 # AGENTIC AI PERFORMANCE COACH ("THE PROCESS COACH")
 # ============================================================================
 
-def build_coach_context(user: User, db: Session) -> Dict[str, Any]:
-    """Build comprehensive context for the Performance Coach"""
-
-    # Get user's pipeline
-    leads = db.query(Lead).filter(Lead.owner_id == user.id).all()
-    loans = db.query(Loan).filter(Loan.loan_officer_id == user.id).all()
-
-    # Get open tasks
-    open_tasks = db.query(AITask).filter(
-        AITask.assigned_to_id == user.id,
-        AITask.type != TaskType.COMPLETED
-    ).all()
-
-    # Get overdue tasks
-    overdue_tasks = [t for t in open_tasks if t.due_date and t.due_date < datetime.now(timezone.utc)]
-
-    # Get pending reconciliation items
-    pending_reconciliation = db.query(ExtractedData).join(
-        IncomingDataEvent,
-        ExtractedData.event_id == IncomingDataEvent.id
-    ).filter(
-        IncomingDataEvent.user_id == user.id,
-        ExtractedData.status.in_(["pending_review", "needs_review"])
-    ).count()
-
-    # Calculate pipeline metrics
-    leads_by_stage = {}
-    for lead in leads:
-        stage = lead.stage.value
-        leads_by_stage[stage] = leads_by_stage.get(stage, 0) + 1
-
-    loans_by_stage = {}
-    for loan in loans:
-        stage = loan.stage.value
-        loans_by_stage[stage] = loans_by_stage.get(stage, 0) + 1
-
-    # Identify bottlenecks (loans/leads stuck in same stage > 7 days)
-    bottlenecks = []
-    for lead in leads:
-        # Use last_contact if available, otherwise updated_at
-        last_activity = lead.last_contact or lead.updated_at
-        if last_activity:
-            days_in_stage = (datetime.now(timezone.utc) - last_activity).days
-            if days_in_stage > 7:
-                bottlenecks.append({"type": "Lead", "name": lead.name, "stage": lead.stage.value, "days": days_in_stage})
-
-    for loan in loans:
-        if loan.updated_at:
-            days_in_stage = (datetime.now(timezone.utc) - loan.updated_at).days
-            if days_in_stage > 7:
-                bottlenecks.append({"type": "Loan", "name": loan.loan_number, "stage": loan.stage.value, "days": days_in_stage})
-
-    return {
-        "user": {
-            "name": user.full_name,
-            "role": user.role,
-            "email": user.email
-        },
-        "pipeline": {
-            "total_leads": len(leads),
-            "total_loans": len(loans),
-            "leads_by_stage": leads_by_stage,
-            "loans_by_stage": loans_by_stage
-        },
-        "tasks": {
-            "total_open": len(open_tasks),
-            "overdue": len(overdue_tasks),
-            "overdue_list": [{"title": t.title, "days_overdue": (datetime.now(timezone.utc) - t.due_date).days} for t in overdue_tasks[:5]]
-        },
-        "reconciliation": {
-            "pending_review": pending_reconciliation
-        },
-        "bottlenecks": bottlenecks[:10]  # Top 10 bottlenecks
-    }
+from services.coach_context import coach_context_cache, todays_briefing
 
 def get_coach_system_prompt(mode: CoachMode) -> str:
     """Get the system prompt for the Performance Coach based on mode"""
@@ -11529,9 +12112,8 @@ async def create_team_member(
         team_member_user = None
         if not existing_user and member_data.email:
             # Create a User account for the team member
-            # Generate a temporary password
-            temp_password = secrets.token_urlsafe(16)
-            hashed_password = get_password_hash(temp_password)
+            # No usable password until they redeem the setup token below
+            hashed_password = await password_hasher.unusable_hash()
 
             team_member_user = User(
                 email=member_data.email,
@@ -11553,14 +12135,13 @@ async def create_team_member(
                 user_id=team_member_user.id,
                 email=member_data.email,
                 token=setup_token,
+                purpose="password_setup",
                 expires_at=datetime.now(timezone.utc) + timedelta(days=7),
                 created_at=datetime.now(timezone.utc)
             )
             db.add(verification_token)
 
             logger.info(f"Created user account for team member: {member_data.email}")
-            # TODO: Send email with setup link containing the token
-            # setup_url = f"https://your-app.com/setup-password?token={setup_token}"
 
         # Store additional fields in meta_data
         meta_data = {
@@ -11586,6 +12167,11 @@ async def create_team_member(
         db.commit()
         db.refresh(team_member)
 
+        if team_member_user:
+            # Email the password setup link now that the account is committed
+            from services.data_import import send_invitations
+            await asyncio.to_thread(send_invitations, [(member_data.email, setup_token, full_name)])
+
         # Return response with fields from meta_data
         response_data = {
             "id": team_member.id,
@@ -11814,26 +12400,9 @@ async def impersonate_team_member(
         logger.error(f"Impersonation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/v1/coach", response_model=CoachResponse)
-async def performance_coach(
-    request: CoachRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Agentic AI Performance Coach endpoint"""
-
-    if not openai_client:
-        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
-
-    try:
-        # Build comprehensive context
-        context = build_coach_context(current_user, db)
-
-        # Get system prompt for the mode
-        system_prompt = get_coach_system_prompt(request.mode)
-
-        # Build user message with context
-        context_message = f"""
+def build_coach_message(request: CoachRequest, context: Dict[str, Any]) -> str:
+    """Render the coach user message from the pipeline context"""
+    context_message = f"""
 USER CONTEXT:
 - Name: {context['user']['name']}
 - Role: {context['user']['role']}
@@ -11854,15 +12423,63 @@ BOTTLENECKS:
 
 """
 
-        if request.message:
-            context_message += f"\nUSER REQUEST: {request.message}"
+    if request.message:
+        context_message += f"\nUSER REQUEST: {request.message}"
+
+    return context_message
+
+def build_coach_response(request: CoachRequest, context: Dict[str, Any], coach_response: str) -> CoachResponse:
+    """Attach priorities, metrics and action items to the coach reply"""
+    # Generate priorities if in daily_briefing or priority_guidance mode
+    priorities = None
+    if request.mode in [CoachMode.daily_briefing, CoachMode.priority_guidance]:
+        priorities = generate_priorities(context)
+
+    # Generate action items from bottlenecks
+    action_items = None
+    if request.mode == CoachMode.pipeline_audit:
+        action_items = [f"Fix {b['name']} - stuck {b['days']} days in {b['stage']}" for b in context['bottlenecks'][:5]]
+
+    return CoachResponse(
+        mode=request.mode,
+        response=coach_response,
+        priorities=priorities,
+        metrics={
+            "pipeline_health": "good" if len(context['bottlenecks']) < 3 else "needs_attention",
+            "total_bottlenecks": len(context['bottlenecks']),
+            "overdue_tasks": context['tasks']['overdue']
+        },
+        action_items=action_items
+    )
+
+@app.post("/api/v1/coach", response_model=CoachResponse)
+async def performance_coach(
+    request: CoachRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Agentic AI Performance Coach endpoint"""
+
+    if not llm_gateway.openai_enabled:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+
+    try:
+        # Serve the precomputed morning briefing when there's no follow-up question
+        if request.mode == CoachMode.daily_briefing and not request.message:
+            briefing = todays_briefing(current_user.id, db)
+            if briefing:
+                return build_coach_response(request, briefing.context, briefing.response)
+
+        # Build comprehensive context (cached per user)
+        context = coach_context_cache.get(current_user, db)
 
         # Call OpenAI with the coach system prompt
-        response = openai_client.chat.completions.create(
+        response = await llm_gateway.chat(
             model="gpt-4o",
+            tenant=current_user.id,
             messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": context_message}
+                {"role": "system", "content": get_coach_system_prompt(request.mode)},
+                {"role": "user", "content": build_coach_message(request, context)}
             ],
             temperature=0.7,
             max_tokens=500
@@ -11870,38 +12487,80 @@ BOTTLENECKS:
 
         coach_response = response.choices[0].message.content
 
-        # Generate priorities if in daily_briefing or priority_guidance mode
-        priorities = None
-        if request.mode in [CoachMode.daily_briefing, CoachMode.priority_guidance]:
-            priorities = generate_priorities(context)
-
-        # Generate action items from bottlenecks
-        action_items = None
-        if request.mode == CoachMode.pipeline_audit:
-            action_items = [f"Fix {b['name']} - stuck {b['days']} days in {b['stage']}" for b in context['bottlenecks'][:5]]
-
         logger.info(f"Performance Coach responded to {current_user.email} in {request.mode.value} mode")
 
-        return CoachResponse(
-            mode=request.mode,
-            response=coach_response,
-            priorities=priorities,
-            metrics={
-                "pipeline_health": "good" if len(context['bottlenecks']) < 3 else "needs_attention",
-                "total_bottlenecks": len(context['bottlenecks']),
-                "overdue_tasks": context['tasks']['overdue']
-            },
-            action_items=action_items
-        )
+        return build_coach_response(request, context, coach_response)
 
     except Exception as e:
         logger.error(f"Performance Coach error: {e}")
         raise HTTPException(status_code=500, detail=f"Coach error: {str(e)}")
 
+@app.post("/api/v1/coach/stream")
+async def performance_coach_stream(
+    request: CoachRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming Performance Coach over Server-Sent Events.
+    Emits `token` events as the reply is generated, then `done` with the
+    full CoachResponse (priorities, metrics, action items), or `error`.
+    """
+
+    if not llm_gateway.openai_enabled:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+
+    briefing = None
+    if request.mode == CoachMode.daily_briefing and not request.message:
+        briefing = todays_briefing(current_user.id, db)
+    context = briefing.context if briefing else coach_context_cache.get(current_user, db)
+
+    async def event_stream():
+        content_parts = []
+        try:
+            if briefing:
+                # Precomputed morning briefing: one token event, then done
+                yield sse_event("token", {"content": briefing.response})
+                result = build_coach_response(request, context, briefing.response)
+                yield sse_event("done", result.model_dump(mode="json"))
+                return
+
+            async for chunk in llm_gateway.chat_stream(
+                model="gpt-4o",
+                tenant=current_user.id,
+                messages=[
+                    {"role": "system", "content": get_coach_system_prompt(request.mode)},
+                    {"role": "user", "content": build_coach_message(request, context)}
+                ],
+                temperature=0.7,
+                max_tokens=500
+            ):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content_parts.append(chunk.choices[0].delta.content)
+                    yield sse_event("token", {"content": chunk.choices[0].delta.content})
+
+            logger.info(f"Performance Coach streamed to {current_user.email} in {request.mode.value} mode")
+            result = build_coach_response(request, context, "".join(content_parts))
+            yield sse_event("done", result.model_dump(mode="json"))
+
+        except Exception as e:
+            logger.error(f"Performance Coach streaming error: {e}")
+            yield sse_event("error", {"detail": f"Coach error: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ============================================================================
 # DATA IMPORT ENDPOINTS
 # ============================================================================
 
+from services.upload_store import upload_store
+from services.data_import import (
+    is_supported_file as is_supported_import_file,
+    read_dataframe as read_import_dataframe,
+    read_preview as read_import_preview,
+    import_dataframe,
+)
+
 @app.post("/api/v1/data-import/analyze")
 async def analyze_data_file(
     file: UploadFile = File(...),
@@ -11910,9 +12569,6 @@ async def analyze_data_file(
 ):
     """Analyze uploaded CSV/Excel file and generate AI questions"""
     try:
-        import csv
-        import io
-
         # Import dependencies with error handling
         try:
             import pandas as pd
@@ -11936,26 +12592,20 @@ async def analyze_data_file(
         if file_size_mb > 10:
             raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
 
-        # Determine file type and parse
-        logger.info(f"Parsing file type: {file.filename}")
-        if file.filename.endswith('.csv'):
-            logger.info("Parsing as CSV")
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            logger.info("Parsing as Excel")
-            # Read Excel file with explicit engine
-            df = pd.read_excel(io.BytesIO(content), engine='openpyxl')
-        else:
+        if not is_supported_import_file(file.filename):
             logger.error(f"Unsupported file type: {file.filename}")
             raise HTTPException(status_code=400, detail="Unsupported file type. Please upload CSV or Excel (.csv, .xlsx, .xls)")
 
-        # Get preview data
-        headers = df.columns.tolist()
-        rows = df.head(100).values.tolist()
-        total_rows = len(df)
+        # Parse only a bounded sample for preview and type inference;
+        # the full parse happens once, in execute
+        logger.info(f"Parsing preview sample: {file.filename}")
+        headers, rows, total_rows, df = read_import_preview(content, file.filename)
+
+        # Keep the upload so execute can redeem a handle instead of a second upload
+        upload_id = upload_store.put(content, file.filename, current_user.id)
 
         # Analyze data with AI to generate questions
-        if not openai_client:
+        if not llm_gateway.openai_enabled:
             # If no OpenAI, return basic questions
             questions = [
                 {
@@ -12037,8 +12687,9 @@ Respond with:
 2. Any clarifying questions if the data type is ambiguous
 3. Suggested column mappings"""
 
-            response = openai_client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model="gpt-4",
+                tenant=current_user.id,
                 messages=[
                     {"role": "system", "content": "You are a CRM data import assistant. Help users import their data correctly."},
                     {"role": "user", "content": analysis_prompt}
@@ -12105,6 +12756,8 @@ Respond with:
                     suggested_mappings[header] = 'phone'
 
         return {
+            "upload_id": upload_id,
+            "upload_expires_in": upload_store.ttl_seconds,
             "preview": {
                 "headers": headers,
                 "rows": rows,
@@ -12128,18 +12781,19 @@ Respond with:
 
 @app.post("/api/v1/data-import/execute")
 async def execute_data_import(
-    file: UploadFile = File(...),
     answers: str = Form(...),
     mappings: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Execute data import based on user answers and column mappings"""
+    """
+    Execute data import based on user answers and column mappings.
+    Accepts either the `upload_id` returned by analyze or a fresh file upload.
+    """
     try:
         import json
-        import pandas as pd
-        import openpyxl  # Explicitly import openpyxl
-        import io
 
         # Parse answers and mappings
         answers_dict = json.loads(answers)
@@ -12147,220 +12801,36 @@ async def execute_data_import(
 
         destination = answers_dict.get('destination', 'leads')
 
-        logger.info(f"Executing data import for: {file.filename}")
+        # Resolve file content from the upload store or the request body
+        if upload_id:
+            stored = upload_store.get(upload_id, current_user.id)
+            if not stored:
+                raise HTTPException(status_code=410, detail="Upload expired or not found. Please upload the file again.")
+            content, filename = stored
+        elif file is not None:
+            content = await file.read()
+            filename = file.filename
+        else:
+            raise HTTPException(status_code=400, detail="Provide either upload_id or file")
 
-        # Read file content
-        content = await file.read()
+        logger.info(f"Executing data import for: {filename}")
 
         # Parse file
-        if file.filename.endswith('.csv'):
-            logger.info("Parsing as CSV for import")
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            logger.info("Parsing as Excel for import")
-            df = pd.read_excel(io.BytesIO(content), engine='openpyxl')
-        else:
+        if not is_supported_import_file(filename):
             raise HTTPException(status_code=400, detail="Unsupported file type")
+        df = read_import_dataframe(content, filename)
 
-        # Import data
-        imported = 0
-        failed = 0
-        errors = []
-
-        for index, row in df.iterrows():
-            try:
-                # Map row data to CRM fields
-                data = {}
-                for source_col, target_field in mappings_dict.items():
-                    if target_field and source_col in row:
-                        value = row[source_col]
-                        if pd.notna(value):  # Skip NaN values
-                            data[target_field] = value
-
-                # Import based on destination
-                if destination == 'leads':
-                    # Create lead - ensure name field exists
-                    if 'name' not in data and ('first_name' in data or 'last_name' in data):
-                        first = data.pop('first_name', '')
-                        last = data.pop('last_name', '')
-                        data['name'] = f"{first} {last}".strip()
-
-                    lead = Lead(
-                        **data,
-                        owner_id=current_user.id,
-                        stage=LeadStage.NEW
-                    )
-                    db.add(lead)
-
-                elif destination == 'loans':
-                    # Create loan - ensure required fields exist
-                    if 'borrower_name' not in data and 'name' in data:
-                        data['borrower_name'] = data.pop('name')
-                    if 'borrower_name' not in data and ('first_name' in data or 'last_name' in data):
-                        first = data.pop('first_name', '')
-                        last = data.pop('last_name', '')
-                        data['borrower_name'] = f"{first} {last}".strip()
-
-                    # Generate loan number if not provided
-                    if 'loan_number' not in data:
-                        import secrets
-                        data['loan_number'] = f"LOAN-{secrets.token_hex(4).upper()}"
-
-                    # Map common field variations
-                    if 'loan_amount' in data and 'amount' not in data:
-                        data['amount'] = data.pop('loan_amount')
-                    if 'interest_rate' in data and 'rate' not in data:
-                        data['rate'] = data.pop('interest_rate')
-                    if 'loan_term' in data and 'term' not in data:
-                        data['term'] = data.pop('loan_term')
-
-                    # Ensure required fields
-                    if 'amount' not in data:
-                        data['amount'] = 0.0
-
-                    # Filter out fields that don't exist in Loan model (email, phone, etc.)
-                    valid_fields = {'loan_number', 'borrower_name', 'coborrower_name', 'stage', 'program',
-                                  'loan_type', 'amount', 'purchase_price', 'down_payment', 'rate', 'term',
-                                  'property_address', 'lock_date', 'closing_date', 'funded_date',
-                                  'processor', 'underwriter', 'realtor_agent', 'title_company',
-                                  'days_in_stage', 'sla_status', 'milestones', 'ai_insights',
-                                  'predicted_close_date', 'risk_score', 'user_metadata'}
-                    filtered_data = {k: v for k, v in data.items() if k in valid_fields}
-
-                    loan = Loan(
-                        **filtered_data,
-                        loan_officer_id=current_user.id,
-                        stage=LoanStage.DISCLOSED
-                    )
-                    db.add(loan)
-
-                elif destination == 'portfolio':
-                    # Create MUM client - ensure required fields exist
-                    if 'name' not in data and ('first_name' in data or 'last_name' in data):
-                        first = data.pop('first_name', '')
-                        last = data.pop('last_name', '')
-                        data['name'] = f"{first} {last}".strip()
-                    elif 'name' not in data and 'borrower_name' in data:
-                        data['name'] = data.pop('borrower_name')
-
-                    # Generate loan number if not provided
-                    if 'loan_number' not in data:
-                        import secrets
-                        data['loan_number'] = f"MUM-{secrets.token_hex(4).upper()}"
-
-                    # Map common field variations
-                    if 'loan_amount' in data and 'loan_balance' not in data:
-                        data['loan_balance'] = data.pop('loan_amount')
-                    if 'interest_rate' in data and 'current_rate' not in data:
-                        data['current_rate'] = data.pop('interest_rate')
-                    if 'close_date' in data and 'original_close_date' not in data:
-                        data['original_close_date'] = data.pop('close_date')
-
-                    # Ensure required fields with defaults
-                    if 'original_close_date' not in data:
-                        data['original_close_date'] = datetime.now(timezone.utc)
-
-                    # Filter out fields that don't exist in MUMClient model (email, phone, etc.)
-                    valid_fields = {'name', 'loan_number', 'original_close_date', 'days_since_funding',
-                                  'original_rate', 'current_rate', 'loan_balance', 'refinance_opportunity',
-                                  'estimated_savings', 'engagement_score', 'status', 'last_contact'}
-                    filtered_data = {k: v for k, v in data.items() if k in valid_fields}
-
-                    # Note: MUMClient doesn't have loan_officer_id
-                    mum_client = MUMClient(**filtered_data)
-                    db.add(mum_client)
-
-                elif destination == 'realtors' or destination == 'referral_partners':
-                    # Create referral partner - ensure name exists
-                    if 'name' not in data and ('first_name' in data or 'last_name' in data):
-                        first = data.pop('first_name', '')
-                        last = data.pop('last_name', '')
-                        data['name'] = f"{first} {last}".strip()
-
-                    # Ensure name exists
-                    if 'name' not in data:
-                        raise ValueError("Name is required for referral partners")
-
-                    # Map common field variations
-                    if 'company_name' in data and 'company' not in data:
-                        data['company'] = data.pop('company_name')
-                    if 'partner_type' in data and 'type' not in data:
-                        data['type'] = data.pop('partner_type')
-
-                    # Set default partner category
-                    if 'partner_category' not in data:
-                        data['partner_category'] = 'individual'
-
-                    # Filter out fields that don't exist in ReferralPartner model
-                    valid_fields = {'name', 'company', 'type', 'phone', 'email', 'notes',
-                                  'referrals_in', 'referrals_out', 'closed_loans', 'volume',
-                                  'reciprocity_score', 'status', 'loyalty_tier', 'partner_category'}
-                    filtered_data = {k: v for k, v in data.items() if k in valid_fields}
-
-                    partner = ReferralPartner(**filtered_data)
-                    db.add(partner)
-
-                elif destination == 'team_members' or destination == 'users':
-                    # Create user/team member - ensure required fields
-                    if 'email' not in data:
-                        raise ValueError("Email is required for team members")
-
-                    # Build full name
-                    if 'full_name' not in data and ('first_name' in data or 'last_name' in data):
-                        first = data.pop('first_name', '')
-                        last = data.pop('last_name', '')
-                        data['full_name'] = f"{first} {last}".strip()
-
-                    # Set default password if not provided
-                    if 'password' not in data and 'hashed_password' not in data:
-                        from passlib.context import CryptContext
-                        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-                        # Default password: change123 (user should change on first login)
-                        data['hashed_password'] = pwd_context.hash("change123")
-                    elif 'password' in data:
-                        from passlib.context import CryptContext
-                        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-                        data['hashed_password'] = pwd_context.hash(data.pop('password'))
-
-                    # Set default role
-                    if 'role' not in data:
-                        data['role'] = 'loan_officer'
-
-                    # Filter out fields that don't exist in User model
-                    valid_fields = {'email', 'hashed_password', 'full_name', 'role',
-                                  'branch_id', 'is_active', 'email_verified',
-                                  'onboarding_completed', 'user_metadata'}
-                    filtered_data = {k: v for k, v in data.items() if k in valid_fields}
-
-                    # Check if user already exists
-                    existing_user = db.query(User).filter(User.email == filtered_data['email']).first()
-                    if existing_user:
-                        raise ValueError(f"User with email {filtered_data['email']} already exists")
-
-                    user = User(**filtered_data)
-                    db.add(user)
-
-                else:
-                    raise ValueError(f"Invalid destination: {destination}. Supported: leads, loans, portfolio, realtors, team_members")
-
-                imported += 1
+        result = await import_dataframe(df, destination, mappings_dict, current_user.id, db)
 
-            except Exception as e:
-                failed += 1
-                errors.append(f"Row {index + 1}: {str(e)}")
-
-        db.commit()
-
-        logger.info(f"Data import completed: {imported} imported, {failed} failed")
+        logger.info(
+            f"Data import completed: {result['imported']} imported, {result['failed']} failed, "
+            f"{result['invitations_issued']} invited"
+        )
 
-        return {
-            "total": len(df),
-            "imported": imported,
-            "failed": failed,
-            "errors": errors,
-            "destination": destination
-        }
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Data import error: {e}")
@@ -12530,7 +13000,7 @@ async def auto_fix_error(
     AI-powered automatic error fixing endpoint.
     Receives error details with screenshot, analyzes with AI, applies fix, and tests it.
     """
-    if not openai_client:
+    if not llm_gateway.openai_enabled:
         raise HTTPException(
             status_code=503,
             detail="OpenAI API not configured. Please set OPENAI_API_KEY environment variable."
@@ -12572,8 +13042,9 @@ Respond in JSON format:
 """
 
         # Call OpenAI for error analysis
-        analysis_response = openai_client.chat.completions.create(
+        analysis_response = await llm_gateway.chat(
             model="gpt-4",
+            tenant=current_user.id,
             messages=[
                 {"role": "system", "content": "You are an expert debugging assistant. Always respond with valid JSON."},
                 {"role": "user", "content": error_analysis_prompt}
@@ -12644,17 +13115,46 @@ async def startup_event():
         logger.warning(f"⚠️ Startup initialization skipped: {e}")
         logger.info("Application will still start, database will be initialized on first request")
 
+    try:
+        llm_cache.purge_expired()
+    except Exception as e:
+        logger.warning(f"⚠️ LLM cache purge skipped: {e}")
+
+    # Background DRE extraction for synced/ingested emails
+    dre_worker.start()
+
+    # Drop cached coach contexts when a user's pipeline changes
+    coach_context_cache.listen()
+
+    # Rescheduled tasks can fire TASK_OVERDUE again
+    from services.overdue_sweeper import overdue_sweeper
+    overdue_sweeper.listen()
+
+    # Agent memory embeddings (pgvector when available, else in-process index)
+    try:
+        vector_store.setup()
+    except Exception as e:
+        logger.warning(f"⚠️ Vector store setup skipped: {e}")
+    vector_store.start()
+
     # Initialize Agent System
     try:
-        from agents.setup import initialize_agent_system
+        from agents.setup import initialize_agent_system, agents_run_in_process
         from agents.scheduler import start_scheduler
 
         logger.info("🤖 Initializing Agent System...")
         initialize_agent_system()
 
-        # Start scheduled tasks
-        start_scheduler()
-        logger.info("✅ Agent System initialized with scheduled tasks")
+        if agents_run_in_process():
+            # Dispatch agent events from the outbox (including ones left over from before a restart)
+            from agents.events import get_event_bus
+            get_event_bus().start()
+
+            # Start scheduled tasks
+            start_scheduler()
+            logger.info("✅ Agent System initialized with scheduled tasks")
+        else:
+            logger.info("✅ Agent System initialized (workflows run in agent_worker.py)")
     except Exception as e:
         logger.warning(f"⚠️ Agent System initialization skipped: {e}")
         logger.info("Agent system features will be available but not scheduled")
@@ -12669,11 +13169,21 @@ async def shutdown_event():
     logger.info("🛑 Shutting down Agentic AI Mortgage CRM...")
 
     try:
-        from agents.scheduler import stop_scheduler
-        stop_scheduler()
-        logger.info("✅ Agent scheduler stopped")
+        from agents.setup import agents_run_in_process
+        if agents_run_in_process():
+            from agents.scheduler import stop_scheduler
+            from agents.events import get_event_bus
+
+            stop_scheduler()
+            await get_event_bus().stop()
+            logger.info("✅ Agent scheduler and event dispatcher stopped")
     except Exception as e:
-        logger.warning(f"⚠️ Agent scheduler shutdown error: {e}")
+        logger.warning(f"⚠️ Agent system shutdown error: {e}")
+    await dre_worker.stop()
+    await vector_store.stop()
+    password_hasher.shutdown()
+    document_extractor.shutdown()
+    await llm_gateway.close()
 
     logger.info("👋 CRM shutdown complete")
 
@@ -15,7 +15,7 @@ import os
 
 from main import (
     get_db, User, Subscription, OnboardingProgress, EmailVerificationToken,
-    TeamMember, Workflow, get_password_hash
+    TeamMember, Workflow, password_hasher
 )
 # from integrations.stripe_service import StripeService  # Disabled for now
 from integrations.email_service import EmailService, VerificationTokenService
@@ -138,7 +138,7 @@ async def create_demo_user(db: Session = Depends(get_db)):
     # Create demo user
     demo_user = User(
         email=demo_email,
-        hashed_password=get_password_hash("demo123"),
+        hashed_password=await password_hasher.hash("demo123"),
         full_name="Demo User",
         email_verified=True,
         is_active=True,
@@ -203,6 +203,11 @@ class EmailVerification(BaseModel):
     token: str
 
 
+class PasswordSetup(BaseModel):
+    token: str
+    password: str
+
+
 class OnboardingStepUpdate(BaseModel):
     step: int
     data: Dict
@@ -314,7 +319,7 @@ async def register_user(registration: UserRegistration, db: Session = Depends(ge
         # Create user in database (auto-verified and activated)
         db_user = User(
             email=registration.email,
-            hashed_password=get_password_hash(registration.password),
+            hashed_password=await password_hasher.hash(registration.password),
             full_name=registration.full_name,
             email_verified=True,  # Auto-verify all accounts
             is_active=True,  # Auto-activate all accounts
@@ -439,6 +444,42 @@ async def verify_email(verification: EmailVerification, db: Session = Depends(ge
     }
 
 
+@router.post("/api/v1/setup-password")
+async def setup_password(setup: PasswordSetup, db: Session = Depends(get_db)):
+    """
+    Set the password of an invited account (imports, team member invites)
+    with the one-time token from the invitation email
+    """
+    if len(setup.password) < 8:
+        raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
+
+    # Hash before redeeming so a hashing failure doesn't burn the token
+    hashed_password = await password_hasher.hash(setup.password)
+
+    user_id = VerificationTokenService.verify_token(db, setup.token, purpose="password_setup")
+
+    if not user_id:
+        raise HTTPException(status_code=400, detail="Invalid or expired setup link")
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.hashed_password = hashed_password
+    # The link was delivered to this address, so it is verified too
+    user.email_verified = True
+    user.is_active = True
+    db.commit()
+
+    logger.info(f"Password set up for invited user: {user.email}")
+
+    return {
+        "message": "Password set successfully!",
+        "email": user.email,
+        "redirect_to": "/login"
+    }
+
+
 @router.post("/api/v1/resend-verification")
 async def resend_verification(email: EmailStr, db: Session = Depends(get_db)):
     """
@@ -467,6 +508,40 @@ async def resend_verification(email: EmailStr, db: Session = Depends(get_db)):
     return {"message": "Verification email sent"}
 
 
+@router.post("/api/v1/resend-invitation")
+async def resend_invitation(email: EmailStr, db: Session = Depends(get_db)):
+    """
+    Resend the password setup link of an invited account that hasn't set a password yet
+    """
+    user = db.query(User).filter(User.email == email).first()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    pending = db.query(EmailVerificationToken).filter(
+        EmailVerificationToken.user_id == user.id,
+        EmailVerificationToken.purpose == "password_setup"
+    )
+    if pending.first() is None:
+        raise HTTPException(status_code=400, detail="No pending invitation for this account")
+
+    # Replace the outstanding setup tokens with a fresh one
+    pending.delete(synchronize_session=False)
+    setup_token = VerificationTokenService.generate_token()
+    db.add(EmailVerificationToken(
+        user_id=user.id,
+        email=user.email,
+        token=setup_token,
+        purpose="password_setup",
+        expires_at=datetime.utcnow() + timedelta(days=7)
+    ))
+    db.commit()
+
+    email_service.send_invitation_email(user.email, setup_token, user.full_name)
+
+    return {"message": "Invitation email sent"}
+
+
 # ============================================================================
 # SUBSCRIPTION PLANS
 # ============================================================================
@@ -0,0 +1 @@
+# Services module for internal application services
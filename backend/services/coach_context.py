@@ -0,0 +1,312 @@
+"""
+Coach Context
+Pipeline context for the Performance Coach, built from SQL aggregates
+(stage histograms, task counts) and LIMIT-ed staleness queries instead of
+loading every lead, loan and task into Python.
+
+Contexts are cached per user and dropped whenever a committed transaction
+touched that user's leads, loans, tasks or inbound DRE events (including
+rows reassigned away from them); the TTL only bounds staleness from writes
+made by other processes or bulk UPDATEs.
+
+The daily briefing is precomputed for active users on a schedule (see
+agents/scheduler.py) and stored in CoachBriefing, so the morning coach
+call doesn't wait on a pipeline scan or the model.
+"""
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone, date
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BOTTLENECK_DAYS = 7
+BOTTLENECK_LIMIT = 10
+OVERDUE_LIST_LIMIT = 5
+
+DEFAULT_TTL_SECONDS = 300
+
+# Session.info key holding users whose contexts go stale when the session commits
+PENDING_USERS_KEY = "coach_context_users"
+DEFAULT_BRIEFING_CONCURRENCY = 4
+
+
+def _days_since(moment: Optional[datetime], now: datetime) -> int:
+    if moment is None:
+        return 0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (now - moment).days
+
+
+def compute_coach_context(user, db) -> Dict[str, Any]:
+    """Build the coach context for `user` with aggregate queries"""
+    from sqlalchemy import func, case
+    from main import Lead, Loan, AITask, TaskType, ExtractedData, IncomingDataEvent
+
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(days=BOTTLENECK_DAYS)
+
+    # Pipeline histograms
+    leads_by_stage = {
+        stage.value: count for stage, count in db.query(Lead.stage, func.count(Lead.id))
+        .filter(Lead.owner_id == user.id)
+        .group_by(Lead.stage)
+        if stage is not None
+    }
+    loans_by_stage = {
+        stage.value: count for stage, count in db.query(Loan.stage, func.count(Loan.id))
+        .filter(Loan.loan_officer_id == user.id)
+        .group_by(Loan.stage)
+        if stage is not None
+    }
+
+    # Open and overdue tasks
+    open_task_filter = (AITask.assigned_to_id == user.id, AITask.type != TaskType.COMPLETED)
+    total_open, overdue = db.query(
+        func.count(AITask.id),
+        func.coalesce(func.sum(case((AITask.due_date < now, 1), else_=0)), 0)
+    ).filter(*open_task_filter).one()
+
+    overdue_tasks = db.query(AITask.title, AITask.due_date).filter(
+        *open_task_filter, AITask.due_date < now
+    ).order_by(AITask.due_date.asc()).limit(OVERDUE_LIST_LIMIT).all()
+
+    # Pending reconciliation items
+    pending_reconciliation = db.query(func.count(ExtractedData.id)).join(
+        IncomingDataEvent,
+        ExtractedData.event_id == IncomingDataEvent.id
+    ).filter(
+        IncomingDataEvent.user_id == user.id,
+        ExtractedData.status.in_(["pending_review", "needs_review"])
+    ).scalar()
+
+    # Bottlenecks: the stalest leads/loans with no activity for BOTTLENECK_DAYS
+    lead_activity = func.coalesce(Lead.last_contact, Lead.updated_at)
+    stale_leads = db.query(Lead.name, Lead.stage, lead_activity).filter(
+        Lead.owner_id == user.id,
+        lead_activity < stale_before
+    ).order_by(lead_activity.asc()).limit(BOTTLENECK_LIMIT).all()
+
+    stale_loans = db.query(Loan.loan_number, Loan.stage, Loan.updated_at).filter(
+        Loan.loan_officer_id == user.id,
+        Loan.updated_at < stale_before
+    ).order_by(Loan.updated_at.asc()).limit(BOTTLENECK_LIMIT).all()
+
+    bottlenecks = [
+        {"type": "Lead", "name": name, "stage": stage.value if stage else None, "days": _days_since(activity, now)}
+        for name, stage, activity in stale_leads
+    ] + [
+        {"type": "Loan", "name": loan_number, "stage": stage.value if stage else None, "days": _days_since(updated, now)}
+        for loan_number, stage, updated in stale_loans
+    ]
+    bottlenecks.sort(key=lambda b: b["days"], reverse=True)
+
+    return {
+        "user": {
+            "name": user.full_name,
+            "role": user.role,
+            "email": user.email
+        },
+        "pipeline": {
+            "total_leads": sum(leads_by_stage.values()),
+            "total_loans": sum(loans_by_stage.values()),
+            "leads_by_stage": leads_by_stage,
+            "loans_by_stage": loans_by_stage
+        },
+        "tasks": {
+            "total_open": total_open,
+            "overdue": int(overdue),
+            "overdue_list": [
+                {"title": title, "days_overdue": _days_since(due_date, now)}
+                for title, due_date in overdue_tasks
+            ]
+        },
+        "reconciliation": {
+            "pending_review": pending_reconciliation
+        },
+        "bottlenecks": bottlenecks[:BOTTLENECK_LIMIT]
+    }
+
+
+class CoachContextCache:
+    """Per-user coach context cache, invalidated on pipeline writes"""
+
+    def __init__(self):
+        self.ttl_seconds = int(os.getenv("COACH_CONTEXT_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        # user_id -> (built_at epoch seconds, context)
+        self._contexts: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        # user_id -> invalidation count; a context computed across an
+        # invalidation is returned but not cached
+        self._generations: Dict[int, int] = {}
+        self._listening = False
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user, db) -> Dict[str, Any]:
+        entry = self._contexts.get(user.id)
+        if entry and time.time() - entry[0] < self.ttl_seconds:
+            self.stats["hits"] += 1
+            return entry[1]
+
+        self.stats["misses"] += 1
+        generation = self._generations.get(user.id, 0)
+        context = compute_coach_context(user, db)
+        if self._generations.get(user.id, 0) == generation:
+            self._contexts[user.id] = (time.time(), context)
+        return context
+
+    def invalidate(self, user_id: Optional[int]):
+        if user_id is None:
+            return
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        if self._contexts.pop(user_id, None) is not None:
+            self.stats["invalidations"] += 1
+
+    # ------------------------------------------------------------------
+    # Invalidation on pipeline writes
+    # ------------------------------------------------------------------
+
+    def _affected_users(self, session) -> Set[int]:
+        from sqlalchemy import inspect
+        from main import Lead, Loan, AITask, IncomingDataEvent
+
+        owner_columns = {
+            Lead: "owner_id",
+            Loan: "loan_officer_id",
+            AITask: "assigned_to_id",
+            IncomingDataEvent: "user_id",
+        }
+        users = set()
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            column = owner_columns.get(type(obj))
+            if column:
+                users.add(getattr(obj, column, None))
+                # Reassigned rows also change the previous owner's pipeline
+                users.update(inspect(obj).attrs[column].history.deleted or ())
+        users.discard(None)
+        return users
+
+    def listen(self):
+        """
+        Invalidate cached contexts when a transaction that wrote pipeline rows
+        commits. Users are collected at flush time but only invalidated after
+        the commit: invalidating earlier lets a concurrent request re-cache
+        the old committed state for the whole TTL.
+        """
+        if self._listening:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+
+        @event.listens_for(Session, "before_flush")
+        def _collect_on_flush(session, flush_context, instances):
+            users = self._affected_users(session)
+            if users:
+                session.info.setdefault(PENDING_USERS_KEY, set()).update(users)
+
+        @event.listens_for(Session, "after_commit")
+        def _invalidate_on_commit(session):
+            for user_id in session.info.pop(PENDING_USERS_KEY, ()):
+                self.invalidate(user_id)
+
+        @event.listens_for(Session, "after_rollback")
+        def _discard_on_rollback(session):
+            session.info.pop(PENDING_USERS_KEY, None)
+
+        self._listening = True
+
+
+# ============================================================================
+# DAILY BRIEFING
+# ============================================================================
+
+async def generate_daily_briefing(user, db) -> Tuple[Dict[str, Any], str]:
+    """Run the daily_briefing coach prompt for `user`. Returns (context, response)."""
+    from main import CoachRequest, CoachMode, get_coach_system_prompt, build_coach_message
+    from integrations.llm_gateway import llm_gateway
+
+    request = CoachRequest(mode=CoachMode.daily_briefing)
+    context = coach_context_cache.get(user, db)
+    response = await llm_gateway.chat(
+        model="gpt-4o",
+        tenant=user.id,
+        messages=[
+            {"role": "system", "content": get_coach_system_prompt(request.mode)},
+            {"role": "user", "content": build_coach_message(request, context)}
+        ],
+        temperature=0.7,
+        max_tokens=500
+    )
+    return context, response.choices[0].message.content
+
+
+def todays_briefing(user_id: int, db) -> Optional[Any]:
+    """Today's precomputed CoachBriefing for a user, if any"""
+    from main import CoachBriefing
+
+    return db.query(CoachBriefing).filter(
+        CoachBriefing.user_id == user_id,
+        CoachBriefing.briefing_date == date.today()
+    ).first()
+
+
+async def precompute_daily_briefings() -> int:
+    """
+    Generate today's briefing for every active user with a pipeline, at
+    batch LLM priority. Users that already have one are skipped, so the job
+    is safe to re-run. Returns the number of briefings written.
+    """
+    import asyncio
+    from sqlalchemy import select
+    from main import SessionLocal, User, Lead, Loan, CoachBriefing
+    from integrations.llm_gateway import llm_gateway
+    from integrations.llm_scheduler import llm_scheduler, BATCH
+
+    if not llm_gateway.openai_enabled:
+        logger.info("Skipping coach briefings - OpenAI not configured")
+        return 0
+
+    db = SessionLocal()
+    try:
+        done = {row.user_id for row in db.query(CoachBriefing.user_id).filter(CoachBriefing.briefing_date == date.today())}
+        with_pipeline = select(Lead.owner_id).union(select(Loan.loan_officer_id))
+        users = [
+            user for user in db.query(User).filter(User.is_active.is_(True), User.id.in_(with_pipeline))
+            if user.id not in done
+        ]
+    finally:
+        db.close()
+
+    semaphore = asyncio.Semaphore(int(os.getenv("COACH_BRIEFING_CONCURRENCY", DEFAULT_BRIEFING_CONCURRENCY)))
+
+    async def briefing_for(user) -> bool:
+        async with semaphore:
+            db = SessionLocal()
+            try:
+                with llm_scheduler.context(priority=BATCH):
+                    context, response = await generate_daily_briefing(user, db)
+                briefing = db.query(CoachBriefing).filter(CoachBriefing.user_id == user.id).first()
+                if briefing is None:
+                    briefing = CoachBriefing(user_id=user.id)
+                    db.add(briefing)
+                briefing.briefing_date = date.today()
+                briefing.context = context
+                briefing.response = response
+                briefing.created_at = datetime.now(timezone.utc)
+                db.commit()
+                return True
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Coach briefing failed for user {user.id}: {e}")
+                return False
+            finally:
+                db.close()
+
+    written = sum(await asyncio.gather(*(briefing_for(user) for user in users)))
+    logger.info(f"Precomputed {written}/{len(users)} coach daily briefings")
+    return written
+
+
+# Global instance
+coach_context_cache = CoachContextCache()
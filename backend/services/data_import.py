@@ -0,0 +1,346 @@
+"""
+Data Import Helpers
+Parsing helpers and the row import engine behind the data-import endpoints
+"""
+import io
+import csv
+import asyncio
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_ROWS = 100
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+
+def is_supported_file(filename: str) -> bool:
+    return bool(filename) and filename.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def read_dataframe(content: bytes, filename: str, nrows: int = None):
+    """
+    Parse an uploaded CSV/Excel file into a DataFrame.
+    Pass `nrows` to parse only a bounded sample (used for previews).
+    """
+    import pandas as pd
+
+    if filename.lower().endswith('.csv'):
+        return pd.read_csv(io.BytesIO(content), nrows=nrows)
+    if filename.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(io.BytesIO(content), engine='openpyxl', nrows=nrows)
+    raise ValueError(f"Unsupported file type: {filename}")
+
+
+def count_rows(content: bytes, filename: str) -> int:
+    """
+    Count data rows without building a DataFrame.
+    CSV rows are tokenized with the csv module (handles quoted newlines);
+    Excel uses the sheet dimensions from a read-only workbook.
+    """
+    if filename.lower().endswith('.csv'):
+        text_stream = io.TextIOWrapper(io.BytesIO(content), encoding='utf-8', errors='replace', newline='')
+        total = sum(1 for row in csv.reader(text_stream) if row)
+        return max(total - 1, 0)  # minus header
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+    try:
+        sheet = workbook.active
+        max_row = sheet.max_row
+        if max_row is None:
+            # Some writers omit the dimension record; fall back to iterating
+            max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+        return max(max_row - 1, 0)
+    finally:
+        workbook.close()
+
+
+def read_preview(content: bytes, filename: str, nrows: int = PREVIEW_ROWS) -> Tuple[List[str], List[list], int, "object"]:
+    """
+    Parse only the first `nrows` rows for preview and type inference.
+    Returns (headers, rows, total_rows, sample_df).
+    """
+    sample_df = read_dataframe(content, filename, nrows=nrows)
+    headers = sample_df.columns.tolist()
+    rows = sample_df.values.tolist()
+
+    if len(sample_df) < nrows:
+        total_rows = len(sample_df)
+    else:
+        total_rows = count_rows(content, filename)
+
+    return headers, rows, total_rows, sample_df
+
+
+async def import_dataframe(df, destination: str, mappings: Dict[str, str], owner_id: int, db) -> Dict[str, Any]:
+    """
+    Import every row of a parsed upload into `destination` and commit once.
+
+    Args:
+        df: Parsed upload (see read_dataframe)
+        destination: leads, loans, portfolio, realtors or team_members
+        mappings: Source column -> CRM field
+        owner_id: User who owns the imported records
+        db: Database session
+
+    Returns:
+        Dict with total, imported, failed, errors, destination, invitations_issued
+        and invitations_sent
+    """
+    import pandas as pd
+    from main import (
+        Lead, Loan, MUMClient, ReferralPartner, User, EmailVerificationToken,
+        LeadStage, LoanStage
+    )
+    from services.password_hashing import password_hasher, generate_invitation_tokens
+
+    imported = 0
+    failed = 0
+    errors = []
+    invited_users = []
+
+    for index, row in df.iterrows():
+        try:
+            # Map row data to CRM fields
+            data = {}
+            for source_col, target_field in mappings.items():
+                if target_field and source_col in row:
+                    value = row[source_col]
+                    if pd.notna(value):  # Skip NaN values
+                        data[target_field] = value
+
+            # Import based on destination
+            if destination == 'leads':
+                # Create lead - ensure name field exists
+                if 'name' not in data and ('first_name' in data or 'last_name' in data):
+                    first = data.pop('first_name', '')
+                    last = data.pop('last_name', '')
+                    data['name'] = f"{first} {last}".strip()
+
+                lead = Lead(
+                    **data,
+                    owner_id=owner_id,
+                    stage=LeadStage.NEW
+                )
+                db.add(lead)
+
+            elif destination == 'loans':
+                # Create loan - ensure required fields exist
+                if 'borrower_name' not in data and 'name' in data:
+                    data['borrower_name'] = data.pop('name')
+                if 'borrower_name' not in data and ('first_name' in data or 'last_name' in data):
+                    first = data.pop('first_name', '')
+                    last = data.pop('last_name', '')
+                    data['borrower_name'] = f"{first} {last}".strip()
+
+                # Generate loan number if not provided
+                if 'loan_number' not in data:
+                    data['loan_number'] = f"LOAN-{secrets.token_hex(4).upper()}"
+
+                # Map common field variations
+                if 'loan_amount' in data and 'amount' not in data:
+                    data['amount'] = data.pop('loan_amount')
+                if 'interest_rate' in data and 'rate' not in data:
+                    data['rate'] = data.pop('interest_rate')
+                if 'loan_term' in data and 'term' not in data:
+                    data['term'] = data.pop('loan_term')
+
+                # Ensure required fields
+                if 'amount' not in data:
+                    data['amount'] = 0.0
+
+                # Filter out fields that don't exist in Loan model (email, phone, etc.)
+                valid_fields = {'loan_number', 'borrower_name', 'coborrower_name', 'stage', 'program',
+                              'loan_type', 'amount', 'purchase_price', 'down_payment', 'rate', 'term',
+                              'property_address', 'lock_date', 'closing_date', 'funded_date',
+                              'processor', 'underwriter', 'realtor_agent', 'title_company',
+                              'days_in_stage', 'sla_status', 'milestones', 'ai_insights',
+                              'predicted_close_date', 'risk_score', 'user_metadata'}
+                filtered_data = {k: v for k, v in data.items() if k in valid_fields}
+
+                loan = Loan(
+                    **filtered_data,
+                    loan_officer_id=owner_id,
+                    stage=LoanStage.DISCLOSED
+                )
+                db.add(loan)
+
+            elif destination == 'portfolio':
+                # Create MUM client - ensure required fields exist
+                if 'name' not in data and ('first_name' in data or 'last_name' in data):
+                    first = data.pop('first_name', '')
+                    last = data.pop('last_name', '')
+                    data['name'] = f"{first} {last}".strip()
+                elif 'name' not in data and 'borrower_name' in data:
+                    data['name'] = data.pop('borrower_name')
+
+                # Generate loan number if not provided
+                if 'loan_number' not in data:
+                    data['loan_number'] = f"MUM-{secrets.token_hex(4).upper()}"
+
+                # Map common field variations
+                if 'loan_amount' in data and 'loan_balance' not in data:
+                    data['loan_balance'] = data.pop('loan_amount')
+                if 'interest_rate' in data and 'current_rate' not in data:
+                    data['current_rate'] = data.pop('interest_rate')
+                if 'close_date' in data and 'original_close_date' not in data:
+                    data['original_close_date'] = data.pop('close_date')
+
+                # Ensure required fields with defaults
+                if 'original_close_date' not in data:
+                    data['original_close_date'] = datetime.now(timezone.utc)
+
+                # Filter out fields that don't exist in MUMClient model (email, phone, etc.)
+                valid_fields = {'name', 'loan_number', 'original_close_date', 'days_since_funding',
+                              'original_rate', 'current_rate', 'loan_balance', 'refinance_opportunity',
+                              'estimated_savings', 'engagement_score', 'status', 'last_contact'}
+                filtered_data = {k: v for k, v in data.items() if k in valid_fields}
+
+                # Note: MUMClient doesn't have loan_officer_id
+                mum_client = MUMClient(**filtered_data)
+                db.add(mum_client)
+
+            elif destination == 'realtors' or destination == 'referral_partners':
+                # Create referral partner - ensure name exists
+                if 'name' not in data and ('first_name' in data or 'last_name' in data):
+                    first = data.pop('first_name', '')
+                    last = data.pop('last_name', '')
+                    data['name'] = f"{first} {last}".strip()
+
+                # Ensure name exists
+                if 'name' not in data:
+                    raise ValueError("Name is required for referral partners")
+
+                # Map common field variations
+                if 'company_name' in data and 'company' not in data:
+                    data['company'] = data.pop('company_name')
+                if 'partner_type' in data and 'type' not in data:
+                    data['type'] = data.pop('partner_type')
+
+                # Set default partner category
+                if 'partner_category' not in data:
+                    data['partner_category'] = 'individual'
+
+                # Filter out fields that don't exist in ReferralPartner model
+                valid_fields = {'name', 'company', 'type', 'phone', 'email', 'notes',
+                              'referrals_in', 'referrals_out', 'closed_loans', 'volume',
+                              'reciprocity_score', 'status', 'loyalty_tier', 'partner_category'}
+                filtered_data = {k: v for k, v in data.items() if k in valid_fields}
+
+                partner = ReferralPartner(**filtered_data)
+                db.add(partner)
+
+            elif destination == 'team_members' or destination == 'users':
+                # Create user/team member - ensure required fields
+                if 'email' not in data:
+                    raise ValueError("Email is required for team members")
+
+                # Build full name
+                if 'full_name' not in data and ('first_name' in data or 'last_name' in data):
+                    first = data.pop('first_name', '')
+                    last = data.pop('last_name', '')
+                    data['full_name'] = f"{first} {last}".strip()
+
+                # No password provided: the account gets the shared unusable hash
+                # and a one-time invitation token (issued in bulk after the loop)
+                if 'password' not in data and 'hashed_password' not in data:
+                    data['hashed_password'] = await password_hasher.unusable_hash()
+                    needs_invitation = True
+                elif 'password' in data:
+                    data['hashed_password'] = await password_hasher.hash(str(data.pop('password')))
+                    needs_invitation = False
+                else:
+                    needs_invitation = False
+
+                # Set default role
+                if 'role' not in data:
+                    data['role'] = 'loan_officer'
+
+                # Filter out fields that don't exist in User model
+                valid_fields = {'email', 'hashed_password', 'full_name', 'role',
+                              'branch_id', 'is_active', 'email_verified',
+                              'onboarding_completed', 'user_metadata'}
+                filtered_data = {k: v for k, v in data.items() if k in valid_fields}
+
+                # Check if user already exists
+                existing_user = db.query(User).filter(User.email == filtered_data['email']).first()
+                if existing_user:
+                    raise ValueError(f"User with email {filtered_data['email']} already exists")
+
+                user = User(**filtered_data)
+                db.add(user)
+                if needs_invitation:
+                    invited_users.append(user)
+
+            else:
+                raise ValueError(f"Invalid destination: {destination}. Supported: leads, loans, portfolio, realtors, team_members")
+
+            imported += 1
+
+        except Exception as e:
+            failed += 1
+            errors.append(f"Row {index + 1}: {str(e)}")
+
+    # Issue one-time password setup tokens for imported accounts in one batch
+    if invited_users:
+        db.flush()  # Assign user IDs
+        now = datetime.now(timezone.utc)
+        tokens = generate_invitation_tokens(len(invited_users))
+        db.add_all([
+            EmailVerificationToken(
+                user_id=user.id,
+                email=user.email,
+                token=token,
+                purpose="password_setup",
+                expires_at=now + timedelta(days=7),
+                created_at=now
+            )
+            for user, token in zip(invited_users, tokens)
+        ])
+
+    db.commit()
+
+    # Email the setup links only once the accounts and tokens are committed
+    invitations_sent = 0
+    if invited_users:
+        invitations_sent = await asyncio.to_thread(
+            send_invitations,
+            [(user.email, token, user.full_name) for user, token in zip(invited_users, tokens)]
+        )
+
+    return {
+        "total": len(df),
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "destination": destination,
+        "invitations_issued": len(invited_users),
+        "invitations_sent": invitations_sent
+    }
+
+
+def send_invitations(invitations: List[Tuple[str, str, str]]) -> int:
+    """
+    Email password setup links to invited accounts (blocking SMTP; run in a thread).
+
+    Args:
+        invitations: (email, setup token, full name) per account
+
+    Returns:
+        Number of emails sent. Unsent invitations can be re-sent through
+        /api/v1/resend-invitation; the accounts stay locked until a token is
+        redeemed.
+    """
+    from integrations.email_service import EmailService
+
+    email_service = EmailService()
+    sent = 0
+    for email, token, name in invitations:
+        if email_service.send_invitation_email(email, token, name):
+            sent += 1
+    if sent < len(invitations):
+        logger.warning(f"Sent {sent} of {len(invitations)} invitation emails")
+    return sent
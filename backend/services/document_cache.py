@@ -0,0 +1,104 @@
+"""
+Parsed Document Cache
+Caches onboarding document parse results by SHA-256 of the document bytes
+and parser version, so unchanged SOPs are never re-extracted or re-sent
+to the LLM.
+
+Entries live in the `parsed_document_cache` table. Eviction is LRU by
+`last_used_at`: entries unused for DOCUMENT_CACHE_TTL_DAYS are dropped,
+and the table is trimmed to DOCUMENT_CACHE_MAX_ENTRIES.
+"""
+import os
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Bump when the extraction prompt or the basic parser changes so old
+# results are no longer reused
+DOCUMENT_PARSER_VERSION = "onboarding-v1"
+
+DOCUMENT_CACHE_TTL_DAYS = int(os.getenv("DOCUMENT_CACHE_TTL_DAYS", "90"))
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", "5000"))
+
+
+def document_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def parser_version(mode: str) -> str:
+    """Version string for a parse mode ("gpt-4o", "basic", ...)"""
+    return f"{DOCUMENT_PARSER_VERSION}:{mode}"
+
+
+def _cache_key(content_hash: str, version: str) -> str:
+    return f"{content_hash}:{version}"
+
+
+def get_cached_parse(db: Session, content_hash: str, version: str) -> Optional[Dict[str, Any]]:
+    """Return a cached parse result and bump its LRU timestamp, or None"""
+    from main import ParsedDocumentCache
+
+    entry = db.query(ParsedDocumentCache).filter(
+        ParsedDocumentCache.cache_key == _cache_key(content_hash, version)
+    ).first()
+
+    if not entry:
+        return None
+
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_used_at = datetime.now(timezone.utc)
+    return entry.result
+
+
+def store_parse(db: Session, content_hash: str, version: str, filename: str, result: Dict[str, Any]):
+    """Store a parse result (caller commits)"""
+    from main import ParsedDocumentCache
+
+    key = _cache_key(content_hash, version)
+    entry = db.query(ParsedDocumentCache).filter(ParsedDocumentCache.cache_key == key).first()
+    now = datetime.now(timezone.utc)
+
+    if entry:
+        entry.result = result
+        entry.filename = filename
+        entry.last_used_at = now
+    else:
+        db.add(ParsedDocumentCache(
+            cache_key=key,
+            content_hash=content_hash,
+            parser_version=version,
+            filename=filename,
+            result=result,
+            hit_count=0,
+            created_at=now,
+            last_used_at=now
+        ))
+
+
+def evict_parsed_documents(db: Session) -> int:
+    """Drop stale entries and trim to the size limit. Returns number removed (caller commits)."""
+    from main import ParsedDocumentCache
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=DOCUMENT_CACHE_TTL_DAYS)
+    removed = db.query(ParsedDocumentCache).filter(
+        ParsedDocumentCache.last_used_at < cutoff
+    ).delete(synchronize_session=False)
+
+    overflow = db.query(ParsedDocumentCache).count() - DOCUMENT_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest_ids = [
+            row.id for row in db.query(ParsedDocumentCache.id)
+            .order_by(ParsedDocumentCache.last_used_at.asc())
+            .limit(overflow)
+        ]
+        removed += db.query(ParsedDocumentCache).filter(
+            ParsedDocumentCache.id.in_(oldest_ids)
+        ).delete(synchronize_session=False)
+
+    if removed:
+        logger.info(f"Evicted {removed} parsed document cache entries")
+    return removed
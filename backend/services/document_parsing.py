@@ -0,0 +1,147 @@
+"""
+Document Parsing Service
+Extracts text from uploaded onboarding documents (PDF, DOCX, TXT) in a
+process pool so CPU-bound PDF extraction never runs on the event loop.
+"""
+import os
+import io
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACT_TIMEOUT_SECONDS = 60
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.doc', '.txt')
+
+
+# ============================================================================
+# EXTRACTION (runs inside pool workers - keep these module-level/picklable)
+# ============================================================================
+
+def _extract_pdf(content: bytes) -> str:
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(content))
+    pages = [page.extract_text() or "" for page in reader.pages]
+    return "\n".join(pages)
+
+
+def _extract_docx(content: bytes) -> str:
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument(io.BytesIO(content))
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def extract_text(content: bytes, filename: str) -> str:
+    """Extract plain text from a document. Raises ValueError for unsupported types."""
+    name = filename.lower()
+    if name.endswith('.pdf'):
+        return _extract_pdf(content)
+    if name.endswith(('.docx', '.doc')):
+        return _extract_docx(content)
+    if name.endswith('.txt'):
+        return content.decode('utf-8')
+    raise ValueError(f"Unsupported file type: {filename}")
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class DocumentExtractor:
+    """Fans document text extraction out to a bounded process pool"""
+
+    def __init__(self, max_workers: Optional[int] = None, timeout_seconds: Optional[float] = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("DOCUMENT_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+        if timeout_seconds is None:
+            timeout_seconds = float(os.getenv("DOCUMENT_PARSE_TIMEOUT_SECONDS", DEFAULT_EXTRACT_TIMEOUT_SECONDS))
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # At most one submission per worker, so the timeout measures parsing
+        # time rather than time spent queued behind other documents
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"Document extraction pool started with {self.max_workers} workers")
+        return self._executor
+
+    async def extract(self, content: bytes, filename: str) -> Optional[str]:
+        """
+        Extract text from one document with a timeout.
+        Returns None (and logs) on unsupported types, errors or timeouts.
+        """
+        if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            logger.warning(f"Unsupported file type: {filename}")
+            return None
+
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        async with self._slots:
+            # One retry: a document whose pool was recycled for another file's timeout
+            for attempt in range(2):
+                executor = self.executor
+                future = loop.run_in_executor(executor, extract_text, content, filename)
+
+                try:
+                    return await asyncio.wait_for(future, timeout=self.timeout_seconds)
+                except asyncio.TimeoutError:
+                    logger.error(f"Text extraction timed out after {self.timeout_seconds}s: {filename}")
+                    self._recycle(executor)
+                except BrokenProcessPool:
+                    if attempt == 0 and executor is not self._executor:
+                        continue
+                    logger.error(f"Text extraction pool broke while reading {filename}")
+                    self._recycle(executor)
+                except Exception as e:
+                    logger.error(f"Failed to read {filename}: {e}")
+                return None
+        return None
+
+    async def extract_many(self, documents: List[Tuple[bytes, str]]) -> List[Optional[str]]:
+        """Extract all documents concurrently; results keep the input order"""
+        return await asyncio.gather(*(self.extract(content, name) for content, name in documents))
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """
+        Kill the workers of a pool and start over with a fresh one.
+
+        Cancelling the await doesn't stop a worker stuck in a pathological
+        file, so without this a few such uploads would hold every worker
+        and time out all later extractions. Other documents running in the
+        killed pool are retried once on the new pool.
+        """
+        if executor is not self._executor:
+            return  # Already replaced by a concurrent timeout
+        self._executor = None
+        terminate = getattr(executor, "terminate_workers", None)  # Python 3.14+
+        if terminate is not None:
+            terminate()
+        else:
+            # Killing a worker breaks the pool: everything still queued or
+            # running in it fails with BrokenProcessPool (retried above)
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False)
+        logger.warning("Document extraction pool recycled after a stuck extraction")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Document extraction pool stopped")
+
+
+# Global instance
+document_extractor = DocumentExtractor()
@@ -0,0 +1,269 @@
+"""
+DRE Worker
+Background worker for the Data Reconciliation Engine (DRE). Pulls unprocessed
+IncomingDataEvent rows in batches, runs classification and extraction
+concurrently (bounded by DRE_WORKER_CONCURRENCY), and commits the resulting
+ExtractedData rows in bulk.
+
+Batches are claimed with a conditional UPDATE (claim_token/claimed_at), so
+several app workers can run this loop against the same database without
+processing an event twice. Claims older than DRE_WORKER_CLAIM_TIMEOUT_SECONDS
+are considered abandoned (crashed worker or failed extraction) and picked up
+again, which doubles as retry backoff. Each claim counts as an attempt; an
+event that still fails after DRE_WORKER_MAX_ATTEMPTS is marked processed with
+its last_error and not retried again.
+"""
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CONCURRENCY = 8
+DEFAULT_POLL_SECONDS = 30
+DEFAULT_CLAIM_TIMEOUT_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class DREWorker:
+    """Claims, extracts and stores reconciliation events in batches"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("DRE_WORKER_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.concurrency = int(os.getenv("DRE_WORKER_CONCURRENCY", DEFAULT_CONCURRENCY))
+        self.poll_seconds = float(os.getenv("DRE_WORKER_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+        self.claim_timeout_seconds = int(
+            os.getenv("DRE_WORKER_CLAIM_TIMEOUT_SECONDS", DEFAULT_CLAIM_TIMEOUT_SECONDS)
+        )
+        self.max_attempts = int(os.getenv("DRE_WORKER_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.stats = {"batches": 0, "events": 0, "extracted": 0, "applied": 0, "errors": 0, "given_up": 0}
+
+    # ------------------------------------------------------------------
+    # Database steps (sync; run in a thread with their own session)
+    # ------------------------------------------------------------------
+
+    def _claim_batch(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """Claim up to batch_size unprocessed events. Returns (claim token, event payloads)."""
+        from sqlalchemy import func, or_
+        from main import SessionLocal, IncomingDataEvent
+
+        token = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        claimable = (
+            IncomingDataEvent.processed.is_(False),
+            # Also skips events whose last attempt crashed before it could be recorded as given up
+            or_(IncomingDataEvent.attempts.is_(None), IncomingDataEvent.attempts < self.max_attempts),
+            or_(
+                IncomingDataEvent.claimed_at.is_(None),
+                IncomingDataEvent.claimed_at < now - timedelta(seconds=self.claim_timeout_seconds)
+            )
+        )
+
+        db = SessionLocal()
+        try:
+            candidate_ids = [
+                row.id for row in db.query(IncomingDataEvent.id)
+                .filter(*claimable)
+                .order_by(IncomingDataEvent.id)
+                .limit(self.batch_size)
+            ]
+            if not candidate_ids:
+                return token, []
+
+            # Conditional update: rows another worker claimed in the meantime no longer match
+            db.query(IncomingDataEvent).filter(
+                IncomingDataEvent.id.in_(candidate_ids), *claimable
+            ).update(
+                {
+                    IncomingDataEvent.claim_token: token,
+                    IncomingDataEvent.claimed_at: now,
+                    IncomingDataEvent.attempts: func.coalesce(IncomingDataEvent.attempts, 0) + 1
+                },
+                synchronize_session=False
+            )
+            db.commit()
+
+            events = db.query(IncomingDataEvent).filter(IncomingDataEvent.claim_token == token).all()
+            return token, [
+                {
+                    "id": event.id,
+                    "content": event.raw_text or event.raw_html or "",
+                    "subject": event.subject or "",
+                    "sender": event.sender or "",
+                    "user_id": event.user_id,
+                }
+                for event in events
+            ]
+        finally:
+            db.close()
+
+    def _store_results(self, token: str, results: List[Tuple[int, Optional[Dict[str, Any]]]]) -> Dict[str, int]:
+        """Write ExtractedData for a claimed batch in one commit, then auto-apply"""
+        from main import (
+            SessionLocal, IncomingDataEvent, ExtractedData,
+            build_extracted_data, apply_extracted_data
+        )
+
+        db = SessionLocal()
+        counts = {"extracted": 0, "applied": 0, "errors": 0, "given_up": 0}
+        try:
+            event_ids = [event_id for event_id, _ in results]
+            events = {
+                event.id: event for event in db.query(IncomingDataEvent).filter(
+                    IncomingDataEvent.id.in_(event_ids),
+                    IncomingDataEvent.claim_token == token,
+                    IncomingDataEvent.processed.is_(False)
+                )
+            }
+            # Events already extracted through the on-demand endpoint
+            already_extracted = {
+                row.event_id for row in db.query(ExtractedData.event_id).filter(
+                    ExtractedData.event_id.in_(event_ids)
+                )
+            }
+
+            new_rows = []
+            for event_id, classification in results:
+                event = events.get(event_id)
+                if event is None:
+                    continue  # Claim lost (timed out and re-claimed) - the other worker owns it
+                if classification is None or classification["category"] == "error":
+                    # Extraction failed; the claim expires and the event is retried
+                    # later, until it runs out of attempts
+                    counts["errors"] += 1
+                    event.last_error = (classification or {}).get("error") or "Extraction failed"
+                    if (event.attempts or 0) >= self.max_attempts:
+                        event.processed = True
+                        counts["given_up"] += 1
+                        logger.error(
+                            f"DRE event {event_id} failed {event.attempts} extraction attempts, giving up: "
+                            f"{event.last_error}"
+                        )
+                    continue
+
+                if event_id not in already_extracted:
+                    extracted = build_extracted_data(event, classification, db)
+                    if extracted is not None:
+                        new_rows.append(extracted)
+                event.processed = True
+
+            db.add_all(new_rows)
+            db.commit()
+            counts["extracted"] = len(new_rows)
+
+            # Auto-apply high-confidence extractions; rows with nothing applicable go to review
+            auto_approved = [extracted for extracted in new_rows if extracted.status == "auto_approved"]
+            for extracted in auto_approved:
+                if apply_extracted_data(extracted, db):
+                    extracted.status = "applied"
+                    counts["applied"] += 1
+                else:
+                    extracted.status = "pending_review"
+            if auto_approved:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        return counts
+
+    # ------------------------------------------------------------------
+    # Batch processing
+    # ------------------------------------------------------------------
+
+    async def process_batch(self) -> int:
+        """Claim and process one batch. Returns the number of events claimed."""
+        from services.email_extraction import triage_email
+        from integrations.llm_scheduler import llm_scheduler, BATCH
+
+        token, events = await asyncio.to_thread(self._claim_batch)
+        if not events:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def triage(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    with llm_scheduler.context(priority=BATCH, tenant=event["user_id"]):
+                        return await triage_email(event["content"], event["subject"], event["sender"])
+                except Exception as e:
+                    logger.error(f"DRE extraction failed for event {event['id']}: {e}")
+                    return {"category": "error", "error": str(e)}
+
+        classifications = await asyncio.gather(*(triage(event) for event in events))
+        counts = await asyncio.to_thread(
+            self._store_results, token, [(event["id"], c) for event, c in zip(events, classifications)]
+        )
+
+        self.stats["batches"] += 1
+        self.stats["events"] += len(events)
+        for name, count in counts.items():
+            self.stats[name] += count
+        logger.info(
+            f"DRE batch: {len(events)} events, {counts['extracted']} extracted, "
+            f"{counts['applied']} auto-applied, {counts['errors']} failed, {counts['given_up']} given up"
+        )
+        return len(events)
+
+    async def drain(self):
+        """Process batches until the backlog is empty"""
+        while await self.process_batch() == self.batch_size:
+            pass
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def notify(self):
+        """Wake the worker now (called after new events are committed)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self._running:
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error(f"DRE worker error: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"DRE worker started (batch {self.batch_size}, concurrency {self.concurrency})"
+        )
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("DRE worker stopped")
+
+
+# Global instance
+dre_worker = DREWorker()
@@ -0,0 +1,245 @@
+"""
+Email Extraction Service
+AI classification and loan-field extraction for the Data Reconciliation
+Engine (DRE).
+
+triage_email() first tries the local rule-based pre-classifier
+(services/email_preclassifier.py) and only calls the LLM for ambiguous mail.
+classify_and_extract() does classification and extraction in one
+structured-output call on the fast model and only escalates to the stronger
+model when the fast one reports low confidence. The original two-step flow (classify_email_content, then
+extract_loan_fields) is kept for the offline evaluation harness in
+benchmarks/dre_eval.py.
+"""
+import os
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from integrations.llm_gateway import llm_gateway
+from services.email_preclassifier import email_preclassifier
+
+logger = logging.getLogger(__name__)
+
+DRE_FAST_MODEL = os.getenv("DRE_FAST_MODEL", "gpt-4o-mini")
+DRE_ESCALATION_MODEL = os.getenv("DRE_ESCALATION_MODEL", "gpt-4o")
+# Below this classification or average field confidence the email is re-run on the escalation model
+DRE_ESCALATION_CONFIDENCE = float(os.getenv("DRE_ESCALATION_CONFIDENCE", "0.7"))
+
+EMAIL_CATEGORIES = """- lead_update: New lead information or lead status changes
+- loan_update: Active loan milestone updates
+- rate_lock: Rate lock confirmations or expirations
+- appraisal: Appraisal scheduling or results
+- title: Title work, clear to close
+- insurance: HOI binders, insurance updates
+- closing: Closing date/time, CD delivery
+- document: Document receipt confirmations
+- portfolio: Servicing, escrow, tax updates
+- unrelated: Not mortgage-related"""
+
+LOAN_FIELDS = """- loan_number: string
+- borrower_name: string
+- property_address: string
+- loan_amount: float
+- rate: float (as decimal, e.g., 6.125)
+- rate_lock_date: ISO date
+- lock_expiration: ISO date
+- appraisal_date: ISO date
+- appraisal_value: float
+- closing_date: ISO datetime
+- milestone: string (e.g., "RateLocked", "AppraisalOrdered", "ClearToClose")
+- documents_received: list of strings
+- lender: string
+- realtor_name: string
+- title_company: string"""
+
+CLASSIFY_AND_EXTRACT_PROMPT = f"""You are an email classification and data extraction expert for mortgage loan processing.
+
+1. Classify the email into one category:
+{EMAIL_CATEGORIES}
+
+2. Unless the category is "unrelated", extract any of these loan fields that are present:
+{LOAN_FIELDS}
+
+Return JSON:
+{{"category": "...", "subcategory": "...", "confidence": 0.0-1.0,
+  "fields": {{"field_name": {{"value": actual_value, "confidence": 0.0-1.0}}}}}}
+
+Only include fields you found. Use an empty "fields" object for unrelated emails."""
+
+
+# ============================================================================
+# TWO-STEP FLOW (baseline for evaluation)
+# ============================================================================
+
+async def classify_email_content(content: str, subject: str) -> Dict[str, Any]:
+    """Use AI to classify email content and determine category"""
+
+    if not llm_gateway.openai_enabled:
+        return {"category": "unknown", "subcategory": "", "confidence": 0.0}
+
+    try:
+        response = await llm_gateway.chat(
+            model="gpt-4o-mini",
+            cache_site="email_classification",
+            messages=[
+                {
+                    "role": "system",
+                    "content": """You are an email classification expert for mortgage loan processing.
+
+Classify emails into categories:
+""" + EMAIL_CATEGORIES + """
+
+Return JSON: {"category": "...", "subcategory": "...", "confidence": 0.0-1.0}"""
+                },
+                {
+                    "role": "user",
+                    "content": f"Subject: {subject}\n\nContent: {content[:1000]}"
+                }
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.3
+        )
+
+        result = json.loads(response.choices[0].message.content)
+        return result
+    except Exception as e:
+        logger.error(f"Email classification error: {e}")
+        return {"category": "error", "subcategory": "", "confidence": 0.0}
+
+
+async def extract_loan_fields(content: str, category: str) -> Dict[str, Dict[str, Any]]:
+    """Extract structured loan fields from email content"""
+
+    if not llm_gateway.openai_enabled:
+        return {}
+
+    try:
+        response = await llm_gateway.chat(
+            model="gpt-4o",
+            cache_site="loan_extraction",
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"""Extract mortgage loan fields from this {category} email.
+
+Extract any present fields:
+{LOAN_FIELDS}
+
+For each field found, return:
+{{"field_name": {{"value": actual_value, "confidence": 0.0-1.0}}}}
+
+Return JSON object. Only include fields you found. Use null for missing."""
+                },
+                {
+                    "role": "user",
+                    "content": content[:2000]
+                }
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.2
+        )
+
+        fields = json.loads(response.choices[0].message.content)
+        return fields
+    except Exception as e:
+        logger.error(f"Field extraction error: {e}")
+        return {}
+
+
+# ============================================================================
+# SINGLE-CALL FLOW
+# ============================================================================
+
+def _clean_fields(fields: Any) -> Dict[str, Dict[str, Any]]:
+    """Drop missing/malformed fields so callers can rely on {"value", "confidence"} dicts"""
+    if not isinstance(fields, dict):
+        return {}
+    return {
+        name: field for name, field in fields.items()
+        if isinstance(field, dict) and field.get("value") is not None
+    }
+
+
+def average_field_confidence(fields: Dict[str, Dict[str, Any]]) -> float:
+    confidences = [field.get("confidence", 0.0) for field in fields.values()]
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+async def _classify_and_extract_with(model: str, content: str, subject: str) -> Optional[Dict[str, Any]]:
+    try:
+        response = await llm_gateway.chat(
+            model=model,
+            cache_site="email_triage",
+            messages=[
+                {"role": "system", "content": CLASSIFY_AND_EXTRACT_PROMPT},
+                {"role": "user", "content": f"Subject: {subject}\n\nContent: {content[:2000]}"}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.2
+        )
+        result = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        logger.error(f"Email classify/extract error ({model}): {e}")
+        return None
+
+    return {
+        "category": result.get("category", "unknown"),
+        "subcategory": result.get("subcategory", ""),
+        "confidence": float(result.get("confidence") or 0.0),
+        "fields": _clean_fields(result.get("fields")),
+        "model": model,
+    }
+
+
+def _needs_escalation(result: Dict[str, Any]) -> bool:
+    if result["confidence"] < DRE_ESCALATION_CONFIDENCE:
+        return True
+    if result["category"] != "unrelated" and result["fields"]:
+        return average_field_confidence(result["fields"]) < DRE_ESCALATION_CONFIDENCE
+    return False
+
+
+async def classify_and_extract(content: str, subject: str) -> Dict[str, Any]:
+    """
+    Classify an email and extract loan fields in one round trip.
+
+    Runs on DRE_FAST_MODEL; re-runs on DRE_ESCALATION_MODEL only when the
+    fast model's classification or field confidence is below
+    DRE_ESCALATION_CONFIDENCE.
+
+    Returns:
+        Dict with category, subcategory, confidence, fields
+        ({name: {"value", "confidence"}}), model and escalated
+    """
+    if not llm_gateway.openai_enabled:
+        return {"category": "unknown", "subcategory": "", "confidence": 0.0,
+                "fields": {}, "model": None, "escalated": False}
+
+    result = await _classify_and_extract_with(DRE_FAST_MODEL, content, subject)
+    escalated = False
+
+    if (result is None or _needs_escalation(result)) and DRE_ESCALATION_MODEL != DRE_FAST_MODEL:
+        stronger = await _classify_and_extract_with(DRE_ESCALATION_MODEL, content, subject)
+        if stronger is not None:
+            result = stronger
+            escalated = True
+
+    if result is None:
+        return {"category": "error", "subcategory": "", "confidence": 0.0,
+                "fields": {}, "model": None, "escalated": False}
+
+    result["escalated"] = escalated
+    return result
+
+
+async def triage_email(content: str, subject: str, sender: str = "") -> Dict[str, Any]:
+    """
+    Classify and extract an email, skipping the LLM when local rules and the
+    sender index are certain. Same result shape as classify_and_extract
+    (model is "rules" for short-circuited emails).
+    """
+    result = await email_preclassifier.preclassify(content, subject, sender)
+    if result is not None:
+        return result
+    return await classify_and_extract(content, subject)
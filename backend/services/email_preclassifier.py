@@ -0,0 +1,275 @@
+"""
+Email Pre-Classifier
+Fast local triage for the Data Reconciliation Engine (DRE). Compiled regex
+rules and a sender allow/deny index label the high-certainty bulk of inbound
+mail (LOS milestone notifications, rate lock confirmations, calendar notices,
+newsletters) without an LLM call. Anything ambiguous returns None and goes to
+the LLM as before.
+
+The sender index is learned from review outcomes: senders whose extractions
+users keep rejecting are denied (auto-labeled unrelated); senders whose
+extractions are approved without corrections are trusted, so a rule match
+from them is enough to auto-label, and only their rule-labelled fields are
+confident enough to be auto-applied.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RULE_CONFIDENCE = 0.95
+# build_extracted_data auto-approves above 0.85 average field confidence, and
+# apply_extracted_data only changes the loan stage above 0.90 milestone
+# confidence. Rule fields clear both only from trusted senders; everyone
+# else's go to review.
+TRUSTED_FIELD_CONFIDENCE = 0.95
+FIELD_CONFIDENCE = 0.8
+
+# Sender index thresholds
+MIN_REVIEWS = int(os.getenv("PRECLASSIFIER_MIN_REVIEWS", "3"))
+DENY_REJECT_RATIO = float(os.getenv("PRECLASSIFIER_DENY_REJECT_RATIO", "0.9"))
+ALLOW_CORRECTION_RATIO = float(os.getenv("PRECLASSIFIER_ALLOW_CORRECTION_RATIO", "0.1"))
+INDEX_TTL_SECONDS = int(os.getenv("PRECLASSIFIER_INDEX_TTL_SECONDS", "600"))
+
+# ============================================================================
+# RULES
+# ============================================================================
+
+LOAN_NUMBER = re.compile(
+    r"\bloan\s*(?:#|no\.?|number|num)\s*[:#]?\s*([A-Z0-9][A-Z0-9-]{4,19})\b", re.IGNORECASE
+)
+RATE = re.compile(r"\b(?:interest\s+)?rate\s*(?:of|:)?\s*(\d{1,2}\.\d{1,3})\s*%", re.IGNORECASE)
+
+MORTGAGE_TERMS = re.compile(
+    r"\b(loan|mortgage|borrower|escrow|appraisal|underwrit\w*|closing|pre-?approv\w*|title)\b",
+    re.IGNORECASE
+)
+
+# (category, subcategory, milestone, subject/body pattern) - first match wins
+CATEGORY_RULES = [
+    ("title", "clear_to_close", "ClearToClose",
+     re.compile(r"\bclear(ed)?\s+to\s+close\b|\bCTC\s+(issued|received)\b", re.IGNORECASE)),
+    ("rate_lock", "lock_confirmation", "RateLocked",
+     re.compile(r"\b(rate\s+)?lock\s+confirm(ation|ed)\b|\brate\s+locked\b", re.IGNORECASE)),
+    ("rate_lock", "lock_expiration", None,
+     re.compile(r"\b(rate\s+)?lock\s+(expir(ation|es|ing)|extension)\b", re.IGNORECASE)),
+    ("appraisal", "appraisal_update", "AppraisalOrdered",
+     re.compile(r"\bappraisal\s+(ordered|scheduled|received|completed|report)\b", re.IGNORECASE)),
+    ("closing", "closing_disclosure", None,
+     re.compile(r"\bclosing\s+disclosure\b|\bCD\s+(sent|delivered|acknowledged)\b", re.IGNORECASE)),
+    ("loan_update", "milestone", None,
+     re.compile(r"\b(conditional(ly)?\s+approv\w+|submitted\s+to\s+underwriting|loan\s+status\s+update)\b",
+                re.IGNORECASE)),
+]
+
+CALENDAR_SUBJECT = re.compile(
+    r"^\s*(accepted|declined|tentative|canceled|cancelled|updated invitation|invitation)\s*:", re.IGNORECASE
+)
+BULK_SENDER = re.compile(r"^(newsletter|news|marketing|promo\w*|digest|updates?|notifications?)@", re.IGNORECASE)
+UNSUBSCRIBE = re.compile(r"\bunsubscribe\b|\bmanage\s+(your\s+)?(email\s+)?preferences\b", re.IGNORECASE)
+
+
+# Shared mailbox providers are never denied as a whole domain
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "live.com", "icloud.com",
+    "aol.com", "msn.com", "me.com", "comcast.net", "protonmail.com",
+}
+
+
+def _sender_domain(sender: str) -> str:
+    return sender.rsplit("@", 1)[-1] if "@" in sender else ""
+
+
+def _labeled(category: str, subcategory: str, fields: Dict[str, Dict[str, Any]], rule: str) -> Dict[str, Any]:
+    return {
+        "category": category,
+        "subcategory": subcategory,
+        "confidence": RULE_CONFIDENCE,
+        "fields": fields,
+        "model": "rules",
+        "escalated": False,
+        "rule": rule,
+    }
+
+
+# ============================================================================
+# PRE-CLASSIFIER
+# ============================================================================
+
+class EmailPreClassifier:
+    """Rule + sender-index triage in front of the DRE LLM call"""
+
+    def __init__(self):
+        self.enabled = os.getenv("PRECLASSIFIER_ENABLED", "true").lower() == "true"
+        self.denied_senders: Set[str] = set()
+        self.denied_domains: Set[str] = set()
+        self.trusted_senders: Set[str] = set()
+        self._index_built_at = 0.0
+        self._rebuild_lock = asyncio.Lock()
+        self._stats = defaultdict(int)
+
+    # ------------------------------------------------------------------
+    # Sender index
+    # ------------------------------------------------------------------
+
+    def rebuild_index(self):
+        """
+        Learn sender allow/deny sets from reviewed extractions.
+
+        A sender is denied when at least MIN_REVIEWS of its extractions were
+        reviewed and DENY_REJECT_RATIO of them were rejected. It is trusted when
+        they were approved with corrections on at most ALLOW_CORRECTION_RATIO of
+        them. Domains are denied on the same rule over all their senders.
+        """
+        from sqlalchemy import func, distinct
+        from main import SessionLocal, IncomingDataEvent, ExtractedData, AITrainingEvent
+
+        db = SessionLocal()
+        try:
+            outcomes = db.query(
+                IncomingDataEvent.sender,
+                ExtractedData.status,
+                func.count(ExtractedData.id)
+            ).join(
+                ExtractedData, ExtractedData.event_id == IncomingDataEvent.id
+            ).filter(
+                IncomingDataEvent.sender.isnot(None),
+                ExtractedData.status.in_(("approved", "applied", "rejected"))
+            ).group_by(IncomingDataEvent.sender, ExtractedData.status).all()
+
+            corrected = dict(db.query(
+                IncomingDataEvent.sender,
+                func.count(distinct(AITrainingEvent.extracted_data_id))
+            ).join(
+                ExtractedData, ExtractedData.event_id == IncomingDataEvent.id
+            ).join(
+                AITrainingEvent, AITrainingEvent.extracted_data_id == ExtractedData.id
+            ).filter(
+                AITrainingEvent.label == "corrected"
+            ).group_by(IncomingDataEvent.sender).all())
+        finally:
+            db.close()
+
+        senders = defaultdict(lambda: {"approved": 0, "rejected": 0})
+        domains = defaultdict(lambda: {"approved": 0, "rejected": 0})
+        for sender, status, count in outcomes:
+            key = "rejected" if status == "rejected" else "approved"
+            sender = sender.strip().lower()
+            senders[sender][key] += count
+            domains[_sender_domain(sender)][key] += count
+
+        def denied(counts):
+            reviewed = counts["approved"] + counts["rejected"]
+            return reviewed >= MIN_REVIEWS and counts["rejected"] / reviewed >= DENY_REJECT_RATIO
+
+        corrected = {sender.strip().lower(): count for sender, count in corrected.items() if sender}
+        self.denied_senders = {sender for sender, counts in senders.items() if denied(counts)}
+        self.denied_domains = {
+            domain for domain, counts in domains.items()
+            if domain and domain not in FREE_MAIL_DOMAINS and denied(counts)
+        }
+        self.trusted_senders = {
+            sender for sender, counts in senders.items()
+            if counts["approved"] >= MIN_REVIEWS
+            and counts["rejected"] == 0
+            and corrected.get(sender, 0) / counts["approved"] <= ALLOW_CORRECTION_RATIO
+        }
+        self._index_built_at = time.time()
+        logger.info(
+            f"Pre-classifier sender index: {len(self.denied_senders)} denied senders, "
+            f"{len(self.denied_domains)} denied domains, {len(self.trusted_senders)} trusted senders"
+        )
+
+    async def _ensure_index(self):
+        if time.time() - self._index_built_at < INDEX_TTL_SECONDS:
+            return
+        async with self._rebuild_lock:
+            if time.time() - self._index_built_at < INDEX_TTL_SECONDS:
+                return
+            try:
+                await asyncio.to_thread(self.rebuild_index)
+            except Exception as e:
+                # Keep the previous index; retry after the TTL
+                self._index_built_at = time.time()
+                logger.warning(f"Pre-classifier sender index rebuild failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Classification
+    # ------------------------------------------------------------------
+
+    def classify(self, content: str, subject: str, sender: str) -> Optional[Dict[str, Any]]:
+        """
+        Label an email from rules and the current sender index.
+        Returns a classify_and_extract-shaped result, or None when ambiguous.
+        """
+        sender = (sender or "").strip().lower()
+        text = f"{subject}\n{content}"
+
+        # Unrelated: denied senders, calendar notices, bulk mail without mortgage terms
+        if sender and (sender in self.denied_senders or _sender_domain(sender) in self.denied_domains):
+            return _labeled("unrelated", "denied_sender", {}, "denied_sender")
+        if CALENDAR_SUBJECT.search(subject or ""):
+            return _labeled("unrelated", "calendar", {}, "calendar_notice")
+        if (BULK_SENDER.search(sender) or UNSUBSCRIBE.search(content)) and not MORTGAGE_TERMS.search(text):
+            return _labeled("unrelated", "bulk", {}, "bulk_mail")
+
+        # Mortgage notifications: a category rule plus a loan number (or a trusted sender)
+        trusted = sender in self.trusted_senders
+        confidence = TRUSTED_FIELD_CONFIDENCE if trusted else FIELD_CONFIDENCE
+        loan_number = LOAN_NUMBER.search(text)
+        for category, subcategory, milestone, pattern in CATEGORY_RULES:
+            if not pattern.search(text):
+                continue
+            if not loan_number and not trusted:
+                return None  # Right topic but nothing to match on - let the LLM extract
+
+            fields = {}
+            if loan_number:
+                fields["loan_number"] = {"value": loan_number.group(1).upper(), "confidence": confidence}
+            # Milestones come from the subject only: a body hit may be a
+            # question ("are we clear to close?") or a quoted reply chain
+            if milestone and pattern.search(subject):
+                fields["milestone"] = {"value": milestone, "confidence": confidence}
+            rate = RATE.search(text)
+            if rate and category == "rate_lock":
+                fields["rate"] = {"value": float(rate.group(1)), "confidence": confidence}
+            return _labeled(category, subcategory, fields, f"{category}:{subcategory}")
+
+        return None
+
+    async def preclassify(self, content: str, subject: str, sender: str) -> Optional[Dict[str, Any]]:
+        """classify() with a fresh-enough sender index; records hit/miss metrics"""
+        if not self.enabled:
+            return None
+
+        await self._ensure_index()
+        result = self.classify(content or "", subject or "", sender or "")
+
+        if result is None:
+            self._stats["llm_fallbacks"] += 1
+        else:
+            self._stats["rule_hits"] += 1
+            self._stats[f"rule:{result['rule']}"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._stats["rule_hits"] + self._stats["llm_fallbacks"]
+        return {
+            "enabled": self.enabled,
+            "rule_hits": self._stats["rule_hits"],
+            "llm_fallbacks": self._stats["llm_fallbacks"],
+            "short_circuit_rate": round(self._stats["rule_hits"] / total, 4) if total else 0.0,
+            "rules": {name[5:]: count for name, count in self._stats.items() if name.startswith("rule:")},
+            "denied_senders": len(self.denied_senders),
+            "denied_domains": len(self.denied_domains),
+            "trusted_senders": len(self.trusted_senders),
+        }
+
+
+# Global instance
+email_preclassifier = EmailPreClassifier()
@@ -0,0 +1,202 @@
+"""
+Overdue Task Sweeper
+Finds Task and AITask rows that became overdue since the last sweep and
+emits a TASK_OVERDUE event for each, in batches.
+
+Each sweep only reads the slice of the (status, due_date) / (type, due_date)
+indexes between the previous watermark and now - the tasks whose deadline
+passed since the last run - so its cost doesn't grow with the task table.
+A batch sets overdue_notified_at and writes its events to the agent_events
+outbox in the same transaction, so an event fires once even if a sweep is
+interrupted and the range is scanned again. The watermark (JobWatermark) only
+advances once its whole range has been swept.
+
+Changing a task's due date clears overdue_notified_at (see listen()), so a
+rescheduled task fires again when its new deadline passes. Tasks created or
+moved to a due date already behind the watermark are caught by a second pass
+over rows updated since the last sweep. The first sweep looks back
+OVERDUE_SWEEP_LOOKBACK_HOURS.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "overdue_task_sweep"
+OPEN_TASK_STATUSES = ("pending", "in_progress")
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_LOOKBACK_HOURS = 24
+
+
+class OverdueTaskSweeper:
+    """Emits TASK_OVERDUE for tasks whose due date passed since the last sweep"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("OVERDUE_SWEEP_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.lookback_hours = float(os.getenv("OVERDUE_SWEEP_LOOKBACK_HOURS", DEFAULT_LOOKBACK_HOURS))
+        self.stats = {"sweeps": 0, "emitted": 0}
+        self._listening = False
+
+    # ------------------------------------------------------------------
+    # Database steps (sync; run in a thread with their own session)
+    # ------------------------------------------------------------------
+
+    def _sources(self) -> List[Tuple[str, Any, Any, Any]]:
+        """(entity type, model, open-status filter, assignee column) per task table"""
+        from main import Task, AITask, TaskType
+
+        return [
+            ("task", Task, Task.status.in_(OPEN_TASK_STATUSES), Task.owner_id),
+            ("ai_task", AITask, AITask.type.in_([t for t in TaskType if t != TaskType.COMPLETED]), AITask.assigned_to_id),
+        ]
+
+    def _load_watermark(self) -> datetime:
+        from main import SessionLocal, JobWatermark
+
+        db = SessionLocal()
+        try:
+            row = db.query(JobWatermark).filter(JobWatermark.name == WATERMARK_NAME).first()
+        finally:
+            db.close()
+
+        if row is None:
+            return datetime.now(timezone.utc) - timedelta(hours=self.lookback_hours)
+        return row.watermark if row.watermark.tzinfo else row.watermark.replace(tzinfo=timezone.utc)
+
+    def _save_watermark(self, watermark: datetime):
+        from main import SessionLocal, JobWatermark
+
+        db = SessionLocal()
+        try:
+            row = db.query(JobWatermark).filter(JobWatermark.name == WATERMARK_NAME).first()
+            if row is None:
+                row = JobWatermark(name=WATERMARK_NAME)
+                db.add(row)
+            row.watermark = watermark
+            db.commit()
+        finally:
+            db.close()
+
+    def _sweep_batch(
+        self, source: Tuple[str, Any, Any, Any], since: datetime, until: datetime, updated: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Mark up to batch_size tasks that fell due in (since, until] - or, with
+        `updated`, tasks updated since `since` that were already due by then -
+        and return their event payloads. With the database event bus the
+        events are written in the same commit as the markers.
+        """
+        from main import SessionLocal
+        from agents.events import get_event_bus, task_overdue_event
+
+        entity_type, model, is_open, assignee = source
+        event_bus = get_event_bus()
+        now = datetime.now(timezone.utc)
+
+        db = SessionLocal()
+        try:
+            if updated:
+                window = (model.updated_at > since, model.due_date <= since)
+                order = (model.updated_at, model.id)
+            else:
+                window = (model.due_date > since, model.due_date <= until)
+                order = (model.due_date, model.id)
+            query = db.query(model).filter(
+                is_open,
+                *window,
+                model.overdue_notified_at.is_(None)
+            ).order_by(*order).limit(self.batch_size)
+            if db.bind.dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            tasks = query.all()
+
+            events = []
+            for task in tasks:
+                task.overdue_notified_at = now
+                events.append(task_overdue_event(
+                    task.id,
+                    lead_id=task.lead_id,
+                    loan_id=task.loan_id,
+                    assigned_to_id=getattr(task, assignee.key),
+                    entity_type=entity_type,
+                    due_date=task.due_date
+                ))
+            if events and event_bus.durable:
+                event_bus.add_to_outbox(db, events)
+            db.commit()
+            return [event.model_dump() for event in events]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Sweep
+    # ------------------------------------------------------------------
+
+    async def sweep(self) -> int:
+        """Emit TASK_OVERDUE for every task that fell due since the last sweep. Returns events emitted."""
+        from agents.events import get_event_bus, Event
+
+        event_bus = get_event_bus()
+        since = await asyncio.to_thread(self._load_watermark)
+        until = datetime.now(timezone.utc)
+
+        emitted = 0
+        passes = [(source, updated) for source in self._sources() for updated in (False, True)]
+        for source, updated in passes:
+            while True:
+                payloads = await asyncio.to_thread(self._sweep_batch, source, since, until, updated)
+                if event_bus.durable:
+                    if payloads:
+                        event_bus.notify()
+                else:
+                    for payload in payloads:
+                        event = Event(**payload)
+                        await event_bus.emit(
+                            event_type=event.event_type,
+                            entity_type=event.entity_type,
+                            entity_id=event.entity_id,
+                            data=event.data,
+                            source=event.source,
+                            tenant_id=event.tenant_id
+                        )
+                emitted += len(payloads)
+                if len(payloads) < self.batch_size:
+                    break
+
+        await asyncio.to_thread(self._save_watermark, until)
+        self.stats["sweeps"] += 1
+        self.stats["emitted"] += emitted
+        if emitted:
+            logger.info(f"Overdue sweep: {emitted} TASK_OVERDUE events for tasks due {since:%Y-%m-%d %H:%M} - {until:%H:%M}")
+        return emitted
+
+    # ------------------------------------------------------------------
+    # Rescheduling
+    # ------------------------------------------------------------------
+
+    def listen(self):
+        """Clear overdue_notified_at whenever a task's due date changes, so it can fire again"""
+        if self._listening:
+            return
+        from sqlalchemy import event
+        from main import Task, AITask
+
+        def _rearm(target, value, oldvalue, initiator):
+            if value != oldvalue:
+                target.overdue_notified_at = None
+
+        for model in (Task, AITask):
+            event.listen(model.due_date, "set", _rearm)
+
+        self._listening = True
+
+
+# Global instance
+overdue_sweeper = OverdueTaskSweeper()
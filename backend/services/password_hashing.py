@@ -0,0 +1,84 @@
+"""
+Password Hashing Service
+Runs bcrypt off the event loop in a bounded thread pool.
+
+bcrypt is deliberately slow (~100-300ms per hash) and releases the GIL
+while it works, so a small thread pool keeps it from freezing every other
+request on the worker while still capping how many CPU cores it can take.
+"""
+import os
+import asyncio
+import logging
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """Shared bcrypt context with an async API backed by a bounded pool"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.max_workers = max_workers or int(
+            os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._unusable_hash: Optional[str] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash"
+            )
+            logger.info(f"Password hashing pool started with {self.max_workers} workers")
+        return self._executor
+
+    # Synchronous API (scripts, sample data, startup code)
+
+    def hash_sync(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify_sync(self, plain: str, hashed: str) -> bool:
+        return self.context.verify(plain, hashed)
+
+    # Async API (request handlers)
+
+    async def hash(self, password: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.context.hash, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.context.verify, plain, hashed)
+
+    async def unusable_hash(self) -> str:
+        """
+        A valid bcrypt hash of a random secret that is discarded immediately.
+
+        Accounts that are set up through an invitation token (imports, team
+        member invites) need a non-null `hashed_password` that nobody can log
+        in with. It is computed once per process and shared by all of them.
+        """
+        if self._unusable_hash is None:
+            self._unusable_hash = await self.hash(secrets.token_urlsafe(32))
+        return self._unusable_hash
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            logger.info("Password hashing pool stopped")
+
+
+def generate_invitation_tokens(count: int) -> list:
+    """Generate `count` one-time invitation/password-setup tokens"""
+    return [secrets.token_urlsafe(32) for _ in range(count)]
+
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,132 @@
+"""
+Pipeline Review Fan-out
+Shards the daily pipeline review into one DAILY_PIPELINE_REVIEW event per
+user instead of a single unscoped event, so each pipeline_ops run has a
+bounded workload. Events are spread with random jitter over
+PIPELINE_REVIEW_WINDOW_MINUTES and run by the event bus worker pool (with
+its per-tenant and per-agent limits) rather than all at once.
+
+Users whose pipeline hasn't changed since their last review are skipped.
+The change watermark is the newest updated_at across a user's leads and
+loans - a max() per user served from the (owner_id, updated_at) and
+(loan_officer_id, updated_at) indexes - compared with the watermark stored
+in PipelineReview when the previous review was queued.
+"""
+import os
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MINUTES = 120
+
+
+def _as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def changed_pipelines() -> List[Tuple[int, datetime, Optional[datetime]]]:
+    """
+    Active users whose leads or loans changed since their last review.
+    Returns (user_id, change watermark, previous watermark or None).
+    """
+    from sqlalchemy import func, select
+    from main import SessionLocal, User, Lead, Loan, PipelineReview
+
+    lead_mark = select(func.max(Lead.updated_at)).where(Lead.owner_id == User.id).scalar_subquery()
+    loan_mark = select(func.max(Loan.updated_at)).where(Loan.loan_officer_id == User.id).scalar_subquery()
+
+    db = SessionLocal()
+    try:
+        rows = db.query(User.id, lead_mark, loan_mark, PipelineReview.reviewed_through).outerjoin(
+            PipelineReview, PipelineReview.user_id == User.id
+        ).filter(User.is_active.is_(True)).all()
+    finally:
+        db.close()
+
+    changed = []
+    for user_id, lead_changed, loan_changed, reviewed_through in rows:
+        marks = [_as_utc(mark) for mark in (lead_changed, loan_changed) if mark is not None]
+        if not marks:
+            continue  # Empty pipeline
+        watermark, previous = max(marks), _as_utc(reviewed_through)
+        if previous is None or watermark > previous:
+            changed.append((user_id, watermark, previous))
+    return changed
+
+
+def record_watermarks(queued: List[Tuple[int, datetime]]):
+    """Store the watermark each queued review covers"""
+    from main import SessionLocal, PipelineReview
+
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        existing = {
+            review.user_id: review for review in db.query(PipelineReview).filter(
+                PipelineReview.user_id.in_([user_id for user_id, _ in queued])
+            )
+        }
+        for user_id, watermark in queued:
+            review = existing.get(user_id)
+            if review is None:
+                review = PipelineReview(user_id=user_id)
+                db.add(review)
+            review.reviewed_through = watermark
+            review.scheduled_at = now
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def schedule_pipeline_reviews() -> int:
+    """
+    Queue a jittered DAILY_PIPELINE_REVIEW event for every user whose
+    pipeline changed since their last review. Returns the number queued.
+
+    Watermarks are written after the events, so a crash in between means a
+    repeated review rather than a skipped one.
+    """
+    from agents.events import get_event_bus, EventType
+
+    window_seconds = 60 * float(os.getenv("PIPELINE_REVIEW_WINDOW_MINUTES", DEFAULT_WINDOW_MINUTES))
+    event_bus = get_event_bus()
+    today = datetime.now(timezone.utc).date().isoformat()
+
+    changed = await asyncio.to_thread(changed_pipelines)
+    queued = []
+    for user_id, watermark, previous in changed:
+        try:
+            await event_bus.emit(
+                event_type=EventType.DAILY_PIPELINE_REVIEW,
+                entity_type="user",
+                entity_id=user_id,
+                data={
+                    "user_id": user_id,
+                    "date": today,
+                    "changed_since": previous.isoformat() if previous else "first review",
+                    "trigger": "scheduled"
+                },
+                source="scheduler",
+                tenant_id=user_id,
+                delay_seconds=random.uniform(0, window_seconds)
+            )
+            queued.append((user_id, watermark))
+        except Exception as e:
+            logger.warning(f"Could not queue pipeline review for user {user_id}: {e}")
+
+    if queued:
+        await asyncio.to_thread(record_watermarks, queued)
+    logger.info(
+        f"Queued {len(queued)} pipeline reviews over {window_seconds / 60:.0f} min "
+        f"({len(changed)} users with changes)"
+    )
+    return len(queued)
@@ -0,0 +1,145 @@
+"""
+Upload Store
+Content-addressed temporary storage for data-import uploads.
+
+The import wizard analyzes a file first and executes the import later.
+Instead of uploading (and parsing) the same file twice, `analyze` stores
+the raw bytes here and hands the client an `upload_id` that `execute`
+accepts in place of a second upload.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 60 * 60  # 1 hour is plenty for the analyze -> execute round trip
+
+
+class UploadStore:
+    """Stores uploads on disk keyed by the SHA-256 of their content"""
+
+    def __init__(self, directory: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self.directory = directory or os.getenv(
+            "UPLOAD_STORE_DIR",
+            os.path.join(tempfile.gettempdir(), "mortgage_crm_uploads")
+        )
+        self.ttl_seconds = ttl_seconds or int(os.getenv("UPLOAD_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.directory, f"{upload_id}.bin"),
+            os.path.join(self.directory, f"{upload_id}.json"),
+        )
+
+    @staticmethod
+    def _is_valid_id(upload_id: str) -> bool:
+        return len(upload_id) == 64 and all(c in "0123456789abcdef" for c in upload_id)
+
+    def put(self, content: bytes, filename: str, owner_id: int) -> str:
+        """
+        Store an upload and return its handle.
+        Identical content is stored once; each owner is recorded so handles
+        cannot be redeemed by other users.
+        """
+        self.purge_expired()
+
+        upload_id = hashlib.sha256(content).hexdigest()
+        data_path, meta_path = self._paths(upload_id)
+
+        meta = self._read_meta(meta_path) or {"owners": {}}
+        if not os.path.exists(data_path):
+            tmp_path = f"{data_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, data_path)
+
+        meta["size"] = len(content)
+        meta["owners"][str(owner_id)] = {"filename": filename, "stored_at": time.time()}
+        self._write_meta(meta_path, meta)
+
+        logger.info(f"Stored upload {upload_id[:12]} ({len(content)} bytes) for user {owner_id}")
+        return upload_id
+
+    def get(self, upload_id: str, owner_id: int) -> Optional[Tuple[bytes, str]]:
+        """
+        Return (content, filename) for a handle, or None if it is unknown,
+        expired, or belongs to another user.
+        """
+        if not upload_id or not self._is_valid_id(upload_id):
+            return None
+
+        data_path, meta_path = self._paths(upload_id)
+        meta = self._read_meta(meta_path)
+        if not meta or not os.path.exists(data_path):
+            return None
+
+        owner = meta.get("owners", {}).get(str(owner_id))
+        if not owner or time.time() - owner["stored_at"] > self.ttl_seconds:
+            return None
+
+        with open(data_path, "rb") as f:
+            content = f.read()
+
+        return content, owner["filename"]
+
+    def purge_expired(self) -> int:
+        """Delete uploads whose owners have all expired. Returns number removed."""
+        removed = 0
+        now = time.time()
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+
+            upload_id = name[:-5]
+            data_path, meta_path = self._paths(upload_id)
+            meta = self._read_meta(meta_path)
+            owners = (meta or {}).get("owners", {})
+            live = {k: v for k, v in owners.items() if now - v["stored_at"] <= self.ttl_seconds}
+
+            if live:
+                if len(live) != len(owners):
+                    meta["owners"] = live
+                    self._write_meta(meta_path, meta)
+                continue
+
+            for path in (data_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+
+        if removed:
+            logger.info(f"Purged {removed} expired uploads")
+        return removed
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Optional[dict]:
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: dict):
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+
+# Global instance
+upload_store = UploadStore()
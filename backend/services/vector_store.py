@@ -0,0 +1,514 @@
+"""
+Vector Store
+Embedding-backed retrieval over AgentMemory. Memories are written without
+an embedding and picked up by a background embedder, which embeds them in
+batches (one API call per batch) at batch LLM priority.
+
+Two backends, chosen at startup:
+- pgvector: an `embedding vector(N)` column on agent_memory with an HNSW
+  index, queried with ORDER BY embedding <=> :query LIMIT k.
+- numpy: float32 vectors stored base64-encoded in `embedding_vector`, loaded
+  per namespace into an in-process index. Brute force for small
+  namespaces, IVF (k-means lists, probing the nearest few) once a namespace
+  passes VECTOR_IVF_THRESHOLD. Used on SQLite, without the extension, and in tests.
+
+Both keep search sublinear as memories grow: HNSW on Postgres, IVF in process.
+A namespace is an (agent_type, memory_type) pair.
+
+The embedder claims batches with a conditional UPDATE (claim_token/claimed_at),
+so every API replica can run it without embedding a row twice. Claims older
+than VECTOR_EMBED_CLAIM_TIMEOUT_SECONDS (crashed replica, failed API call)
+are picked up again.
+"""
+import os
+import math
+import uuid
+import base64
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+
+DEFAULT_EMBED_BATCH_SIZE = 100
+DEFAULT_EMBED_POLL_SECONDS = 60
+DEFAULT_EMBED_CLAIM_TIMEOUT_SECONDS = 300
+DEFAULT_LOAD_OVERLAP_SECONDS = 300
+DEFAULT_IVF_THRESHOLD = 20000
+DEFAULT_IVF_PROBES = 8
+QUERY_CACHE_ENTRIES = 256
+
+Namespace = Tuple[str, str]
+
+
+def encode_vector(vector: Sequence[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vector(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+# ============================================================================
+# IN-PROCESS INDEX
+# ============================================================================
+
+class NumpyIndex:
+    """Cosine-similarity index over normalized float32 vectors (brute force, then IVF)"""
+
+    ASSIGN_CHUNK = 65536
+
+    def __init__(self, ivf_threshold: int = DEFAULT_IVF_THRESHOLD, probes: int = DEFAULT_IVF_PROBES):
+        self.ivf_threshold = ivf_threshold
+        self.probes = probes
+        self.ids = np.empty(0, dtype=np.int64)
+        self._id_set = set()
+        self.vectors = np.empty((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, memory_id: int) -> bool:
+        return memory_id in self._id_set
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + self.ASSIGN_CHUNK] @ self.centroids.T, axis=1)
+            for start in range(0, len(vectors), self.ASSIGN_CHUNK)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """Spherical k-means with ~sqrt(n) lists, fitted on a sample"""
+        n = len(self.ids)
+        nlist = max(1, int(math.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self.centroids = centroids
+        assignment = self._assign(self.vectors)
+        self.lists = [np.flatnonzero(assignment == c) for c in range(nlist)]
+        self._trained_size = n
+        logger.info(f"Vector index trained: {n} vectors in {nlist} lists")
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """Add vectors; ids already in the index are skipped"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        new = [i for i, memory_id in enumerate(ids) if memory_id not in self._id_set]
+        if not new:
+            return
+        ids = [ids[i] for i in new]
+        vectors = _normalize(vectors[new])
+        self._id_set.update(ids)
+        offset = len(self.ids)
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.vectors = np.vstack([self.vectors, vectors])
+
+        if len(self.ids) >= self.ivf_threshold and len(self.ids) >= 2 * self._trained_size:
+            self.train()  # First time past the threshold, or the index doubled since the last fit
+        elif self.centroids is not None:
+            assignment = self._assign(vectors)
+            for c in np.unique(assignment):
+                self.lists[c] = np.concatenate([self.lists[c], offset + np.flatnonzero(assignment == c)])
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if not len(self.ids):
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+
+        if self.centroids is None:
+            candidates = None
+            scores = self.vectors @ query
+        else:
+            probes = _top_k(self.centroids @ query, self.probes)
+            candidates = np.concatenate([self.lists[c] for c in probes])
+            scores = self.vectors[candidates] @ query
+
+        top = _top_k(scores, k)
+        rows = top if candidates is None else candidates[top]
+        return [(int(self.ids[row]), float(score)) for row, score in zip(rows, scores[top])]
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class VectorStore:
+    """AgentMemory writes, batch embedding and top-k retrieval"""
+
+    def __init__(self):
+        self.requested_backend = os.getenv("VECTOR_BACKEND", "auto")  # auto, pgvector, numpy
+        self.backend = "numpy"
+        self.embed_batch_size = int(os.getenv("VECTOR_EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE))
+        self.embed_poll_seconds = float(os.getenv("VECTOR_EMBED_POLL_SECONDS", DEFAULT_EMBED_POLL_SECONDS))
+        self.embed_claim_timeout_seconds = float(
+            os.getenv("VECTOR_EMBED_CLAIM_TIMEOUT_SECONDS", DEFAULT_EMBED_CLAIM_TIMEOUT_SECONDS)
+        )
+        # How far before the newest loaded embedded_at each load looks again:
+        # a batch stamped earlier can commit later (another replica, clock skew)
+        self.load_overlap_seconds = float(os.getenv("VECTOR_LOAD_OVERLAP_SECONDS", DEFAULT_LOAD_OVERLAP_SECONDS))
+        self.ivf_threshold = int(os.getenv("VECTOR_IVF_THRESHOLD", DEFAULT_IVF_THRESHOLD))
+        self.ivf_probes = int(os.getenv("VECTOR_IVF_PROBES", DEFAULT_IVF_PROBES))
+
+        self._indexes: Dict[Namespace, NumpyIndex] = {}
+        self._loaded_through: Dict[Namespace, datetime] = {}
+        self._index_lock = asyncio.Lock()
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.stats = {"embedded": 0, "searches": 0, "embed_errors": 0}
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+
+    def setup(self):
+        """Pick the backend; on Postgres, create the vector column and HNSW index if possible"""
+        from sqlalchemy import text
+        from main import engine, DATABASE_URL
+
+        if self.requested_backend == "numpy" or DATABASE_URL.startswith("sqlite"):
+            self.backend = "numpy"
+            logger.info("Vector store: in-process NumPy index")
+            return
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+                conn.execute(text(
+                    f"ALTER TABLE agent_memory ADD COLUMN IF NOT EXISTS embedding vector({EMBEDDING_DIMENSIONS})"
+                ))
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_agent_memory_embedding_hnsw "
+                    "ON agent_memory USING hnsw (embedding vector_cosine_ops)"
+                ))
+            self.backend = "pgvector"
+            logger.info("Vector store: pgvector with HNSW index")
+        except Exception as e:
+            if self.requested_backend == "pgvector":
+                raise
+            self.backend = "numpy"
+            logger.warning(f"pgvector unavailable, using in-process NumPy index: {e}")
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(
+        self,
+        db,
+        agent_type: str,
+        memory_type: str,
+        content: str,
+        meta_data: Optional[Dict[str, Any]] = None,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[int] = None
+    ):
+        """
+        Stage a memory on `db` (the caller commits). `content` is the text that
+        is embedded and matched against queries; put payloads in meta_data.
+        """
+        from main import AgentMemory
+
+        memory = AgentMemory(
+            agent_type=agent_type,
+            memory_type=memory_type,
+            content=content,
+            meta_data=meta_data,
+            entity_type=entity_type,
+            entity_id=entity_id
+        )
+        db.add(memory)
+        return memory
+
+    def _claim_pending(self) -> Tuple[str, List[Tuple[int, str]]]:
+        """Claim up to a batch of unembedded memories. Returns (claim token, [(id, content)])."""
+        from sqlalchemy import or_
+        from main import SessionLocal, AgentMemory
+
+        token = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        claimable = (
+            AgentMemory.embedded_at.is_(None),
+            or_(
+                AgentMemory.claimed_at.is_(None),
+                AgentMemory.claimed_at < now - timedelta(seconds=self.embed_claim_timeout_seconds)
+            )
+        )
+
+        db = SessionLocal()
+        try:
+            candidate_ids = [
+                row.id for row in db.query(AgentMemory.id)
+                .filter(*claimable)
+                .order_by(AgentMemory.id)
+                .limit(self.embed_batch_size)
+            ]
+            if not candidate_ids:
+                return token, []
+
+            # Conditional update: rows another replica claimed in the meantime no longer match
+            db.query(AgentMemory).filter(AgentMemory.id.in_(candidate_ids), *claimable).update(
+                {AgentMemory.claim_token: token, AgentMemory.claimed_at: now},
+                synchronize_session=False
+            )
+            db.commit()
+
+            return token, [
+                (row.id, row.content) for row in db.query(AgentMemory.id, AgentMemory.content)
+                .filter(AgentMemory.claim_token == token)
+                .order_by(AgentMemory.id)
+            ]
+        finally:
+            db.close()
+
+    def _store_embeddings(self, token: str, ids: List[int], vectors: List[List[float]]):
+        from sqlalchemy import text
+        from main import SessionLocal
+
+        now = datetime.now(timezone.utc)
+        if self.backend == "pgvector":
+            statement = text(
+                "UPDATE agent_memory SET embedding = CAST(:vector AS vector), embedded_at = :now "
+                "WHERE id = :id AND claim_token = :token"
+            )
+            params = [
+                {"id": memory_id, "vector": "[" + ",".join(f"{x:.7g}" for x in vector) + "]"}
+                for memory_id, vector in zip(ids, vectors)
+            ]
+        else:
+            statement = text(
+                "UPDATE agent_memory SET embedding_vector = :vector, embedded_at = :now "
+                "WHERE id = :id AND claim_token = :token"
+            )
+            params = [{"id": memory_id, "vector": encode_vector(vector)} for memory_id, vector in zip(ids, vectors)]
+
+        db = SessionLocal()
+        try:
+            # Rows whose claim expired and moved to another replica are left to it
+            db.execute(statement, [{**param, "now": now, "token": token} for param in params])
+            db.commit()
+        finally:
+            db.close()
+
+    async def embed_pending(self) -> int:
+        """Embed one batch of memories that have no embedding yet. Returns the batch size."""
+        from integrations.llm_gateway import llm_gateway
+        from integrations.llm_scheduler import BATCH
+
+        token, pending = await asyncio.to_thread(self._claim_pending)
+        if not pending:
+            return 0
+
+        ids = [memory_id for memory_id, _ in pending]
+        vectors = await llm_gateway.embed([content for _, content in pending], model=EMBEDDING_MODEL, priority=BATCH)
+        await asyncio.to_thread(self._store_embeddings, token, ids, vectors)
+        self.stats["embedded"] += len(ids)
+        return len(ids)
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    async def _embed_query(self, query: str) -> np.ndarray:
+        from integrations.llm_gateway import llm_gateway
+
+        cached = self._query_cache.get(query)
+        if cached is not None:
+            self._query_cache.move_to_end(query)
+            return cached
+
+        vector = np.asarray((await llm_gateway.embed([query], model=EMBEDDING_MODEL))[0], dtype=np.float32)
+        self._query_cache[query] = vector
+        while len(self._query_cache) > QUERY_CACHE_ENTRIES:
+            self._query_cache.popitem(last=False)
+        return vector
+
+    def _load_new(self, namespace: Namespace):
+        """
+        Add vectors embedded since the last load to the namespace index.
+
+        embedded_at is stamped before the embedder commits, so a batch can
+        become visible after a later-stamped one was already loaded. Each
+        load therefore re-reads a load_overlap_seconds margin behind the
+        watermark, and the index skips the ids it already has.
+        """
+        from main import SessionLocal, AgentMemory
+
+        agent_type, memory_type = namespace
+        since = self._loaded_through.get(namespace)
+        db = SessionLocal()
+        try:
+            query = db.query(AgentMemory.id, AgentMemory.embedding_vector, AgentMemory.embedded_at).filter(
+                AgentMemory.agent_type == agent_type,
+                AgentMemory.memory_type == memory_type,
+                AgentMemory.embedding_vector.isnot(None)
+            )
+            if since is not None:
+                query = query.filter(AgentMemory.embedded_at > since - timedelta(seconds=self.load_overlap_seconds))
+            rows = query.all()
+        finally:
+            db.close()
+
+        if not rows:
+            return
+        index = self._indexes.setdefault(namespace, NumpyIndex(self.ivf_threshold, self.ivf_probes))
+        rows = [row for row in rows if row.id not in index]
+        if not rows:
+            return
+        index.add([row.id for row in rows], np.stack([decode_vector(row.embedding_vector) for row in rows]))
+        newest = max(row.embedded_at for row in rows)
+        self._loaded_through[namespace] = newest if since is None else max(since, newest)
+
+    def _search_pgvector(self, namespace: Namespace, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        from sqlalchemy import text
+        from main import SessionLocal
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(text(
+                "SELECT id, 1 - (embedding <=> CAST(:query AS vector)) AS score FROM agent_memory "
+                "WHERE agent_type = :agent_type AND memory_type = :memory_type AND embedding IS NOT NULL "
+                "ORDER BY embedding <=> CAST(:query AS vector) LIMIT :k"
+            ), {
+                "query": "[" + ",".join(f"{x:.7g}" for x in query) + "]",
+                "agent_type": namespace[0],
+                "memory_type": namespace[1],
+                "k": k
+            }).all()
+            return [(row.id, float(row.score)) for row in rows]
+        finally:
+            db.close()
+
+    def _hydrate(self, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        from main import SessionLocal, AgentMemory
+
+        if not hits:
+            return []
+        db = SessionLocal()
+        try:
+            memories = {m.id: m for m in db.query(AgentMemory).filter(AgentMemory.id.in_([i for i, _ in hits]))}
+        finally:
+            db.close()
+        return [
+            {
+                "id": memory_id,
+                "score": round(score, 4),
+                "content": memories[memory_id].content,
+                "meta_data": memories[memory_id].meta_data or {},
+                "entity_type": memories[memory_id].entity_type,
+                "entity_id": memories[memory_id].entity_id,
+            }
+            for memory_id, score in hits if memory_id in memories
+        ]
+
+    async def search(self, query: str, agent_type: str, memory_type: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top-k memories in the namespace most similar to `query`"""
+        namespace = (agent_type, memory_type)
+        self.stats["searches"] += 1
+
+        if self.backend == "pgvector":
+            vector = await self._embed_query(query)
+            hits = await asyncio.to_thread(self._search_pgvector, namespace, vector, k)
+        else:
+            async with self._index_lock:
+                await asyncio.to_thread(self._load_new, namespace)
+            index = self._indexes.get(namespace)
+            if not index:
+                return []  # Nothing embedded yet; skip the query embedding call
+            hits = index.search(await self._embed_query(query), k)
+
+        return await asyncio.to_thread(self._hydrate, hits)
+
+    # ------------------------------------------------------------------
+    # Background embedder
+    # ------------------------------------------------------------------
+
+    def notify(self):
+        """Wake the embedder now (called after new memories are committed)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        from integrations.llm_gateway import llm_gateway
+
+        while self._running:
+            if llm_gateway.openai_enabled:
+                try:
+                    while await self.embed_pending() == self.embed_batch_size:
+                        pass
+                except Exception as e:
+                    self.stats["embed_errors"] += 1
+                    logger.error(f"Memory embedding failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.embed_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "embedding_model": EMBEDDING_MODEL,
+            "namespaces": {
+                f"{agent_type}/{memory_type}": {"vectors": len(index), "ivf": index.centroids is not None}
+                for (agent_type, memory_type), index in self._indexes.items()
+            },
+        }
+
+
+# Global instance
+vector_store = VectorStore()
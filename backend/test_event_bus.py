@@ -0,0 +1,264 @@
+"""
+EventBus Outbox Tests
+
+Exercises the database-backed EventBus (agents/events.py) against a
+throwaway SQLite database:
+- Claiming, heartbeat renewal and claim fencing
+- Tenant-fair dispatch order
+- Coalescing of entity event bursts
+- Retrying only the handler runs that failed to start
+- Handing unstarted events back on stop()
+
+Run with: pytest test_event_bus.py
+"""
+
+import os
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# The outbox lives in main's database; point it at a scratch SQLite file
+# before main is first imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'event_bus_test.db')}"
+
+from main import Base, engine, SessionLocal, AgentEvent  # noqa: E402
+from agents import manager as agent_manager_module  # noqa: E402
+from agents.events import EventBus, Event, EventType, EventHandlingError  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def outbox():
+    Base.metadata.create_all(bind=engine, tables=[AgentEvent.__table__])
+    yield
+    db = SessionLocal()
+    try:
+        db.query(AgentEvent).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def make_bus(**overrides) -> EventBus:
+    bus = EventBus(backend="database")
+    bus.visibility_timeout_seconds = 60
+    for name, value in overrides.items():
+        setattr(bus, name, value)
+    return bus
+
+
+def write_event(bus: EventBus, entity_id: int, tenant_id: int = None) -> int:
+    """Write one due LEAD_CREATED event (not coalesced) and return its outbox id"""
+    event = Event(
+        event_type=EventType.LEAD_CREATED,
+        entity_type="lead",
+        entity_id=entity_id,
+        data={"lead_id": entity_id},
+        timestamp=datetime.now(timezone.utc) - timedelta(seconds=1),
+        tenant_id=tenant_id
+    )
+    bus._insert(event)
+    return event.id
+
+
+def load_row(event_id: int) -> AgentEvent:
+    db = SessionLocal()
+    try:
+        return db.query(AgentEvent).filter(AgentEvent.id == event_id).one()
+    finally:
+        db.close()
+
+
+def expire_claim(event_id: int):
+    """Push a claim's visibility timeout into the past, as if its holder had stopped renewing it"""
+    db = SessionLocal()
+    try:
+        db.query(AgentEvent).filter(AgentEvent.id == event_id).update(
+            {AgentEvent.available_at: datetime.now(timezone.utc) - timedelta(seconds=1)},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def naive_utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ============================================================================
+# CLAIMS
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_held_claim_is_not_reclaimed_and_heartbeat_renews_it():
+    holder, other = make_bus(heartbeat_seconds=0.05), make_bus()
+    event_id = write_event(holder, entity_id=1)
+
+    claimed = holder._claim_batch(10)
+    assert [event.id for event in claimed] == [event_id]
+    assert other._claim_batch(10) == []
+
+    # Close to expiry, the heartbeat pushes the timeout out again
+    expire_claim(event_id)
+    holder._claimed = {event.id: event for event in claimed}
+    holder._running = True
+    heartbeat = asyncio.create_task(holder._run_heartbeat())
+    await asyncio.sleep(0.2)
+    holder._running = False
+    heartbeat.cancel()
+    await asyncio.gather(heartbeat, return_exceptions=True)
+
+    row = load_row(event_id)
+    assert row.status == "processing"
+    assert row.claim_token == claimed[0].claim_token
+    assert row.available_at > naive_utcnow()
+    assert other._claim_batch(10) == []
+
+
+def test_stale_holder_cannot_settle_after_reclaim():
+    stale, current = make_bus(), make_bus()
+    event_id = write_event(stale, entity_id=1)
+
+    [stale_event] = stale._claim_batch(10)
+    expire_claim(event_id)
+    [current_event] = current._claim_batch(10)
+    assert current_event.attempts == stale_event.attempts + 1
+
+    # The stale holder can neither ack, fail, nor renew the event any more
+    stale._settle(stale_event, None)
+    stale._settle(stale_event, "boom")
+    assert stale._renew_claims([stale_event]) == set()
+
+    row = load_row(event_id)
+    assert row.status == "processing"
+    assert row.claim_token == current_event.claim_token
+    assert row.last_error is None
+
+    current._settle(current_event, None)
+    assert load_row(event_id).status == "done"
+
+
+def test_ready_events_round_robin_across_tenants():
+    bus = make_bus(tenant_concurrency=10)
+    for tenant, entity_id in [(1, 1), (1, 2), (1, 3), (2, 4)]:
+        bus._push(Event(
+            event_type=EventType.LEAD_CREATED,
+            entity_id=entity_id,
+            timestamp=datetime.now(timezone.utc),
+            tenant_id=tenant
+        ))
+
+    order = [bus._pop_fair().entity_id for _ in range(4)]
+    assert order == [1, 4, 2, 3]
+    assert bus._pop_fair() is None
+
+
+# ============================================================================
+# COALESCING
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_burst_for_one_entity_coalesces_into_one_row():
+    bus = make_bus()
+    assert EventType.LEAD_UPDATED in bus.coalesce_windows
+
+    events = [
+        await bus.emit(EventType.LEAD_UPDATED, entity_type="lead", entity_id=7, data={"step": step})
+        for step in range(5)
+    ]
+    await bus.emit(EventType.LEAD_UPDATED, entity_type="lead", entity_id=8, data={"step": 0})
+
+    db = SessionLocal()
+    try:
+        rows = db.query(AgentEvent).filter(AgentEvent.entity_id == 7).all()
+        assert db.query(AgentEvent).filter(AgentEvent.entity_id == 8).count() == 1
+    finally:
+        db.close()
+
+    assert len(rows) == 1
+    assert {event.id for event in events} == {rows[0].id}
+    assert rows[0].data["step"] == 4
+    assert [change["step"] for change in rows[0].data["changes"]] == [0, 1, 2, 3, 4]
+    assert bus.stats["coalesced"] == 4
+
+
+# ============================================================================
+# RETRIES
+# ============================================================================
+
+class FlakyAgentManager:
+    """Agent manager stub that fails to start the workflows of chosen steps once"""
+
+    def __init__(self, fail_steps):
+        self.fail_steps = set(fail_steps)
+        self.started = []
+
+    async def start_workflow(self, context, **kwargs):
+        step = context["step"]
+        if step in self.fail_steps:
+            self.fail_steps.discard(step)
+            return {"workflow_id": None, "error": "agent unavailable"}
+        self.started.append(step)
+        return {"workflow_id": f"wf-{step}"}
+
+
+@pytest.mark.asyncio
+async def test_retry_reruns_only_runs_that_failed_to_start(monkeypatch):
+    manager = FlakyAgentManager(fail_steps=[1])
+    monkeypatch.setattr(agent_manager_module, "get_agent_manager", lambda: manager)
+
+    bus = make_bus()
+    bus.register_handler(EventType.LEAD_UPDATED, "lead_follow_up", "Follow up on step {step}")
+    bus._insert(Event(
+        event_type=EventType.LEAD_UPDATED,
+        entity_type="lead",
+        entity_id=1,
+        data={"step": 2, "changes": [{"step": 0}, {"step": 1}, {"step": 2}]},
+        timestamp=datetime.now(timezone.utc) - timedelta(seconds=1)
+    ))
+
+    [event] = bus._claim_batch(10)
+    with pytest.raises(EventHandlingError):
+        await bus._handle_event(event)
+    bus._settle(event, "agent unavailable")
+    assert manager.started == [0, 2]
+    assert len(load_row(event.id).started_runs) == 2
+
+    # The retry, claimed afresh from the outbox, only starts the failed run
+    expire_claim(event.id)
+    [retry] = bus._claim_batch(10)
+    await bus._handle_event(retry)
+    bus._settle(retry, None)
+    assert manager.started == [0, 2, 1]
+    assert load_row(event.id).status == "done"
+
+
+# ============================================================================
+# SHUTDOWN
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_stop_hands_unstarted_events_back():
+    # No tenant may run anything, so every claimed event stays buffered
+    bus = make_bus(tenant_concurrency=0, poll_seconds=0.05)
+    event_ids = [write_event(bus, entity_id=entity_id, tenant_id=1) for entity_id in range(3)]
+
+    bus.start()
+    for _ in range(100):
+        if bus._ready_count == len(event_ids):
+            break
+        await asyncio.sleep(0.02)
+    assert bus._ready_count == len(event_ids)
+    assert all(load_row(event_id).attempts == 1 for event_id in event_ids)
+
+    await bus.stop()
+
+    for event_id in event_ids:
+        row = load_row(event_id)
+        assert row.status == "pending"
+        assert row.attempts == 0
+        assert row.claim_token is None
+    assert bus._claimed == {}
+    assert make_bus()._claim_batch(10) != []
@@ -11,6 +11,7 @@ import LandingPage from './pages/LandingPage';
 import Registration from './pages/Registration';
 import EmailVerificationSent from './pages/EmailVerificationSent';
 import Login from './pages/Login';
+import SetupPassword from './pages/SetupPassword';
 import Onboarding from './pages/Onboarding';
 import Dashboard from './pages/Dashboard';
 import Leads from './pages/Leads';
@@ -146,6 +147,7 @@ function App() {
           <Route path="/register" element={<Registration />} />
           <Route path="/verify-email-sent" element={<EmailVerificationSent />} />
           <Route path="/login" element={<Login />} />
+          <Route path="/setup-password" element={<SetupPassword />} />
 
           {/* Onboarding Page */}
           <Route
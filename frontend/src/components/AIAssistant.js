@@ -57,18 +57,35 @@ function AIAssistant({ isOpen, onClose, context = {} }) {
     setInputValue('');
     setLoading(true);
 
-    try {
-      // Call AI API
-      const response = await aiAPI.chat(inputValue, context);
-
-      const aiMessage = {
-        id: Date.now() + 1,
-        role: 'assistant',
-        content: response.response,
-        timestamp: new Date().toISOString(),
-      };
+    const aiMessageId = Date.now() + 1;
+    const updateAiMessage = (update) => {
+      setMessages((prev) => {
+        const existing = prev.find((m) => m.id === aiMessageId);
+        if (!existing) {
+          return [...prev, {
+            id: aiMessageId,
+            role: 'assistant',
+            content: '',
+            timestamp: new Date().toISOString(),
+            ...update(null),
+          }];
+        }
+        return prev.map((m) => (m.id === aiMessageId ? { ...m, ...update(m) } : m));
+      });
+    };
 
-      setMessages((prev) => [...prev, aiMessage]);
+    try {
+      // Stream the reply so tokens render as they arrive
+      await aiAPI.chatStream(inputValue, context, (event, data) => {
+        if (event === 'token') {
+          setLoading(false);
+          updateAiMessage((m) => ({ content: (m?.content || '') + data.content }));
+        } else if (event === 'tool_call') {
+          updateAiMessage(() => ({ status: `Running ${data.function.replace(/_/g, ' ')}...` }));
+        } else if (event === 'tool_result') {
+          updateAiMessage(() => ({ status: null }));
+        }
+      });
     } catch (error) {
       console.error('AI chat error:', error);
       const errorMessage = {
@@ -101,6 +118,7 @@ function AIAssistant({ isOpen, onClose, context = {} }) {
             className={`message ${message.role === 'user' ? 'message-user' : 'message-assistant'}`}
           >
             <div className="message-content">{message.content}</div>
+            {message.status && <div className="message-status">{message.status}</div>}
             <div className="message-timestamp">
               {new Date(message.timestamp).toLocaleTimeString([], {
                 hour: '2-digit',
@@ -1,4 +1,5 @@
 import React, { useState } from 'react';
+import { streamSSE } from '../services/api';
 import './CoachCorner.css';
 
 const CoachCorner = ({ isOpen, onClose }) => {
@@ -152,23 +153,18 @@ const CoachCorner = ({ isOpen, onClose }) => {
     setResponse(null);
 
     try {
-      const res = await fetch(`${process.env.REACT_APP_API_URL}/api/v1/coach`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`,
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          mode: selectedMode,
-          message: message
-        })
+      // Stream the coach reply; show it as soon as the first tokens arrive
+      let streamed = '';
+      const data = await streamSSE('/api/v1/coach/stream', {
+        mode: selectedMode,
+        message: message
+      }, (event, payload) => {
+        if (event === 'token') {
+          streamed += payload.content;
+          setLoading(false);
+          setResponse({ mode: selectedMode, response: streamed });
+        }
       });
-
-      if (!res.ok) {
-        throw new Error('Coach unavailable');
-      }
-
-      const data = await res.json();
       setResponse(data);
     } catch (error) {
       console.error('Coach error:', error);
@@ -1,4 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
+import { streamSSE } from '../services/api';
 import './AIUnderwriter.css';
 
 function AIUnderwriter() {
@@ -36,30 +37,36 @@ function AIUnderwriter() {
     setIsLoading(true);
 
     try {
-      const response = await fetch('/api/v1/ai-underwriter/ask', {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`,
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ question: inputMessage }),
-      });
-
-      if (!response.ok) {
-        throw new Error('Failed to get answer');
-      }
-
-      const data = await response.json();
-
-      const assistantMessage = {
-        role: 'assistant',
-        content: data.answer,
-        sources: data.sources || [],
-        confidence: data.confidence,
-        timestamp: new Date(),
+      // Stream the answer so it renders as Claude writes it
+      const updateAnswer = (update) => {
+        setMessages((prev) => {
+          const last = prev[prev.length - 1];
+          if (last && last.streaming) {
+            return [...prev.slice(0, -1), { ...last, ...update(last) }];
+          }
+          return [...prev, {
+            role: 'assistant',
+            content: '',
+            sources: [],
+            timestamp: new Date(),
+            streaming: true,
+            ...update(null),
+          }];
+        });
       };
 
-      setMessages((prev) => [...prev, assistantMessage]);
+      await streamSSE('/api/v1/ai-underwriter/ask/stream', { question: inputMessage }, (event, data) => {
+        if (event === 'token') {
+          updateAnswer((last) => ({ content: (last?.content || '') + data.content }));
+        } else if (event === 'done') {
+          updateAnswer(() => ({
+            content: data.answer,
+            sources: data.sources || [],
+            confidence: data.confidence,
+            streaming: false,
+          }));
+        }
+      });
     } catch (error) {
       console.error('Error asking question:', error);
       const errorMessage = {
@@ -138,7 +145,7 @@ function AIUnderwriter() {
               )}
             </div>
           ))}
-          {isLoading && (
+          {isLoading && !messages[messages.length - 1]?.streaming && (
             <div className="message assistant loading-message">
               <div className="message-header">
                 <span className="message-role">🤖 AI Underwriter</span>
@@ -7,6 +7,7 @@ function DataUpload() {
   const [uploadState, setUploadState] = useState('select'); // select, analyzing, questions, mapping, importing, complete
   const [file, setFile] = useState(null);
   const [parsedData, setParsedData] = useState(null);
+  const [uploadId, setUploadId] = useState(null);
   const [aiQuestions, setAiQuestions] = useState([]);
   const [answers, setAnswers] = useState({});
   const [columnMappings, setColumnMappings] = useState({});
@@ -39,6 +40,7 @@ function DataUpload() {
     }
 
     setFile(selectedFile);
+    setUploadId(null);
     setError(null);
   };
 
@@ -84,6 +86,7 @@ function DataUpload() {
 
       const data = await response.json();
       setParsedData(data.preview);
+      setUploadId(data.upload_id || null);
       setAiQuestions(data.questions || []);
       setColumnMappings(data.suggested_mappings || {});
       setUploadState('questions');
@@ -126,19 +129,33 @@ function DataUpload() {
     setError(null);
 
     try {
-      const formData = new FormData();
-      formData.append('file', file);
-      formData.append('answers', JSON.stringify(answers));
-      formData.append('mappings', JSON.stringify(columnMappings));
-
-      // Use relative URL to leverage Vercel proxy (see vercel.json)
-      const response = await fetch('/api/v1/data-import/execute', {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        },
-        body: formData
-      });
+      const sendImport = (useUploadId) => {
+        const formData = new FormData();
+        // Redeem the handle from analyze instead of uploading the file again
+        if (useUploadId) {
+          formData.append('upload_id', uploadId);
+        } else {
+          formData.append('file', file);
+        }
+        formData.append('answers', JSON.stringify(answers));
+        formData.append('mappings', JSON.stringify(columnMappings));
+
+        // Use relative URL to leverage Vercel proxy (see vercel.json)
+        return fetch('/api/v1/data-import/execute', {
+          method: 'POST',
+          headers: {
+            'Authorization': `Bearer ${localStorage.getItem('token')}`
+          },
+          body: formData
+        });
+      };
+
+      let response = await sendImport(Boolean(uploadId));
+
+      // Stored upload expired - fall back to sending the file
+      if (response.status === 410 && file) {
+        response = await sendImport(false);
+      }
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
@@ -167,6 +184,7 @@ function DataUpload() {
     setUploadState('select');
     setFile(null);
     setParsedData(null);
+    setUploadId(null);
     setAiQuestions([]);
     setAnswers({});
     setColumnMappings({});
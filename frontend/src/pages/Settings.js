@@ -647,7 +647,7 @@ function Settings() {
 
       if (response.ok) {
         const data = await response.json();
-        alert(`Synced ${data.processed_count}/${data.fetched_count} emails successfully!`);
+        alert(`Synced ${data.queued_count}/${data.fetched_count} emails. Extraction is running in the background.`);
         await checkMicrosoftStatus();
       } else {
         const error = await response.json();
@@ -0,0 +1,97 @@
+import React, { useState } from 'react';
+import { useNavigate, useSearchParams } from 'react-router-dom';
+import { authAPI } from '../services/api';
+import './Login.css';
+
+function SetupPassword() {
+  const [searchParams] = useSearchParams();
+  const token = searchParams.get('token') || '';
+  const [password, setPassword] = useState('');
+  const [confirmPassword, setConfirmPassword] = useState('');
+  const [error, setError] = useState('');
+  const [loading, setLoading] = useState(false);
+  const navigate = useNavigate();
+
+  const handleSubmit = async (e) => {
+    e.preventDefault();
+    setError('');
+
+    if (password.length < 8) {
+      setError('Password must be at least 8 characters');
+      return;
+    }
+    if (password !== confirmPassword) {
+      setError('Passwords do not match');
+      return;
+    }
+
+    setLoading(true);
+    try {
+      const data = await authAPI.setupPassword(token, password);
+      navigate(data.redirect_to || '/login');
+    } catch (err) {
+      console.error('Password setup error:', err);
+      const errorMessage = err.response?.data?.detail || err.message || 'Could not set your password. Please try again.';
+      setError(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <div className="login-container">
+      <div className="login-box">
+        <div className="login-header">
+          <h1>Set Up Your Password</h1>
+          <p>Choose a password to finish activating your account</p>
+        </div>
+
+        {!token ? (
+          <div className="error-message">
+            This setup link is missing its token. Please use the link from your invitation email.
+          </div>
+        ) : (
+          <form onSubmit={handleSubmit} className="login-form">
+            <div className="form-group">
+              <label htmlFor="password">Password</label>
+              <input
+                id="password"
+                type="password"
+                value={password}
+                onChange={(e) => setPassword(e.target.value)}
+                placeholder="At least 8 characters"
+                required
+                disabled={loading}
+              />
+            </div>
+
+            <div className="form-group">
+              <label htmlFor="confirm-password">Confirm Password</label>
+              <input
+                id="confirm-password"
+                type="password"
+                value={confirmPassword}
+                onChange={(e) => setConfirmPassword(e.target.value)}
+                placeholder="Re-enter your password"
+                required
+                disabled={loading}
+              />
+            </div>
+
+            {error && <div className="error-message">{error}</div>}
+
+            <button type="submit" className="btn-primary" disabled={loading}>
+              {loading ? 'Saving...' : 'Set Password'}
+            </button>
+          </form>
+        )}
+
+        <div className="login-footer">
+          <p>Already set up? <a href="/login">Log in here</a></p>
+        </div>
+      </div>
+    </div>
+  );
+}
+
+export default SetupPassword;
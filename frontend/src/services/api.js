@@ -55,6 +55,10 @@ export const authAPI = {
     const response = await api.post('/api/v1/register', data);
     return response.data;
   },
+  setupPassword: async (token, password) => {
+    const response = await api.post('/api/v1/setup-password', { token, password });
+    return response.data;
+  },
 };
 
 // Dashboard
@@ -245,6 +249,60 @@ export const analyticsAPI = {
   },
 };
 
+// Server-Sent Events over POST (EventSource only supports GET).
+// Calls onEvent(event, data) for every frame; resolves with the `done`
+// payload and rejects on an `error` event or a failed request.
+export const streamSSE = async (path, body, onEvent) => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok) {
+    throw new Error(`Stream request failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      frame.split('\n').forEach((line) => {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      const payload = data ? JSON.parse(data) : null;
+
+      if (event === 'error') {
+        throw new Error(payload?.detail || 'Stream error');
+      }
+      if (event === 'done') {
+        result = payload;
+      }
+      if (onEvent) onEvent(event, payload);
+    }
+  }
+
+  return result;
+};
+
 // AI Assistant & Conversations
 export const aiAPI = {
   chat: async (message, context = {}) => {
@@ -256,6 +314,13 @@ export const aiAPI = {
     });
     return response.data;
   },
+  chatStream: (message, context = {}, onEvent) =>
+    streamSSE('/api/v1/ai/chat/stream', {
+      message,
+      lead_id: context.lead_id,
+      loan_id: context.loan_id,
+      context: context.metadata,
+    }, onEvent),
   completeTask: async (taskId) => {
     const response = await api.post(`/api/v1/ai/complete-task?task_id=${taskId}`);
     return response.data;